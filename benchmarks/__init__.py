@@ -0,0 +1,7 @@
+"""
+Benchmarks for artifact-cli
+
+Run from the repository root:
+
+    python -m benchmarks --sizes 1000,10000,100000 --output results.json
+"""
@@ -0,0 +1,67 @@
+import json
+import logging
+import sys
+from optparse import OptionParser
+
+from . import concurrency, repository
+from .runner import environment, report
+
+SUITES = {
+    'concurrency': concurrency.run,
+    'repository': repository.run,
+}
+DEFAULT_SIZES = '1000,10000,100000'
+DEFAULT_DRIVERS = 'mock,s3'
+
+
+def get_parser():
+    parser = OptionParser(usage='%prog [options] [SUITE ...]\n\n  suites: ' + ', '.join(sorted(SUITES)))
+    parser.add_option(
+        '--sizes', dest='sizes', default=DEFAULT_SIZES,
+        help='comma-separated numbers of artifacts in the index (default: %s)' % DEFAULT_SIZES
+    )
+    parser.add_option(
+        '--drivers', dest='drivers', default=DEFAULT_DRIVERS,
+        help='comma-separated drivers, "mock" and/or "s3" emulated by moto (default: %s)' % DEFAULT_DRIVERS
+    )
+    parser.add_option(
+        '--repeat', dest='repeat', default=3, type='int',
+        help='number of repetitions of each benchmark (default: 3)'
+    )
+    parser.add_option(
+        '--output', dest='output', default=None,
+        help='path to write the results in JSON (default: stdout)'
+    )
+    return parser
+
+
+def main(argv=None):
+    parser = get_parser()
+    options, args = parser.parse_args(argv)
+    unknown = sorted(set(args) - set(SUITES))
+    if unknown:
+        parser.error('unknown suites: %s' % ', '.join(unknown))
+
+    sizes = [int(x) for x in options.sizes.split(',')]
+    drivers = [x for x in options.drivers.split(',') if x]
+
+    # operations log every upload and download
+    logging.disable(logging.WARNING)
+
+    results = []
+    for name in args or sorted(SUITES):
+        results += SUITES[name](sizes, drivers, options.repeat)
+    report(results)
+
+    doc = {'environment': environment(), 'results': results}
+    if options.output:
+        with open(options.output, 'w') as f:
+            json.dump(doc, f, indent=2)
+    else:
+        json.dump(doc, sys.stdout, indent=2)
+        sys.stdout.write('\n')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,55 @@
+"""
+Concurrent loading of many artifact ids through a driver simulating a remote storage
+"""
+
+from artifactcli.driver import SimulatedDriver
+from artifactcli.repository import Repository
+from artifactcli import indexformat
+from .repository import GROUP_ID, make_artifacts
+from .runner import measure, result
+
+SUITE = 'concurrency'
+DRIVER = 'sim'
+ARTIFACT_IDS = 32
+JOBS = [1, 4, 8, 16]
+
+# per-request latency and jitter in seconds, and bandwidth in bytes per second, as of a nearby S3 region
+LATENCY = 0.02
+JITTER = 0.01
+BANDWIDTH = 50 * 1024 * 1024
+
+# throttled variant: rate of SlowDown errors and attempts per request
+ERROR_RATE = 0.05
+MAX_ATTEMPTS = 5
+SEED = 1
+
+
+def populate(driver, size):
+    """
+    Write ARTIFACT_IDS indexes sharing size artifacts
+    """
+    n = max(size // ARTIFACT_IDS, 1)
+    data = indexformat.encode(make_artifacts(n))
+    for i in range(ARTIFACT_IDS):
+        driver.write_index('art-bench%02d' % i, data)
+    return n * ARTIFACT_IDS
+
+
+def run(sizes, drivers, repeat):
+    """
+    :param sizes: list of the total numbers of artifacts in the indexes
+    :param drivers: ignored; the simulated driver is always used
+    :param repeat: number of repetitions
+    :return: list of results
+    """
+    ret = []
+    for size in sizes:
+        for name, error_rate in [('load_all', 0.0), ('load_all_throttled', ERROR_RATE)]:
+            driver = SimulatedDriver(latency=LATENCY, jitter=JITTER, bandwidth=BANDWIDTH, max_attempts=MAX_ATTEMPTS,
+                                     seed=SEED)
+            total = populate(driver, size)
+            driver.error_rate = error_rate
+            for jobs in JOBS:
+                times = measure(lambda _: Repository(driver, GROUP_ID).load_all(jobs=jobs), repeat=repeat)
+                ret.append(result(SUITE, '%s_j%d' % (name, jobs), DRIVER, total, times, total))
+    return ret
@@ -0,0 +1,196 @@
+"""
+Repository operations on synthetic indexes of one artifact id
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from io import StringIO
+
+from artifactcli.artifact import Artifact, BasicInfo, FileInfo, GitInfo
+from artifactcli.driver import MockDriver
+from artifactcli.repository import Repository
+from artifactcli import indexformat
+from .runner import measure, result
+
+SUITE = 'repository'
+GROUP_ID = 'com.example.bench'
+ARTIFACT_ID = 'art-bench'
+BUCKET = 'bucket4bench'
+REVISIONS_PER_VERSION = 100
+DEDUP_CALLS = 1000
+
+
+def make_artifacts(n, revisions_per_version=REVISIONS_PER_VERSION):
+    """
+    :param n: number of artifacts
+    :param revisions_per_version: number of revisions of each version
+    :return: list of artifacts of one artifact id, in upload order
+    """
+    start = datetime(2015, 1, 1)
+    ret = []
+    for i in range(n):
+        version = '1.%d.0' % (i // revisions_per_version)
+        revision = i % revisions_per_version + 1
+        t = start + timedelta(minutes=i)
+        ret.append(Artifact(
+            BasicInfo(GROUP_ID, ARTIFACT_ID, version, 'jar', revision),
+            FileInfo('build%02d' % (i % 16), 'ci', 1000000 + i, t, '%032x' % i),
+            GitInfo('master', ['v%s' % version] if revision == 1 else [], 'Build Bot', 'ci@example.com',
+                    t - timedelta(minutes=5), 'Commit %d' % i, '%040x' % i)))
+    return ret
+
+
+@contextmanager
+def dateutil_only():
+    """
+    Parse dates with dateutil as before the fast path, to compare with it
+    """
+    import dateutil.parser
+    from unittest.mock import patch
+
+    with patch('artifactcli.artifact.fileinfo.parse_datetime', dateutil.parser.parse), \
+            patch('artifactcli.artifact.gitinfo.parse_datetime', dateutil.parser.parse):
+        yield
+
+
+def latest_file_name(artifacts):
+    bi = artifacts[-1].basic_info
+    return '%s-%s.%s' % (bi.artifact_id, bi.version, bi.packaging)
+
+
+@contextmanager
+def open_driver(name):
+    """
+    :param name: 'mock' or 's3' (S3 emulated by moto)
+    :return: context manager yielding an empty driver
+    """
+    if name == 'mock':
+        yield MockDriver()
+        return
+    if name != 's3':
+        raise ValueError('Unknown driver: %s' % name)
+
+    import boto3
+    from moto import mock_s3
+    from artifactcli.driver import S3Driver
+
+    with mock_s3():
+        session = boto3.session.Session(aws_access_key_id='XXX', aws_secret_access_key='YYY')
+        session.resource('s3').Bucket(BUCKET).create()
+        yield S3Driver('XXX', 'YYY', BUCKET, GROUP_ID, session=session)
+
+
+def populate(driver, artifacts):
+    """
+    Write the index and the latest pointer of the last version
+    """
+    driver.write_index(ARTIFACT_ID, indexformat.encode(artifacts))
+    bi = artifacts[-1].basic_info
+    driver.write_latest(ARTIFACT_ID, bi.version, bi.packaging, json.dumps(artifacts[-1].to_dict()))
+
+
+def loaded_repository(driver):
+    r = Repository(driver, GROUP_ID)
+    r.load(ARTIFACT_ID)
+    return r
+
+
+def run_driver(driver_name, size, artifacts, repeat, work_dir):
+    """
+    Benchmarks reading and writing the index through a driver
+    """
+    ret = []
+    name = latest_file_name(artifacts)
+    with open_driver(driver_name) as driver:
+        populate(driver, artifacts)
+
+        def add(bench, times, items=None):
+            ret.append(result(SUITE, bench, driver_name, size, times, items))
+
+        add('load', measure(lambda _: loaded_repository(driver), repeat=repeat), size)
+        add('latest', measure(lambda _: loaded_repository(driver).get_artifact(name), repeat=repeat))
+        add('latest_pointer', measure(lambda _: Repository(driver, GROUP_ID).read_latest(name), repeat=repeat))
+
+        # upload of a new file into the loaded index and save
+        bi = artifacts[-1].basic_info
+        counter = [0]
+
+        def setup_upload():
+            counter[0] += 1
+            path = os.path.join(work_dir, str(counter[0]), name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            data = ('%s\n' % counter[0]).encode('utf-8')
+            with open(path, 'wb') as f:
+                f.write(data)
+            art = Artifact(BasicInfo(GROUP_ID, ARTIFACT_ID, bi.version, bi.packaging, None),
+                           FileInfo('bench', 'ci', len(data), datetime(2015, 1, 1), hashlib.md5(data).hexdigest()))
+            return loaded_repository(driver), path, art
+
+        def upload(arg):
+            r, path, art = arg
+            r.upload(path, art)
+            r.save(ARTIFACT_ID)
+
+        add('upload_save', measure(upload, setup_upload, repeat=repeat))
+
+        # uploading a file already in the index stops at the digest lookup
+        existing = artifacts[len(artifacts) // 2]
+        path = os.path.join(work_dir, 'existing-%s' % name)
+        open(path, 'wb').close()
+        times = measure(lambda r: r.upload(path, existing), lambda: loaded_repository(driver), repeat, DEDUP_CALLS)
+        add('upload_dedup', times, DEDUP_CALLS)
+    return ret
+
+
+def run_memory(size, artifacts, repeat):
+    """
+    Benchmarks which do not depend on the driver
+    """
+    ret = []
+
+    def add(bench, times, items=None):
+        ret.append(result(SUITE, bench, None, size, times, items))
+
+    dicts = [x.to_dict() for x in artifacts]
+    add('from_dict', measure(lambda _: [Artifact.from_dict(d) for d in dicts], repeat=repeat), size)
+    with dateutil_only():
+        add('from_dict_dateutil', measure(lambda _: [Artifact.from_dict(d) for d in dicts], repeat=repeat), size)
+
+    data = indexformat.encode(artifacts)
+    add('decode_json', measure(lambda _: indexformat.decode(data), repeat=repeat), size)
+    add('decode_json_eager', measure(lambda _: indexformat.decode(data, lazy=False), repeat=repeat), size)
+    add('encode_json', measure(lambda _: indexformat.encode(artifacts), repeat=repeat), size)
+    compact = indexformat.encode(artifacts, indexformat.FORMAT_COMPACT)
+    add('decode_compact', measure(lambda _: indexformat.decode(compact), repeat=repeat), size)
+    add('decode_compact_eager', measure(lambda _: indexformat.decode(compact, lazy=False), repeat=repeat), size)
+
+    r = Repository(MockDriver(), GROUP_ID)
+    r.artifacts = {ARTIFACT_ID: artifacts}
+    add('list_text', measure(lambda _: r.print_list(fp=StringIO()), repeat=repeat), size)
+    add('list_json', measure(lambda _: r.print_list(output='json', fp=StringIO()), repeat=repeat), size)
+    return ret
+
+
+def run(sizes, drivers, repeat):
+    """
+    :param sizes: list of the numbers of artifacts in the index
+    :param drivers: list of the driver names
+    :param repeat: number of repetitions
+    :return: list of results
+    """
+    ret = []
+    work_dir = tempfile.mkdtemp()
+    try:
+        for size in sizes:
+            artifacts = make_artifacts(size)
+            ret += run_memory(size, artifacts, repeat)
+            for driver_name in drivers:
+                ret += run_driver(driver_name, size, artifacts, repeat, work_dir)
+    finally:
+        shutil.rmtree(work_dir)
+    return ret
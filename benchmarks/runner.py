@@ -0,0 +1,80 @@
+import platform
+import statistics
+import sys
+import time
+from datetime import datetime
+
+
+def measure(f, setup=None, repeat=3, number=1):
+    """
+    Time a function
+
+    :param f: function to time, which takes the value returned by setup
+    :param setup: function called before every repetition, excluded from the time (None for no setup)
+    :param repeat: number of repetitions
+    :param number: number of calls of f in one repetition
+    :return: list of the seconds taken by the repetitions
+    """
+    times = []
+    for _ in range(repeat):
+        arg = setup() if setup else None
+        start = time.perf_counter()
+        for _ in range(number):
+            f(arg)
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def result(suite, name, driver, size, times, items=None):
+    """
+    :param suite: suite name
+    :param name: benchmark name
+    :param driver: driver name, or None if no driver is used
+    :param size: number of artifacts in the index
+    :param times: list of the seconds taken by the repetitions
+    :param items: number of items processed in one repetition, to compute the throughput
+    :return: dict of one benchmark result
+    """
+    best = min(times)
+    ret = {
+        'suite': suite,
+        'name': name,
+        'driver': driver,
+        'size': size,
+        'repeat': len(times),
+        'min': best,
+        'median': statistics.median(times),
+    }
+    if items is not None:
+        ret['items'] = items
+        ret['per_second'] = items / best if best > 0 else None
+    return ret
+
+
+def environment():
+    """
+    :return: dict describing where the benchmarks run
+    """
+    return {
+        'version': __import__('artifactcli').__version__,
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'date': datetime.utcnow().replace(microsecond=0).isoformat() + 'Z',
+    }
+
+
+def report(results, fp=None):
+    """
+    Print the results in a human-readable table
+
+    :param results: list of results
+    :param fp: file object to write to (default: stderr)
+    """
+    fp = fp or sys.stderr
+    fmt = '%-12s %-24s %-6s %9s %12s %12s %14s\n'
+    fp.write(fmt % ('SUITE', 'NAME', 'DRIVER', 'SIZE', 'MIN(s)', 'MEDIAN(s)', 'ITEMS/s'))
+    for r in results:
+        per_second = '%.0f' % r['per_second'] if r.get('per_second') else '-'
+        fp.write(fmt % (r['suite'], r['name'], r['driver'] or '-', r['size'], '%.6f' % r['min'],
+                        '%.6f' % r['median'], per_second))
@@ -21,8 +21,9 @@ setup(
         'pytz',
         'python-dateutil<2.8.1,>=2.1',
         'GitPython>=0.3.5',
-        'boto3',
-        'botocore'
+        'boto3>=1.35.69',
+        'botocore>=1.35.69',
+        's3transfer'
     ],
     tests_require=[
         'moto',
@@ -8,6 +8,8 @@ USAGE = """
   %prog [options] download GROUP LOCAL_PATH [REVISION | latest]
   %prog [options] info     GROUP FILE_NAME  [REVISION | latest]
   %prog [options] delete   GROUP FILE_NAME   REVISION
+  %prog [options] migrate  GROUP
+  %prog [options] daemon
 
   e.g.
    GROUP     : your.company
@@ -36,10 +38,47 @@ def get_parser():
         '--force', action='store_true', dest='force', default=False,
         help='upload file even when it is already registered to the repository'
     )
+    parser.add_option(
+        '--content-addressed', action='store_true', dest='content_addressed', default=None,
+        help='store uploaded files as blobs keyed by their SHA-256 digest, identical files are stored only once'
+    )
+    parser.add_option(
+        '--journal', action='store_true', dest='journal', default=None,
+        help='save index changes as small delta files instead of rewriting the whole index'
+    )
+    parser.add_option(
+        '--index-format', dest='index_format', default=None, type='choice', choices=['json', 'compact'],
+        metavar='FORMAT',
+        help='format to write index files in, "json" or "compact" (default: keep the current format, json for new ones)'
+    )
     parser.add_option(
         '--output', dest='output', default=None,
         help='specify output format, "text" or "json" (default: text)'
     )
+    parser.add_option(
+        '--jobs', dest='jobs', default=None, type='int',
+        help='number of index files to load concurrently (default: 8)'
+    )
+    parser.add_option(
+        '--no-cache', action='store_true', dest='no_cache', default=False,
+        help='do not use any local cache'
+    )
+    parser.add_option(
+        '--blob-cache-size', dest='blob_cache_size', default=None, type='int', metavar='MB',
+        help='keep downloaded files in the local cache up to this size in MB (default: 0, disabled)'
+    )
+    parser.add_option(
+        '--multipart-threshold', dest='multipart_threshold', default=None, type='int', metavar='MB',
+        help='file size to switch to multipart upload in MB (default: 8)'
+    )
+    parser.add_option(
+        '--multipart-chunksize', dest='multipart_chunksize', default=None, type='int', metavar='MB',
+        help='part size of multipart transfer in MB (default: 8)'
+    )
+    parser.add_option(
+        '--max-concurrency', dest='max_concurrency', default=None, type='int', metavar='N',
+        help='maximum number of concurrent requests in a transfer (default: 10)'
+    )
     parser.add_option(
         '--access', dest='access_key', default=None, type='string',
         help='AWS access key id'
@@ -5,28 +5,108 @@ from .gitinfo import GitInfo
 from artifactcli.util import *
 
 
+BLOB_DIR = '.blobs'
+
+
 class Artifact(BaseInfo):
     keys = ['basic_info', 'file_info', 'scm_info']
 
-    def __init__(self, basic_info, file_info, scm_info=None):
+    # attributes of a lazy artifact, read from its index record on first access
+    lazy_keys = ['basic_info', 'file_info', 'scm_info', 'location']
+
+    def __init__(self, basic_info, file_info, scm_info=None, location=None):
+        """
+        :param location: remote path of the file when it is not stored at basic_info.s3_path()
+                         (e.g. content-addressed blob), not compared in equality
+        """
         super(Artifact, self).__init__(Artifact.keys)
         self.basic_info = basic_info
         self.file_info = file_info
         self.scm_info = scm_info
+        self.location = location
+
+    def __getattr__(self, name):
+        # called only for missing attributes, i.e. those of a lazy artifact not materialized yet
+        if name in Artifact.lazy_keys:
+            self._materialize()
+            if name in self.__dict__:
+                return self.__dict__[name]
+        raise AttributeError('%r object has no attribute %r' % (self.__class__.__name__, name))
 
     def __str__(self):
         buf = [self.basic_info, self.file_info] + ([self.scm_info] if self.scm_info else [])
         return '\n'.join(map(str, buf))
 
     def to_dict(self):
+        lazy = self._lazy_record()
+        if lazy:
+            return lazy[0].to_dict(lazy[1])
+
         ret = {
             'basic_info': self.basic_info.to_dict(),
             'file_info': self.file_info.to_dict(),
         }
         if self.scm_info:
             ret.update({'scm_info': self.scm_info.to_dict()})
+        if self.location:
+            ret.update({'location': self.location})
         return ret
 
+    def s3_path(self):
+        return self.location or self.basic_info.s3_path()
+
+    def lookup_key(self):
+        """
+        Read the key fields, without materializing a lazy artifact
+
+        :return: tuple of (artifact_id, version, packaging, revision, size, md5)
+        """
+        lazy = self._lazy_record()
+        if lazy:
+            return lazy[0].lookup_key(lazy[1])
+        bi, fi = self.basic_info, self.file_info
+        return bi.artifact_id, bi.version, bi.packaging, bi.revision, fi.size, fi.md5
+
+    @staticmethod
+    def lazy(loader, record):
+        """
+        Make an artifact which keeps the raw index record and is materialized on first access to its attributes
+
+        Lazy artifacts behave the same as the others and are safe to read from multiple threads.
+
+        :param loader: object with methods materialize(record) to make an artifact,
+                       lookup_key(record) and to_dict(record)
+        :param record: raw index record
+        :return: artifact object
+        """
+        art = Artifact.__new__(Artifact)
+        BaseInfo.__init__(art, Artifact.keys)
+        art._loader = loader
+        art._record = record
+        return art
+
+    def _lazy_record(self):
+        """
+        :return: tuple of (loader, record) while no attribute has been materialized or assigned, otherwise None
+        """
+        d = self.__dict__
+        loader, record = d.get('_loader'), d.get('_record')
+        if loader is None or record is None or \
+                'basic_info' in d or 'file_info' in d or 'scm_info' in d or 'location' in d:
+            return None
+        return loader, record
+
+    def _materialize(self):
+        d = self.__dict__
+        loader, record = d.get('_loader'), d.get('_record')
+        if loader is None or record is None:
+            return  # not lazy, or materialized by another thread
+        art = loader.materialize(record)
+        for k in Artifact.lazy_keys:
+            d.setdefault(k, getattr(art, k))  # keep attributes assigned before materialization
+        d.pop('_record', None)  # before the loader, so that readers see either both or no record
+        d.pop('_loader', None)
+
     @staticmethod
     def from_dict(d):
         bi = BasicInfo.from_dict(d['basic_info'])
@@ -35,9 +115,17 @@ class Artifact(BaseInfo):
         if 'scm_info' in d:
             if d['scm_info']['system'] == 'git':
                 si = GitInfo.from_dict(d['scm_info'])
-        return Artifact(bi, fi, si)
+        return Artifact(bi, fi, si, d.get('location'))
+
+    @staticmethod
+    def blob_path(group_id, digest):
+        """
+        :param digest: SHA-256 digest hex string, or MD5 for files whose SHA-256 digest is unknown
+        """
+        return '/'.join([group_id, BLOB_DIR, digest])
 
     @staticmethod
-    def from_path(group_id, path):
+    def from_path(group_id, path, hash_cache=None, part_size=None):
         # revision will be set to None
-        return Artifact(BasicInfo.from_path(group_id, path), FileInfo.from_path(path), GitInfo.from_path(path))
+        return Artifact(BasicInfo.from_path(group_id, path), FileInfo.from_path(path, hash_cache, part_size),
+                        GitInfo.from_path(path))
@@ -3,7 +3,6 @@ import time
 import socket
 import getpass
 from datetime import datetime
-import dateutil.parser
 from .baseinfo import BaseInfo
 from artifactcli.util import *
 
@@ -11,13 +10,19 @@ from artifactcli.util import *
 class FileInfo(BaseInfo):
     keys = ['host', 'user', 'size', 'mtime', 'md5']
 
-    def __init__(self, host, user, size, mtime, md5):
+    def __init__(self, host, user, size, mtime, md5, sha256=None, multipart_etag=None):
+        """
+        :param sha256: SHA-256 digest hex string, not compared in equality
+        :param multipart_etag: expected ETag of the multipart upload, not stored in the index
+        """
         super(FileInfo, self).__init__(FileInfo.keys)
         self.host = host
         self.user = user
         self.size = size
         self.mtime = mtime
         self.md5 = md5
+        self.sha256 = sha256
+        self.multipart_etag = multipart_etag
 
     def __str__(self):
         buf = [
@@ -26,43 +31,53 @@ class FileInfo(BaseInfo):
             '  Modified: %s' % self.mtime,
             '  Size    : %s (%s)' % (self.size, self.size_format()),
             '  MD5     : %s' % self.md5,
-        ]
+        ] + (['  SHA-256 : %s' % self.sha256] if self.sha256 else [])
         return '\n'.join(buf)
 
     def to_dict(self):
-        return {
+        ret = {
             'host': self.host,
             'user': self.user,
             'size': self.size,
             'mtime': self.mtime.isoformat(),
             'hex_md5': self.md5
         }
+        if self.sha256:
+            ret.update({'hex_sha256': self.sha256})
+        return ret
 
     @staticmethod
-    def from_path(path):
+    def from_path(path, hash_cache=None, part_size=None):
+        """
+        Compute all digests in a single pass over the file
+
+        :param path: local file path
+        :param hash_cache: HashCache object to avoid rehashing unchanged files
+        :param part_size: part size in bytes of the multipart upload (None to skip the multipart ETag)
+        """
         host = socket.gethostname()
         user = getpass.getuser()
         size = os.path.getsize(path)
         mtime = datetime(*time.localtime(os.path.getmtime(path))[:6])
-        md5 = FileInfo.get_hex_md5(path)
-        return FileInfo(host, user, size, mtime, md5)
+
+        etag_name = 'multipart_etag:%d' % part_size if part_size else None
+        names = ['md5', 'sha256'] + ([etag_name] if etag_name else [])
+
+        def f(p):
+            d = FileDigest.from_path(p, part_size)
+            return {'md5': d.md5, 'sha256': d.sha256, etag_name: d.multipart_etag()}
+
+        digests = hash_cache.digests(path, names, f) if hash_cache else f(path)
+        return FileInfo(host, user, size, mtime, digests['md5'], digests['sha256'], digests.get(etag_name))
 
     @staticmethod
     def from_dict(d):
-        return FileInfo(d['host'], d['user'], d['size'], dateutil.parser.parse(d['mtime']), d['hex_md5'])
+        return FileInfo(d['host'], d['user'], d['size'], parse_datetime(d['mtime']), d['hex_md5'],
+                        d.get('hex_sha256'))
 
     @staticmethod
     def get_hex_md5(path):
-        import hashlib
-
-        hasher = hashlib.md5()
-        blocksize = 65536
-        with open(path, 'rb') as f:
-            buf = f.read(blocksize)
-            while len(buf) > 0:
-                hasher.update(buf)
-                buf = f.read(blocksize)
-        return hasher.hexdigest()
+        return FileDigest.from_path(path).md5
 
     def size_format(self):
         return self._sizeof_fmt(self.size)
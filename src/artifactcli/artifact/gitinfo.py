@@ -2,9 +2,10 @@ import time
 from datetime import datetime
 import logging
 import os
-import dateutil.parser
-import git
+import zlib
 from .baseinfo import BaseInfo
+from .gitreader import GitReader
+from .gittagindex import GitTagIndex
 from artifactcli.util import *
 
 
@@ -53,13 +54,15 @@ class GitInfo(BaseInfo):
             d['tags'],
             d['author_name'],
             d['author_email'],
-            dateutil.parser.parse(d['committed_date']),
+            parse_datetime(d['committed_date']),
             d['summary'],
             d['sha'],
         )
 
     @staticmethod
     def _search_git_repo(path):
+        import git
+
         while True:
             try:
                 return git.Repo(path)
@@ -71,8 +74,42 @@ class GitInfo(BaseInfo):
             except git.NoSuchPathError:
                 return None
 
+    @staticmethod
+    def _peel(repo, sha):
+        import git
+
+        try:
+            obj = git.Object.new_from_sha(repo, bytes.fromhex(sha))
+            while obj.type == 'tag':
+                obj = obj.object
+            return obj.hexsha
+        except (ValueError, git.GitError) as e:
+            logging.debug('Failed to peel Git object: %s: %s' % (sha, e))
+            return None
+
     @staticmethod
     def from_path(path):
+        try:
+            reader = GitReader.find(path)
+            if not reader:
+                logging.warning('Failed to fetch Git information: %s' % path)
+                return None
+            return GitInfo._from_reader(reader)
+        except (ValueError, KeyError, IOError, OSError, UnicodeError, zlib.error) as e:
+            logging.debug('Falling back to GitPython: %s' % e)
+        return GitInfo._from_git_python(path)
+
+    @staticmethod
+    def _from_reader(reader):
+        branch, sha = reader.head()
+        commit = reader.read_commit(sha)
+        committed_date = datetime(*time.localtime(commit['committed_date'])[:6])
+        summary = commit['message'].split('\n', 1)[0]
+        tags = GitTagIndex.load(reader.common_dir, reader.peel).find(sha)
+        return GitInfo(branch, tags, commit['author_name'], commit['author_email'], committed_date, summary, sha)
+
+    @staticmethod
+    def _from_git_python(path):
         repo = GitInfo._search_git_repo(path)
         if not repo:
             logging.warning('Failed to fetch Git information: %s' % path)
@@ -91,5 +128,7 @@ class GitInfo(BaseInfo):
         sha = ref.commit.hexsha
         epoch = ref.commit.committed_date
         committed_date = datetime(*time.localtime(epoch)[:6])
-        tags = [t.name for t in repo.tags if t.commit.hexsha == sha]
+        # Repo.common_dir is not available in old GitPython versions
+        common_dir = GitReader.find_common_dir(repo.git_dir)
+        tags = GitTagIndex.load(common_dir, lambda x: GitInfo._peel(repo, x)).find(sha)
         return GitInfo(branch, tags, author_name, author_email, committed_date, summary, sha)
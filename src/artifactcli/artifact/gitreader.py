@@ -0,0 +1,342 @@
+import glob
+import mmap
+import os
+import struct
+import zlib
+
+# object types in pack files
+PACK_OBJECT_TYPES = {1: 'commit', 2: 'tree', 3: 'blob', 4: 'tag'}
+OFS_DELTA = 6
+REF_DELTA = 7
+
+
+class GitReader(object):
+    """
+    Read HEAD and commit objects directly from the Git directory without GitPython
+
+    Loose objects and objects in pack files with version 2 indexes are supported, including deltified ones.
+    ValueError is raised for anything else so that the caller can fall back to GitPython.
+    """
+
+    def __init__(self, work_tree, git_dir, common_dir):
+        """
+        :param work_tree: path to the working tree
+        :param git_dir: path to the Git directory of the working tree
+        :param common_dir: path to the Git directory shared by all worktrees
+        """
+        self.work_tree = work_tree
+        self.git_dir = git_dir
+        self.common_dir = common_dir
+        self._pack_indexes = None
+
+    @classmethod
+    def find(cls, path):
+        """
+        Search the repository containing the path
+
+        :param path: path to a file or directory in the working tree
+        :return: GitReader object, or None when the path is not in a repository
+        """
+        if not os.path.exists(path):
+            return None
+
+        path = os.path.abspath(path)
+        while True:
+            dot_git = os.path.join(path, '.git')
+            if os.path.isdir(dot_git):
+                return cls._from_git_dir(path, dot_git)
+            if os.path.isfile(dot_git):
+                # worktrees and submodules have a file pointing at the Git directory
+                with open(dot_git) as f:
+                    line = f.readline().strip()
+                if not line.startswith('gitdir:'):
+                    raise ValueError('Unknown .git file: %s' % dot_git)
+                return cls._from_git_dir(path, os.path.join(path, line[len('gitdir:'):].strip()))
+
+            parent_dir = os.path.dirname(path)
+            if path == parent_dir:
+                return None
+            path = parent_dir
+
+    @classmethod
+    def _from_git_dir(cls, work_tree, git_dir):
+        git_dir = os.path.normpath(git_dir)
+        return cls(work_tree, git_dir, cls.find_common_dir(git_dir))
+
+    @classmethod
+    def find_common_dir(cls, git_dir):
+        """
+        :param git_dir: path to the Git directory of a working tree
+        :return: path to the Git directory shared by all worktrees
+        """
+        git_dir = os.path.normpath(git_dir)
+        try:
+            with open(os.path.join(git_dir, 'commondir')) as f:
+                return os.path.normpath(os.path.join(git_dir, f.read().strip()))
+        except IOError:
+            return git_dir
+
+    def head(self):
+        """
+        :return: tuple of (branch name or '' when detached, commit SHA)
+        """
+        with open(os.path.join(self.git_dir, 'HEAD')) as f:
+            s = f.read().strip()
+        if not s.startswith('ref:'):
+            return '', s
+
+        ref = s[len('ref:'):].strip()
+        branch = ref[len('refs/heads/'):] if ref.startswith('refs/heads/') else ref
+        return branch, self.resolve_ref(ref)
+
+    def resolve_ref(self, ref):
+        """
+        :param ref: full reference name, e.g. 'refs/heads/master'
+        :return: SHA hex string
+        """
+        for d in [self.git_dir, self.common_dir]:
+            try:
+                with open(os.path.join(d, *ref.split('/'))) as f:
+                    s = f.read().strip()
+            except IOError:
+                continue
+            if s.startswith('ref:'):
+                return self.resolve_ref(s[len('ref:'):].strip())
+            return s
+
+        try:
+            with open(os.path.join(self.common_dir, 'packed-refs')) as f:
+                for line in f:
+                    if not line.startswith(('#', '^')) and line.rstrip('\n').endswith(' ' + ref):
+                        return line.split(' ', 1)[0]
+        except IOError:
+            pass
+        raise ValueError('Failed to resolve Git reference: %s' % ref)
+
+    def read_object(self, sha):
+        """
+        :param sha: SHA hex string
+        :return: tuple of (object type, body in bytes)
+        """
+        path = os.path.join(self.common_dir, 'objects', sha[:2], sha[2:])
+        try:
+            with open(path, 'rb') as f:
+                data = zlib.decompress(f.read())
+        except IOError:
+            return self._read_packed_object(sha)
+        header, body = data.split(b'\0', 1)
+        obj_type, size = header.decode('ascii').split(' ')
+        if int(size) != len(body):
+            raise ValueError('Broken Git object: %s' % sha)
+        return obj_type, body
+
+    def read_commit(self, sha):
+        """
+        :param sha: commit SHA hex string
+        :return: dict with 'author_name', 'author_email', 'committed_date' (epoch seconds) and 'message'
+        """
+        obj_type, body = self.read_object(sha)
+        if obj_type != 'commit':
+            raise ValueError('Git object is not a commit: %s' % sha)
+
+        headers, _, message = body.partition(b'\n\n')
+        fields = {}
+        for line in headers.split(b'\n'):
+            if line.startswith(b' '):
+                continue  # continuation of a multi-line header (e.g. gpgsig)
+            k, _, v = line.partition(b' ')
+            fields.setdefault(k.decode('ascii'), v)
+
+        encoding = fields.get('encoding', b'utf-8').decode('ascii')
+        author_name, author_email, _ = self._parse_person(fields['author'].decode(encoding, 'replace'))
+        _, _, committed_date = self._parse_person(fields['committer'].decode(encoding, 'replace'))
+        return {
+            'author_name': author_name,
+            'author_email': author_email,
+            'committed_date': committed_date,
+            'message': message.decode(encoding, 'replace'),
+        }
+
+    def peel(self, sha):
+        """
+        :param sha: SHA hex string of a tag or commit object
+        :return: SHA of the commit which the object points at
+        """
+        while True:
+            obj_type, body = self.read_object(sha)
+            if obj_type != 'tag':
+                return sha
+            sha = body.split(b'\n', 1)[0].split(b' ', 1)[1].decode('ascii')
+
+    def _read_packed_object(self, sha):
+        binsha = bytes.fromhex(sha)
+        for pack_path, index in self._load_pack_indexes():
+            offset = self._find_offset(index, binsha)
+            if offset is not None:
+                return self._read_pack_entry(pack_path, offset)
+        raise ValueError('Git object not found: %s' % sha)
+
+    def _load_pack_indexes(self):
+        if self._pack_indexes is None:
+            indexes = []
+            for idx_path in sorted(glob.glob(os.path.join(self.common_dir, 'objects', 'pack', 'pack-*.idx'))):
+                with open(idx_path, 'rb') as f:
+                    # mapped rather than read so that a lookup touches only the pages it bisects
+                    index = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if os.fstat(f.fileno()).st_size else b''
+                if index[:8] != b'\377tOc\0\0\0\2':
+                    raise ValueError('Unsupported Git pack index: %s' % idx_path)
+                indexes.append((idx_path[:-len('.idx')] + '.pack', index))
+            self._pack_indexes = indexes
+        return self._pack_indexes
+
+    @classmethod
+    def _find_offset(cls, index, binsha):
+        """
+        Look up an object in a version 2 pack index
+
+        The index consists of the header, 256 fan-out counts, the sorted SHAs, their CRC32 checksums,
+        their 4-byte offsets and the 8-byte offsets for the entries beyond 2 GiB.
+
+        :param index: index file content in bytes or memory-mapped
+        :param binsha: binary SHA of the object
+        :return: offset of the object in the pack file, or None if not found
+        """
+        n, = struct.unpack_from('>I', index, 8 + 255 * 4)
+        lo, = struct.unpack_from('>I', index, 8 + (binsha[0] - 1) * 4) if binsha[0] else (0,)
+        hi, = struct.unpack_from('>I', index, 8 + binsha[0] * 4)
+        shas_start = 8 + 256 * 4
+
+        while lo < hi:
+            mid = (lo + hi) // 2
+            pos = shas_start + mid * 20
+            x = index[pos:pos + 20]
+            if x == binsha:
+                offsets_start = shas_start + n * 24
+                offset, = struct.unpack_from('>I', index, offsets_start + mid * 4)
+                if offset & 0x80000000:
+                    offset, = struct.unpack_from('>Q', index, offsets_start + n * 4 + (offset & 0x7fffffff) * 8)
+                return offset
+            if x < binsha:
+                lo = mid + 1
+            else:
+                hi = mid
+        return None
+
+    def _read_pack_entry(self, pack_path, offset):
+        """
+        Read an object from a pack file resolving the delta chain
+
+        :param pack_path: path to the pack file
+        :param offset: offset of the object entry
+        :return: tuple of (object type, body in bytes)
+        """
+        deltas = []
+        with open(pack_path, 'rb') as f:
+            while True:
+                f.seek(offset)
+                type_num, size = self._read_entry_header(f)
+                if type_num == OFS_DELTA:
+                    base_offset = offset - self._read_base_distance(f)
+                    deltas.append(self._inflate(f, size))
+                    offset = base_offset
+                elif type_num == REF_DELTA:
+                    base_sha = f.read(20).hex()
+                    deltas.append(self._inflate(f, size))
+                    obj_type, body = self.read_object(base_sha)
+                    break
+                elif type_num in PACK_OBJECT_TYPES:
+                    obj_type, body = PACK_OBJECT_TYPES[type_num], self._inflate(f, size)
+                    break
+                else:
+                    raise ValueError('Unknown Git pack entry type: %d at %s:%d' % (type_num, pack_path, offset))
+
+        for delta in reversed(deltas):
+            body = self._apply_delta(body, delta)
+        return obj_type, body
+
+    @classmethod
+    def _read_entry_header(cls, f):
+        c = f.read(1)[0]
+        type_num = (c >> 4) & 7
+        size = c & 0x0f
+        shift = 4
+        while c & 0x80:
+            c = f.read(1)[0]
+            size |= (c & 0x7f) << shift
+            shift += 7
+        return type_num, size
+
+    @classmethod
+    def _read_base_distance(cls, f):
+        c = f.read(1)[0]
+        distance = c & 0x7f
+        while c & 0x80:
+            c = f.read(1)[0]
+            distance = ((distance + 1) << 7) | (c & 0x7f)
+        return distance
+
+    @classmethod
+    def _inflate(cls, f, size, chunk_size=64 * 1024):
+        d = zlib.decompressobj()
+        data = []
+        while not d.eof:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                raise ValueError('Truncated Git pack entry')
+            data.append(d.decompress(chunk))
+        data = b''.join(data)
+        if len(data) != size:
+            raise ValueError('Broken Git pack entry')
+        return data
+
+    @classmethod
+    def _apply_delta(cls, base, delta):
+        pos, src_size = cls._read_delta_size(delta, 0)
+        pos, dst_size = cls._read_delta_size(delta, pos)
+        if len(base) != src_size:
+            raise ValueError('Git delta base size mismatch')
+
+        out = bytearray()
+        while pos < len(delta):
+            op = delta[pos]
+            pos += 1
+            if op & 0x80:
+                # copy from the base
+                offset = size = 0
+                for i in range(4):
+                    if op & (1 << i):
+                        offset |= delta[pos] << (8 * i)
+                        pos += 1
+                for i in range(3):
+                    if op & (1 << (4 + i)):
+                        size |= delta[pos] << (8 * i)
+                        pos += 1
+                out += base[offset:offset + (size or 0x10000)]
+            elif op:
+                # insert the literal data
+                out += delta[pos:pos + op]
+                pos += op
+            else:
+                raise ValueError('Invalid Git delta instruction')
+
+        if len(out) != dst_size:
+            raise ValueError('Git delta result size mismatch')
+        return bytes(out)
+
+    @classmethod
+    def _read_delta_size(cls, delta, pos):
+        size = shift = 0
+        while True:
+            c = delta[pos]
+            pos += 1
+            size |= (c & 0x7f) << shift
+            shift += 7
+            if not c & 0x80:
+                return pos, size
+
+    @classmethod
+    def _parse_person(cls, s):
+        # e.g. "John Doe <john@example.com> 1420000000 +0900"
+        name, _, rest = s.partition(' <')
+        email, _, timestamp = rest.partition('> ')
+        return name, email, int(timestamp.split(' ')[0])
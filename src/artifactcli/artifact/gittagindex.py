@@ -0,0 +1,154 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+from artifactcli.util import CaseClass
+from artifactcli.util.cachedir import DEFAULT_CACHE_DIR
+
+TAG_PREFIX = 'refs/tags/'
+
+
+class GitTagIndex(CaseClass):
+    """
+    Tag names by commit SHA, built from packed-refs and loose refs
+
+    Annotated tags are peeled only when packed-refs does not record the peeled value.
+    The index is cached per repository and rebuilt when the mtime of packed-refs or any tag directory changes,
+    reusing the peeled values of unchanged tags.
+    """
+
+    # in-process cache: {git_dir: (refs key, index)}
+    _memo = {}
+
+    def __init__(self, tags):
+        """
+        :param tags: dict of tag name to tuple of (object SHA, peeled commit SHA)
+        """
+        super(GitTagIndex, self).__init__(['tags'])
+        self.tags = tags
+        self._by_commit = {}
+        for name, (sha, peeled) in tags.items():
+            self._by_commit.setdefault(peeled, []).append(name)
+
+    def find(self, sha):
+        """
+        :param sha: commit SHA hex string
+        :return: sorted list of tag names pointing at the commit
+        """
+        return sorted(self._by_commit.get(sha, []))
+
+    @classmethod
+    def load(cls, git_dir, peel, cache_dir=None):
+        """
+        Get the tag index of the repository, using the cache if refs are unchanged
+
+        :param git_dir: path to the (common) Git directory
+        :param peel: function which takes an object SHA and returns the commit SHA it points at, or None
+        :param cache_dir: cache root directory
+        :return: GitTagIndex object
+        """
+        git_dir = os.path.abspath(git_dir)
+        key = cls._refs_key(git_dir)
+
+        memo = cls._memo.get(git_dir)
+        if memo and memo[0] == key:
+            return memo[1]
+
+        cache_path = os.path.join(os.path.expanduser(cache_dir or DEFAULT_CACHE_DIR), 'git-tags',
+                                  '%s.json' % hashlib.sha1(git_dir.encode('utf-8')).hexdigest())
+        cached_key, cached_tags = cls._read_cache(cache_path)
+        if cached_key == key:
+            index = cls(cached_tags)
+        else:
+            tags = {}
+            for name, (sha, peeled) in cls.read_refs(git_dir).items():
+                if peeled is None:
+                    old = cached_tags.get(name)
+                    peeled = old[1] if old and old[0] == sha else peel(sha)
+                tags[name] = (sha, peeled)
+            index = cls(tags)
+            cls._write_cache(cache_path, key, tags)
+
+        cls._memo[git_dir] = (key, index)
+        return index
+
+    @classmethod
+    def read_refs(cls, git_dir):
+        """
+        :param git_dir: path to the (common) Git directory
+        :return: dict of tag name to tuple of (object SHA, peeled commit SHA or None if unknown)
+        """
+        refs = {}
+
+        try:
+            with open(os.path.join(git_dir, 'packed-refs')) as f:
+                lines = f.read().splitlines()
+        except IOError:
+            lines = []
+
+        # with the "peeled" trait, tags without a "^" line are known not to be annotated
+        peeled_known = bool(lines) and lines[0].startswith('#') and 'peeled' in lines[0].split(':', 1)[-1].split()
+        last = None
+        for line in lines:
+            if line.startswith('#') or not line:
+                continue
+            if line.startswith('^'):
+                if last:
+                    refs[last] = (refs[last][0], line[1:].strip())
+                continue
+            sha, ref = line.split(' ', 1)
+            last = None
+            if ref.startswith(TAG_PREFIX):
+                last = ref[len(TAG_PREFIX):]
+                refs[last] = (sha, sha if peeled_known else None)
+
+        # loose refs take precedence over packed refs
+        tags_dir = os.path.join(git_dir, 'refs', 'tags')
+        for root, dirs, files in os.walk(tags_dir):
+            for file_name in files:
+                path = os.path.join(root, file_name)
+                try:
+                    with open(path) as f:
+                        sha = f.read().strip()
+                except IOError:
+                    continue
+                if len(sha) == 40:
+                    refs[os.path.relpath(path, tags_dir).replace(os.sep, '/')] = (sha, None)
+        return refs
+
+    @classmethod
+    def _refs_key(cls, git_dir):
+        paths = [os.path.join(git_dir, 'packed-refs')] + \
+            [root for root, dirs, files in os.walk(os.path.join(git_dir, 'refs', 'tags'))]
+        key = []
+        for path in sorted(paths):
+            try:
+                key.append([os.path.relpath(path, git_dir), os.stat(path).st_mtime_ns])
+            except OSError:
+                pass
+        return key
+
+    @classmethod
+    def _read_cache(cls, path):
+        try:
+            with open(path) as f:
+                d = json.load(f)
+            return d['key'], dict((k, tuple(v)) for k, v in d['tags'].items())
+        except (IOError, ValueError, KeyError, TypeError):
+            return None, {}
+
+    @classmethod
+    def _write_cache(cls, path, key, tags):
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'w') as f:
+                    json.dump({'key': key, 'tags': tags}, f)
+                os.replace(tmp_path, path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+        except (IOError, OSError) as e:
+            logging.debug('Failed to write Git tag cache: %s' % e)
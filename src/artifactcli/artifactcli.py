@@ -1,11 +1,23 @@
 import sys
 import os
 from .settings import Settings
+from .operation import HelpOperation, DaemonOperation
+from . import daemon
 
 
 def main():
     """
     Main function
     """
-    settings = Settings().parse_args(sys.argv).load_environ(os.environ).load_config()
+    settings = Settings().parse_args(sys.argv)
+    if isinstance(settings.operation, DaemonOperation):
+        return settings.configure_logging().operation.run()
+
+    # run in the daemon if it is running
+    if not isinstance(settings.operation, HelpOperation):
+        status = daemon.forward(sys.argv, os.environ)
+        if status is not None:
+            return status
+
+    settings = settings.load_environ(os.environ).load_config()
     return settings.configure_logging().operation.run(settings.repo)
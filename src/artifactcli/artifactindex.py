@@ -0,0 +1,143 @@
+from bisect import insort
+from collections import defaultdict
+
+
+class _Shard(object):
+    """
+    Lookup tables of the artifacts of one artifact id
+    """
+
+    __slots__ = ['revisions', 'entries', 'digests']
+
+    def __init__(self):
+        self.revisions = defaultdict(list)  # (version, packaging) -> sorted revisions
+        self.entries = defaultdict(list)  # (version, packaging, revision) -> artifacts
+        self.digests = defaultdict(list)  # (version, packaging, size, md5) -> artifacts
+
+
+class ArtifactIndex(dict):
+    """
+    Mapping from artifact id to the list of artifacts, with lookup tables
+
+    Values keep the same order as the persisted index.
+    Lookup tables are built from Artifact.lookup_key(), so lazy artifacts are materialized only when found.
+    Each artifact id has its own tables, so that replacing one artifact id does not touch the others.
+    Replace a list (e.g. ``index[artifact_id] += xs``) or use append/remove to keep the lookup tables in sync.
+    """
+
+    def __init__(self, mapping=None):
+        super(ArtifactIndex, self).__init__()
+        self._shards = {}  # artifact_id -> _Shard
+        for k, v in (mapping or {}).items():
+            self[k] = v
+
+    def __missing__(self, artifact_id):
+        self[artifact_id] = []
+        return dict.__getitem__(self, artifact_id)
+
+    def __setitem__(self, artifact_id, artifacts):
+        xs = list(artifacts)
+        dict.__setitem__(self, artifact_id, xs)
+        self._shards[artifact_id] = shard = _Shard()
+        for x in xs:
+            self._register(shard, x)
+
+    def __delitem__(self, artifact_id):
+        dict.__delitem__(self, artifact_id)
+        del self._shards[artifact_id]
+
+    def __reduce__(self):
+        return self.__class__, (dict(self),)
+
+    def copy(self):
+        return self.__class__(self)
+
+    def update(self, *args, **kwargs):
+        for k, v in dict(*args, **kwargs).items():
+            self[k] = v
+
+    def clear(self):
+        dict.clear(self)
+        self._shards.clear()
+
+    def merge(self, other):
+        """
+        Make a new index with the artifact ids of the other index replaced, leaving both indexes unchanged
+
+        Only the references to the lists and lookup tables are copied, so this takes time proportional to
+        the number of artifact ids regardless of the number of artifacts.
+        The new index shares them with the original indexes, which should not be modified in place afterwards.
+
+        :param other: ArtifactIndex object with the new lists
+        :return: new ArtifactIndex object
+        """
+        index = self.__class__()
+        dict.update(index, self)
+        dict.update(index, other)
+        index._shards.update(self._shards)
+        index._shards.update(other._shards)
+        return index
+
+    def append(self, artifact):
+        """
+        Add one artifact to the end of the list of its artifact id
+
+        :param artifact: artifact to add
+        :return: None
+        """
+        artifact_id = artifact.basic_info.artifact_id
+        self[artifact_id].append(artifact)
+        self._register(self._shards[artifact_id], artifact)
+
+    def remove(self, artifact_id, version, packaging, revision):
+        """
+        Remove all artifacts matching the specified revision
+
+        :return: None
+        """
+        xs = self._shard(artifact_id).entries.get((version, packaging, revision))
+        if not xs:
+            return
+        removing = set(id(x) for x in xs)
+        self[artifact_id] = [x for x in self[artifact_id] if id(x) not in removing]
+
+    def find(self, artifact_id, version, packaging, revision):
+        """
+        :return: list of artifacts with the exact revision (normally at most one)
+        """
+        return list(self._shard(artifact_id).entries.get((version, packaging, revision), []))
+
+    def find_all(self, artifact_id, version, packaging):
+        """
+        :return: list of artifacts sorted by revision
+        """
+        shard = self._shard(artifact_id)
+        revisions = shard.revisions.get((version, packaging), [])
+        return [x for r in revisions for x in shard.entries[(version, packaging, r)]]
+
+    def find_latest(self, artifact_id, version, packaging):
+        """
+        :return: list of artifacts with the largest revision (normally at most one)
+        """
+        revisions = self._shard(artifact_id).revisions.get((version, packaging))
+        return self.find(artifact_id, version, packaging, revisions[-1]) if revisions else []
+
+    def find_by_digest(self, artifact_id, version, packaging, size, md5):
+        """
+        :return: list of artifacts with the same file size and MD5 digest
+        """
+        return list(self._shard(artifact_id).digests.get((version, packaging, size, md5), []))
+
+    _empty_shard = _Shard()
+
+    def _shard(self, artifact_id):
+        return self._shards.get(artifact_id, self._empty_shard)
+
+    @classmethod
+    def _register(cls, shard, artifact):
+        _, version, packaging, revision, size, md5 = artifact.lookup_key()
+        entries = shard.entries[(version, packaging, revision)]
+        if not entries:
+            insort(shard.revisions[(version, packaging)], revision)
+        entries.append(artifact)
+        shard.digests[(version, packaging, size, md5)].append(artifact)
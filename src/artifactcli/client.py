@@ -0,0 +1,119 @@
+import os
+from copy import deepcopy
+from .artifact import BasicInfo
+
+
+class ArtifactClient(object):
+    """
+    Python API to manage artifacts in a group
+
+    One client keeps a storage session and the loaded index data across calls,
+    and is safe to use from multiple threads.
+    Calls on the same artifact id are serialized by the repository lock for the id,
+    and calls on different artifact ids run in parallel.
+    Returned artifacts are copies, so modifying them does not affect the client.
+
+    e.g.
+        client = ArtifactClient('com.example', bucket='my-bucket')
+        art = client.upload('/path/to/awesome-assembly-1.2.3.jar')
+        client.download('/tmp/awesome-assembly-1.2.3.jar', art.basic_info.revision)
+    """
+
+    def __init__(self, group_id, repo=None, **options):
+        """
+        :param group_id: group id
+        :param repo: Repository object to use instead of creating one from the options
+        :param options: settings by the names of the command line option destinations,
+                        e.g. access_key, secret_key, bucket, region, config, no_cache, content_addressed
+                        Settings not given are read from the configuration file as the command does.
+        """
+        self.group_id = group_id
+        self.repo = repo or self._make_repository(group_id, options)
+
+    @classmethod
+    def _make_repository(cls, group_id, options):
+        from .settings import Settings
+        from .operation import ListOperation
+
+        opts = vars(Settings.parser.get_default_values())
+        unknown = sorted(set(options) - set(opts))
+        if unknown:
+            raise ValueError('Unknown options: %s' % ', '.join(unknown))
+        opts.update(options)
+
+        settings = Settings(ListOperation(group_id, []), opts).load_environ(os.environ).load_config()
+        if settings.repo is None:
+            raise ValueError('Failed to configure the repository for group: %s' % group_id)
+        return settings.repo
+
+    def _artifact_id(self, path):
+        return BasicInfo.from_path(self.group_id, path).artifact_id
+
+    def list(self, artifact_id=None):
+        """
+        :param artifact_id: artifact id to list (None for all artifacts in the group)
+        :return: sorted list of artifacts
+        """
+        if artifact_id is None:
+            self.repo.load_all()
+            arts = [x for xs in self.repo.snapshot().values() for x in xs]
+        else:
+            self.repo.load(artifact_id)
+            arts = self.repo.snapshot().get(artifact_id, [])
+        return deepcopy(sorted(arts))
+
+    def info(self, file_name, revision=None):
+        """
+        :param file_name: file name of the artifact, e.g. awesome-assembly-1.2.3.jar
+        :param revision: revision number (None for the latest)
+        :return: artifact, or raise ValueError when not found
+        """
+        artifact_id = self._artifact_id(file_name)
+        with self.repo.lock(artifact_id):
+            self.repo.load(artifact_id)
+            return deepcopy(self.repo.get_artifact(file_name, revision))
+
+    def upload(self, local_path, force=False, print_only=False):
+        """
+        :param local_path: path to the file to upload
+        :param force: upload even if the same file is already uploaded
+        :param print_only: do not upload actually
+        :return: uploaded artifact with its new revision, or the existing one when it is already uploaded
+        """
+        artifact_id = self._artifact_id(local_path)
+        with self.repo.lock(artifact_id):
+            self.repo.load(artifact_id)
+            art = self.repo.upload(local_path, force=force, print_only=print_only)
+            if not print_only:
+                self.repo.save(artifact_id)
+            return deepcopy(art)
+
+    def download(self, local_path, revision=None, print_only=False):
+        """
+        :param local_path: destination path whose file name identifies the artifact
+        :param revision: revision number (None for the latest)
+        :param print_only: do not download actually
+        :return: downloaded artifact, or raise ValueError when not found
+        """
+        if revision is None:
+            return deepcopy(self.repo.download_latest(local_path, print_only=print_only))
+
+        artifact_id = self._artifact_id(local_path)
+        with self.repo.lock(artifact_id):
+            self.repo.load(artifact_id)
+            return deepcopy(self.repo.download(local_path, revision, print_only=print_only))
+
+    def delete(self, file_name, revision, print_only=False):
+        """
+        :param file_name: file name of the artifact
+        :param revision: revision number to delete
+        :param print_only: do not delete actually
+        :return: deleted artifact, or raise ValueError when not found
+        """
+        artifact_id = self._artifact_id(file_name)
+        with self.repo.lock(artifact_id):
+            self.repo.load(artifact_id)
+            art = self.repo.delete(file_name, revision, print_only=print_only)
+            if not print_only:
+                self.repo.save(artifact_id)
+            return deepcopy(art)
@@ -0,0 +1,243 @@
+import io
+import json
+import logging
+import os
+import socket
+import struct
+import sys
+import threading
+import traceback
+from contextlib import contextmanager
+from socketserver import ThreadingMixIn, UnixStreamServer, StreamRequestHandler
+from .util.cachedir import DEFAULT_CACHE_DIR
+
+# environment variables passed from the client to the daemon
+FORWARDED_ENV = ['AWS_ACCESS_KEY_ID', 'AWS_SECRET_ACCESS_KEY', 'AWS_DEFAULT_REGION']
+
+
+def socket_path(env=None):
+    """
+    :param env: environment variables
+    :return: path to the Unix socket, taken from ARTIFACT_CLI_SOCKET if set
+    """
+    env = os.environ if env is None else env
+    return os.path.expanduser(env.get('ARTIFACT_CLI_SOCKET') or os.path.join(DEFAULT_CACHE_DIR, 'daemon.sock'))
+
+
+def forward(argv, env, path=None):
+    """
+    Run the command in the daemon if it is running
+
+    :param argv: command line arguments including the program name
+    :param env: environment variables
+    :param path: socket path (default: socket_path(env))
+    :return: exit status, or None when the daemon is not available
+             Once the request is sent, the command is never run locally, since the daemon may have run it.
+    """
+    if env.get('ARTIFACT_CLI_NO_DAEMON'):
+        return None
+
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(path or socket_path(env))
+    except (IOError, OSError):
+        sock.close()
+        return None
+
+    request = {
+        'argv': list(argv),
+        'env': dict((k, env[k]) for k in FORWARDED_ENV if k in env),
+        'cwd': os.getcwd(),
+    }
+    try:
+        with sock, sock.makefile('rwb') as f:
+            f.write(json.dumps(request).encode('utf-8') + b'\n')
+            f.flush()
+            line = f.readline()
+        if not line:
+            raise ValueError('connection closed without a response')
+        response = json.loads(line.decode('utf-8'))
+    except (IOError, OSError, ValueError) as e:
+        logging.error('Failed to run the command in the daemon: %s' % e)
+        return 1
+    sys.stdout.write(response['stdout'])
+    sys.stdout.flush()
+    sys.stderr.write(response['stderr'])
+    sys.stderr.flush()
+    return response['status']
+
+
+class ThreadLocalStream(object):
+    """
+    Stream which writes to the stream set for the current thread, or to the default one
+    """
+
+    def __init__(self, default):
+        self.default = default
+        self._local = threading.local()
+
+    def set(self, stream):
+        self._local.stream = stream
+
+    @property
+    def current(self):
+        return getattr(self._local, 'stream', None) or self.default
+
+    def __getattr__(self, name):
+        return getattr(self.current, name)
+
+
+class ArtifactDaemon(ThreadingMixIn, UnixStreamServer):
+    """
+    Server which runs commands forwarded from the CLI in a long-running process
+
+    Repositories are kept per settings, so S3 sessions, connection pools and parsed indexes stay warm.
+    Index data are revalidated with their ETags on every command.
+    Each connection is served in its own thread, and its output and log records are captured per thread.
+    Commands from the same working directory run concurrently; the others wait for them,
+    since the working directory is shared by the threads.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, path):
+        """
+        :param path: socket path
+        """
+        self.path = path
+        self.repo_cache = {}
+        self._home = os.getcwd()
+        self._cwd = None
+        self._running = 0  # number of commands running in self._cwd
+        self._handlers = []  # log handlers of the running commands
+        self._root_level = None
+        self._cond = threading.Condition()
+
+        if os.path.exists(path):
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(path)
+            except (IOError, OSError):
+                os.unlink(path)  # stale socket
+            else:
+                raise ValueError('Daemon is already running: %s' % path)
+            finally:
+                probe.close()
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        old_umask = os.umask(0o077)
+        try:
+            UnixStreamServer.__init__(self, path, DaemonRequestHandler)
+        finally:
+            os.umask(old_umask)
+
+    def verify_request(self, request, client_address):
+        if not hasattr(socket, 'SO_PEERCRED'):
+            return True
+        creds = request.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize('3i'))
+        _, uid, _ = struct.unpack('3i', creds)
+        if uid != os.getuid():
+            logging.warning('Rejected a connection from uid %d' % uid)
+            return False
+        return True
+
+    def server_close(self):
+        UnixStreamServer.server_close(self)
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+    def run_command(self, argv, env, cwd):
+        """
+        :return: tuple of (exit status, stdout text, stderr text)
+        """
+        from .settings import Settings
+        from .operation import DaemonOperation
+
+        out, err = io.StringIO(), io.StringIO()
+        handler = logging.StreamHandler(err)
+        handler.setFormatter(logging.Formatter('[%(levelname)s] %(message)s'))
+        handler.setLevel(logging.INFO)
+        thread_id = threading.get_ident()
+        handler.addFilter(lambda record: record.thread == thread_id)
+        self._capture(handler, out, err)
+
+        try:
+            with self._working_directory(cwd):
+                settings = Settings().parse_args(argv)
+                if isinstance(settings.operation, DaemonOperation):
+                    logging.error('Daemon is already running: %s' % self.path)
+                    status = 1
+                else:
+                    settings = settings.load_environ(env).load_config(self.repo_cache)
+                    if settings.options:
+                        handler.setLevel(settings.options['log_level'])
+                        self._update_log_level()
+                    status = settings.operation.run(settings.repo)
+        except SystemExit as e:
+            status = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+        except Exception:
+            err.write(traceback.format_exc())
+            status = 1
+        finally:
+            self._release(handler)
+        return status, out.getvalue(), err.getvalue()
+
+    def _capture(self, handler, out, err):
+        """
+        Send the output and the log records of the current thread to the buffers
+        """
+        with self._cond:
+            for name in ['stdout', 'stderr']:
+                if not isinstance(getattr(sys, name), ThreadLocalStream):
+                    setattr(sys, name, ThreadLocalStream(getattr(sys, name)))
+            sys.stdout.set(out)
+            sys.stderr.set(err)
+            if not self._handlers:
+                self._root_level = logging.getLogger().level
+            self._handlers.append(handler)
+            logging.getLogger().addHandler(handler)
+            self._update_log_level()
+
+    def _release(self, handler):
+        with self._cond:
+            sys.stdout.set(None)
+            sys.stderr.set(None)
+            logging.getLogger().removeHandler(handler)
+            self._handlers.remove(handler)
+            self._update_log_level()
+
+    def _update_log_level(self):
+        # the root logger passes the records needed by any of the running commands
+        with self._cond:
+            levels = [h.level for h in self._handlers]
+            logging.getLogger().setLevel(min(levels) if levels else self._root_level)
+
+    @contextmanager
+    def _working_directory(self, cwd):
+        with self._cond:
+            while self._running and self._cwd != cwd:
+                self._cond.wait()
+            if not self._running:
+                os.chdir(cwd)
+                self._cwd = cwd
+            self._running += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._running -= 1
+                if not self._running:
+                    os.chdir(self._home)
+                    self._cwd = None
+                    self._cond.notify_all()
+
+
+class DaemonRequestHandler(StreamRequestHandler):
+    def handle(self):
+        line = self.rfile.readline()
+        if not line:
+            return
+        request = json.loads(line.decode('utf-8'))
+        status, out, err = self.server.run_command(request['argv'], request['env'], request['cwd'])
+        response = {'status': status, 'stdout': out, 'stderr': err}
+        self.wfile.write(json.dumps(response).encode('utf-8') + b'\n')
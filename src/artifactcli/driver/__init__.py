@@ -1,2 +1,6 @@
 from .s3driver import S3Driver
 from .mockdriver import MockDriver
+from .filesystemdriver import FileSystemDriver
+from .indexcache import IndexCache
+from .blobcache import BlobCache
+from .simulateddriver import SimulatedDriver, SlowDown
@@ -1,10 +1,21 @@
+import time
+import uuid
 from abc import ABCMeta, abstractmethod
 from artifactcli.util import CaseClass
 
+# locations of the index files in the group, shared by the drivers
+DEFAULT_INDEX_PREFIX = '.meta/index-'
+DEFAULT_DELTA_PREFIX = '.meta/delta-'
+DEFAULT_LATEST_PREFIX = '.meta/latest-'
+DEFAULT_REVISION_PREFIX = '.meta/revision-'
+
 
 class BaseDriver(CaseClass):
     __metaclass__ = ABCMeta
 
+    # expected ETag for the conditional write which succeeds only when the index does not exist
+    INDEX_ABSENT = ''
+
     @abstractmethod
     def artifact_ids(self):
         """abstract method"""
@@ -14,13 +25,104 @@ class BaseDriver(CaseClass):
         """abstract method"""
 
     @abstractmethod
-    def write_index(self, artifact_id, s):
+    def write_index(self, artifact_id, s, if_match=None):
+        """
+        :param artifact_id: artifact id to write
+        :param s: index json text in unicode, or bytes in a binary format
+        :param if_match: write only if the current index has this ETag, or does not exist if INDEX_ABSENT
+                         (None to write unconditionally)
+        :return: True if written, False if the index has been modified by others
+        """
+
+    @abstractmethod
+    def delta_names(self, artifact_id=None):
+        """
+        :param artifact_id: artifact id (None for all artifact ids)
+        :return: sorted list of the names of the index deltas,
+                 or dict of artifact id to the sorted list when artifact_id is None
+        """
+
+    @abstractmethod
+    def read_delta(self, artifact_id, name):
+        """
+        :param artifact_id: artifact id
+        :param name: delta name
+        :return: delta json text in unicode, or None if it has been deleted
+        """
+
+    @abstractmethod
+    def append_delta(self, artifact_id, s, after=None):
+        """
+        :param artifact_id: artifact id
+        :param s: delta json text in unicode
+        :param after: name of the last delta known to the caller, which the new name sorts after
+                      even when the clock is behind
+        :return: name of the new delta, which sorts after the existing ones
+        """
+
+    @abstractmethod
+    def delete_deltas(self, artifact_id, names):
         """abstract method"""
 
     @abstractmethod
-    def upload(self, local_path, remote_path, md5):
+    def read_latest(self, artifact_id, version, packaging, with_etag=False):
+        """
+        :param with_etag: if True, also return the ETag of the pointer, or INDEX_ABSENT if it does not exist
+        :return: latest pointer json text in unicode, or None if it does not exist,
+                 or tuple of the text and the ETag when with_etag is True
+        """
+
+    @abstractmethod
+    def write_latest(self, artifact_id, version, packaging, s, if_match=None):
+        """
+        :param s: latest pointer json text in unicode
+        :param if_match: write only if the current pointer has this ETag, or does not exist if INDEX_ABSENT
+                         (None to write unconditionally)
+        :return: True if written, False if the pointer has been modified by others
+        """
+
+    @abstractmethod
+    def delete_latest(self, artifact_id, version, packaging):
         """abstract method"""
 
+    @abstractmethod
+    def reserve_revision(self, artifact_id, version, packaging, revision):
+        """
+        Create the marker of the revision only if it does not exist
+
+        :return: True if reserved, False if the revision has been taken by others
+        """
+
+    @abstractmethod
+    def release_revision(self, artifact_id, version, packaging, revision):
+        """
+        Delete the marker of the revision, so that the revision can be reused after its artifact is deleted
+        """
+
+    @abstractmethod
+    def is_reserved(self, artifact_id, version, packaging, revision):
+        """
+        :return: True if the marker of the revision exists
+        """
+
+    @abstractmethod
+    def upload(self, local_path, remote_path, md5, multipart_etag=None):
+        """abstract method"""
+
+    def index_etag(self, artifact_id):
+        """
+        :param artifact_id: artifact id
+        :return: ETag of the index data last read or written, or None if not available
+        """
+        return None
+
+    def part_size(self, size):
+        """
+        :param size: file size in bytes
+        :return: part size in bytes when the file will be uploaded in parts, otherwise None
+        """
+        return None
+
     @abstractmethod
     def download(self, remote_path, local_path, md5):
         """abstract method"""
@@ -28,3 +130,22 @@ class BaseDriver(CaseClass):
     @abstractmethod
     def delete(self, remote_path, md5):
         """abstract method"""
+
+    @abstractmethod
+    def exists(self, remote_path, md5):
+        """abstract method"""
+
+    @abstractmethod
+    def copy(self, src_path, dst_path, md5):
+        """abstract method"""
+
+    @classmethod
+    def new_delta_name(cls, after=None):
+        """
+        :param after: delta name which the new name should sort after
+        :return: unique name ordered by the creation time, or following the given name
+        """
+        t = int(time.time() * 1000)
+        if after:
+            t = max(t, int(after.split('-', 1)[0]) + 1)
+        return '%013d-%s.json' % (t, uuid.uuid4().hex[:16])
@@ -0,0 +1,175 @@
+import hashlib
+import logging
+import os
+import shutil
+import stat
+import tempfile
+from contextlib import contextmanager
+from artifactcli.util import CaseClass
+from artifactcli.util.cachedir import DEFAULT_CACHE_DIR
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+FICLONE = 0x40049409  # linux/fs.h
+
+
+class BlobCache(CaseClass):
+    """
+    Local copies of downloaded files keyed by MD5 digest, evicted in least-recently-used order
+
+    The cache directory can be shared by concurrent processes; they are coordinated with file locks.
+    Cached files are read-only and handed out by reflink or copy, never shared with the destination path,
+    and a hit is served only if its MD5 digest still matches.
+    """
+
+    def __init__(self, max_size, cache_dir=None):
+        """
+        :param max_size: maximum total size of the cached files in bytes
+        :param cache_dir: cache root directory
+        """
+        super(BlobCache, self).__init__(['path', 'max_size'])
+        self.path = os.path.join(os.path.expanduser(cache_dir or DEFAULT_CACHE_DIR), 'blobs')
+        self.max_size = max_size
+
+    def entry_path(self, md5):
+        return os.path.join(self.path, md5[:2], md5)
+
+    def fetch(self, md5, local_path, fill):
+        """
+        Put the file with the MD5 digest to the local path, filling the cache on a miss
+
+        :param md5: MD5 digest hex string
+        :param local_path: local destination path
+        :param fill: function which takes a temporary path and downloads the file to it with verification
+        :return: True if the file was in the cache
+        """
+        with self._lock(self._entry_lock_path(md5)):
+            try:
+                if self._checkout(md5, local_path):
+                    logging.info('Found in cache: %s' % self.entry_path(md5))
+                    return True
+            except ValueError as e:
+                logging.warning('%s' % e)
+                with self._lock(self._global_lock_path()):
+                    if os.path.exists(self.entry_path(md5)):
+                        os.remove(self.entry_path(md5))
+
+            os.makedirs(os.path.dirname(self.entry_path(md5)), exist_ok=True)
+            tmp_path = os.path.join(os.path.dirname(self.entry_path(md5)), '.%s.download' % md5)
+            try:
+                fill(tmp_path)
+                if os.path.getsize(tmp_path) > self.max_size:
+                    logging.debug('Too large to cache: %s' % local_path)
+                    shutil.move(tmp_path, local_path)
+                    return False
+
+                os.chmod(tmp_path, stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH)
+                with self._lock(self._global_lock_path()):
+                    os.replace(tmp_path, self.entry_path(md5))
+                    self._evict(keep=md5)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+
+            self._checkout(md5, local_path, verify=False)
+        return False
+
+    def size(self):
+        return sum(os.path.getsize(p) for p in self._entries())
+
+    def _checkout(self, md5, local_path, verify=True):
+        """
+        Clone the cached file to the local path
+
+        :param md5: MD5 digest hex string
+        :param local_path: local destination path
+        :param verify: check the MD5 digest of the clone before replacing the local path
+        :return: True if the file was in the cache, or raise ValueError when the cached file is corrupted
+        """
+        with self._lock(self._global_lock_path(), shared=True):
+            path = self.entry_path(md5)
+            if not os.path.exists(path):
+                return False
+
+            # mark as recently used
+            os.utime(path)
+
+            dst_dir = os.path.dirname(os.path.abspath(local_path))
+            fd, tmp_path = tempfile.mkstemp(dir=dst_dir, prefix='.%s.' % os.path.basename(local_path))
+            os.close(fd)
+            try:
+                self._clone(path, tmp_path)
+                if verify and self._md5(tmp_path) != md5:
+                    raise ValueError('Corrupted cache entry: %s' % path)
+                os.replace(tmp_path, local_path)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+            return True
+
+    @classmethod
+    def _clone(cls, src, dst):
+        if fcntl is not None:
+            try:
+                with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+                    fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+                shutil.copymode(src, dst)
+                return
+            except (IOError, OSError):
+                pass
+
+        shutil.copyfile(src, dst)
+        shutil.copymode(src, dst)
+
+    @classmethod
+    def _md5(cls, path, buffer_size=1024 * 1024):
+        h = hashlib.md5()
+        with open(path, 'rb') as f:
+            for buf in iter(lambda: f.read(buffer_size), b''):
+                h.update(buf)
+        return h.hexdigest()
+
+    def _entries(self):
+        if not os.path.isdir(self.path):
+            return []
+        return [os.path.join(self.path, d, f) for d in os.listdir(self.path) if len(d) == 2
+                for f in os.listdir(os.path.join(self.path, d)) if not f.startswith('.')]
+
+    def _evict(self, keep=None):
+        entries = []
+        for path in self._entries():
+            st = os.stat(path)
+            entries.append((st.st_mtime, path, st.st_size))
+
+        total = sum(x[2] for x in entries)
+        for mtime, path, size in sorted(entries):
+            if total <= self.max_size:
+                break
+            if os.path.basename(path) == keep:
+                continue
+            logging.debug('Evicting from cache: %s' % path)
+            os.remove(path)
+            total -= size
+
+    def _global_lock_path(self):
+        return os.path.join(self.path, '.lock')
+
+    def _entry_lock_path(self, md5):
+        return os.path.join(self.path, md5[:2], '.%s.lock' % md5)
+
+    @contextmanager
+    def _lock(self, path, shared=False):
+        if fcntl is None:
+            yield
+            return
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'a') as f:
+            fcntl.flock(f.fileno(), fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
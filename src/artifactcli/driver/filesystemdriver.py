@@ -0,0 +1,385 @@
+import errno
+import hashlib
+import logging
+import os
+import shutil
+import uuid
+from contextlib import contextmanager
+from .basedriver import BaseDriver, DEFAULT_INDEX_PREFIX, DEFAULT_DELTA_PREFIX, DEFAULT_LATEST_PREFIX, \
+    DEFAULT_REVISION_PREFIX
+from .blobcache import FICLONE
+from artifactcli.util.fileurl import FILE_URL_SCHEME, is_file_url
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# errors meaning the zero-copy method is not supported for the files
+UNSUPPORTED_ERRORS = (errno.EXDEV, errno.EINVAL, errno.ENOSYS, errno.EOPNOTSUPP, errno.ENOTTY, errno.EBADF)
+
+
+class FileSystemDriver(BaseDriver):
+    """
+    Driver for a repository on a local or network file system
+
+    Files are laid out in the same keys as in S3 buckets under the root directory.
+    Every file is written to a temporary file and renamed into place, so readers never see partial data,
+    and conditional index writes are serialized with file locks across processes.
+    Data are copied by reflink, copy_file_range or sendfile when the file system supports them.
+    """
+
+    def __init__(self, root, group_id):
+        """
+        :param root: root directory, or a file URL (file:///path/to/root)
+        :param group_id: group id
+        """
+        super(FileSystemDriver, self).__init__(['root', 'group_id'])
+        self.root = self.parse_url(root)
+        self.group_id = group_id
+        self.index_prefix = '%s/%s' % (group_id, DEFAULT_INDEX_PREFIX)
+        self.delta_prefix = '%s/%s' % (group_id, DEFAULT_DELTA_PREFIX)
+        self.latest_prefix = '%s/%s' % (group_id, DEFAULT_LATEST_PREFIX)
+        self.revision_prefix = '%s/%s' % (group_id, DEFAULT_REVISION_PREFIX)
+        self.index_etags = {}
+
+    @classmethod
+    def is_url(cls, bucket):
+        return is_file_url(bucket)
+
+    @classmethod
+    def parse_url(cls, url):
+        path = url[len(FILE_URL_SCHEME):] if cls.is_url(url) else url
+        return os.path.abspath(os.path.expanduser(path))
+
+    def _path(self, key):
+        return os.path.join(self.root, *key.split('/'))
+
+    def index_path(self, artifact_id):
+        return '%s%s.json' % (self.index_prefix, artifact_id)
+
+    def artifact_ids(self):
+        """
+        :return: sorted list of the artifact ids which have the index
+        """
+        meta_dir, _, prefix = self._path(self.index_prefix).rpartition(os.sep)
+        if not os.path.isdir(meta_dir):
+            return []
+        return sorted(name[len(prefix):-len('.json')] for name in os.listdir(meta_dir)
+                      if name.startswith(prefix) and name.endswith('.json'))
+
+    def read_index(self, artifact_id):
+        """
+        :param artifact_id: artifact id to read
+        :return: index json text in unicode, or bytes in a binary format
+        """
+        data = self._read(self.index_path(artifact_id))
+        self.index_etags[artifact_id] = self._etag(data)
+        if data is None:
+            return str()
+        try:
+            return data.decode('utf-8')
+        except UnicodeDecodeError:
+            return data
+
+    def write_index(self, artifact_id, s, if_match=None):
+        """
+        :param artifact_id: artifact id to write
+        :param s: index json text in unicode, or bytes in a binary format
+        :param if_match: write only if the current index has this ETag, or does not exist if INDEX_ABSENT
+                         (None to write unconditionally)
+        :return: True if written, False if the index has been modified by others
+        """
+        key = self.index_path(artifact_id)
+        data = s if isinstance(s, bytes) else s.encode('utf-8')
+        if not self._write_if_match(key, data, if_match):
+            logging.debug('Index has been modified by others: %s' % self._path(key))
+            self.index_etags.pop(artifact_id, None)
+            return False
+        self.index_etags[artifact_id] = self._etag(data)
+        return True
+
+    def index_etag(self, artifact_id):
+        """
+        :param artifact_id: artifact id
+        :return: ETag of the index data last read or written, or None if not available
+        """
+        return self.index_etags.get(artifact_id)
+
+    def delta_path(self, artifact_id, name):
+        return '%s%s/%s' % (self.delta_prefix, artifact_id, name)
+
+    def delta_names(self, artifact_id=None):
+        """
+        :param artifact_id: artifact id (None for all artifact ids)
+        :return: sorted list of the names of the index deltas,
+                 or dict of artifact id to the sorted list when artifact_id is None
+        """
+        if artifact_id is not None:
+            path = self._path(self.delta_path(artifact_id, ''))
+            return sorted(x for x in os.listdir(path) if not x.startswith('.')) if os.path.isdir(path) else []
+
+        meta_dir, _, prefix = self._path(self.delta_prefix).rpartition(os.sep)
+        if not os.path.isdir(meta_dir):
+            return {}
+        ret = {}
+        for name in os.listdir(meta_dir):
+            if name.startswith(prefix):
+                names = self.delta_names(name[len(prefix):])
+                if names:
+                    ret[name[len(prefix):]] = names
+        return ret
+
+    def read_delta(self, artifact_id, name):
+        data = self._read(self.delta_path(artifact_id, name))
+        return None if data is None else data.decode('utf-8')
+
+    def append_delta(self, artifact_id, s, after=None):
+        name = self.new_delta_name(after)
+        self._write(self.delta_path(artifact_id, name), s.encode('utf-8'))
+        return name
+
+    def delete_deltas(self, artifact_id, names):
+        for name in names:
+            self._remove(self.delta_path(artifact_id, name))
+
+    def latest_path(self, artifact_id, version, packaging):
+        return '%s%s/%s/%s.json' % (self.latest_prefix, artifact_id, version, packaging)
+
+    def read_latest(self, artifact_id, version, packaging, with_etag=False):
+        """
+        :param with_etag: if True, also return the ETag of the pointer, or INDEX_ABSENT if it does not exist
+        :return: latest pointer json text in unicode, or None if it does not exist,
+                 or tuple of the text and the ETag when with_etag is True
+        """
+        data = self._read(self.latest_path(artifact_id, version, packaging))
+        s = None if data is None else data.decode('utf-8')
+        return (s, self._etag(data) or self.INDEX_ABSENT) if with_etag else s
+
+    def write_latest(self, artifact_id, version, packaging, s, if_match=None):
+        """
+        :param s: latest pointer json text in unicode
+        :param if_match: write only if the current pointer has this ETag, or does not exist if INDEX_ABSENT
+                         (None to write unconditionally)
+        :return: True if written, False if the pointer has been modified by others
+        """
+        return self._write_if_match(self.latest_path(artifact_id, version, packaging), s.encode('utf-8'), if_match)
+
+    def delete_latest(self, artifact_id, version, packaging):
+        self._remove(self.latest_path(artifact_id, version, packaging))
+
+    def revision_path(self, artifact_id, version, packaging, revision):
+        return '%s%s/%s/%s/%d' % (self.revision_prefix, artifact_id, version, packaging, revision)
+
+    def reserve_revision(self, artifact_id, version, packaging, revision):
+        """
+        Create the marker of the revision exclusively
+
+        :return: True if reserved, False if the revision has been taken by others
+        """
+        path = self._path(self.revision_path(artifact_id, version, packaging, revision))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        try:
+            os.close(os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL))
+        except OSError as e:
+            if e.errno == errno.EEXIST:
+                return False
+            raise
+        return True
+
+    def release_revision(self, artifact_id, version, packaging, revision):
+        self._remove(self.revision_path(artifact_id, version, packaging, revision))
+
+    def is_reserved(self, artifact_id, version, packaging, revision):
+        return os.path.isfile(self._path(self.revision_path(artifact_id, version, packaging, revision)))
+
+    def upload(self, local_path, remote_path, md5, multipart_etag=None):
+        """
+        Copy local file to the repository.
+        File will be overwritten when already exists.
+
+        :param local_path: source file path
+        :param remote_path: path in the repository to upload
+        :param md5: MD5 digest hex string of the file
+        :param multipart_etag: not used
+        :return: None
+        """
+        with self._staged(remote_path) as tmp_path:
+            self.copy_file(local_path, tmp_path)
+            os.replace(tmp_path, self._path(remote_path))
+        logging.info('Uploaded: %s' % self._path(remote_path))
+
+    def download(self, remote_path, local_path, md5):
+        """
+        Copy file in the repository to local path.
+
+        :param remote_path: path in the repository to download
+        :param local_path: local destination path
+        :param md5: MD5 digest hex string of the file
+        :return: None
+        """
+        path = self._existing_path(remote_path)
+        with self._temporary(os.path.abspath(local_path)) as tmp_path:
+            self.copy_file(path, tmp_path)
+            os.replace(tmp_path, local_path)
+        logging.info('Downloaded: %s' % local_path)
+
+    def delete(self, remote_path, md5):
+        """
+        :param remote_path: path in the repository to delete
+        :param md5: MD5 digest hex string of the file
+        :return: None
+        """
+        os.remove(self._existing_path(remote_path))
+        logging.info('Deleted: %s' % remote_path)
+
+    def exists(self, remote_path, md5):
+        """
+        Files are not hashed again, so only the existence is checked.
+
+        :param remote_path: path in the repository to check
+        :param md5: MD5 digest hex string which the file should have
+        :return: True if the file exists
+        """
+        return os.path.isfile(self._path(remote_path))
+
+    def copy(self, src_path, dst_path, md5):
+        """
+        :param src_path: path in the repository to copy from
+        :param dst_path: path in the repository to copy to
+        :param md5: MD5 digest hex string of the file
+        :return: None
+        """
+        path = self._existing_path(src_path)
+        with self._staged(dst_path) as tmp_path:
+            self.copy_file(path, tmp_path)
+            os.replace(tmp_path, self._path(dst_path))
+        logging.info('Copied: %s -> %s' % (src_path, dst_path))
+
+    @classmethod
+    def copy_file(cls, src, dst):
+        """
+        Copy file data by reflink, copy_file_range or sendfile, falling back to a plain copy
+
+        :param src: source file path
+        :param dst: destination file path, which is overwritten
+        :return: None
+        """
+        with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+            if cls._copy_zero(fsrc.fileno(), fdst.fileno(), os.fstat(fsrc.fileno()).st_size):
+                return
+            fsrc.seek(0)
+            fdst.seek(0)
+            fdst.truncate()
+            shutil.copyfileobj(fsrc, fdst)
+
+    @classmethod
+    def _copy_zero(cls, src_fd, dst_fd, size):
+        if fcntl is not None:
+            try:
+                fcntl.ioctl(dst_fd, FICLONE, src_fd)
+                return True
+            except (IOError, OSError):
+                pass
+
+        for f in [getattr(os, 'copy_file_range', None), getattr(os, 'sendfile', None)]:
+            if f is None:
+                continue
+            offset = 0
+            try:
+                while offset < size:
+                    if f is os.sendfile:
+                        n = f(dst_fd, src_fd, offset, size - offset)
+                    else:
+                        n = f(src_fd, dst_fd, size - offset, offset, offset)
+                    if n == 0:
+                        break
+                    offset += n
+            except OSError as e:
+                if e.errno not in UNSUPPORTED_ERRORS:
+                    raise
+                continue
+            if offset == size:
+                return True
+        return False
+
+    def _existing_path(self, key):
+        path = self._path(key)
+        if not os.path.isfile(path):
+            raise ValueError('File not found: %s' % path)
+        return path
+
+    def _read(self, key):
+        try:
+            with open(self._path(key), 'rb') as f:
+                return f.read()
+        except (IOError, OSError) as e:
+            if e.errno == errno.ENOENT:
+                return None
+            raise
+
+    def _write(self, key, data):
+        with self._staged(key) as tmp_path:
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, self._path(key))
+
+    def _write_if_match(self, key, data, if_match):
+        """
+        Replace the file only if it has the ETag, or does not exist if if_match is INDEX_ABSENT
+
+        :return: True if written
+        """
+        with self._staged(key) as tmp_path:
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            with self._lock(self._path(key) + '.lock'):
+                if if_match is not None and (self._etag(self._read(key)) or self.INDEX_ABSENT) != if_match:
+                    return False
+                os.replace(tmp_path, self._path(key))
+        return True
+
+    def _remove(self, key):
+        try:
+            os.remove(self._path(key))
+        except OSError as e:
+            if e.errno != errno.ENOENT:
+                raise
+
+    def _staged(self, key):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return self._temporary(path)
+
+    @classmethod
+    @contextmanager
+    def _temporary(cls, path):
+        """
+        Path of a temporary file next to the destination, which is removed unless renamed into place
+
+        The file is created by the caller, so that it gets the default permissions.
+        """
+        tmp_path = os.path.join(os.path.dirname(path), '.%s.%s' % (os.path.basename(path), uuid.uuid4().hex))
+        try:
+            yield tmp_path
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    @contextmanager
+    def _lock(self, path):
+        if fcntl is None:
+            yield
+            return
+
+        with open(path, 'a') as f:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+    @classmethod
+    def _etag(cls, data):
+        # MD5 digest of the data, or None if the file does not exist
+        return None if data is None else hashlib.md5(data).hexdigest()
@@ -0,0 +1,82 @@
+import base64
+import json
+import logging
+import os
+import tempfile
+from artifactcli.util import CaseClass
+from artifactcli.util.cachedir import DEFAULT_CACHE_DIR
+
+
+class IndexCache(CaseClass):
+    """
+    Local copies of index data with their ETags
+
+    Entries are stored as ``<cache_dir>/<bucket>/<group>/<artifact_id>.json``.
+    All errors on the local file system are logged and treated as cache misses.
+    """
+
+    def __init__(self, bucket_name, group_id, cache_dir=None):
+        super(IndexCache, self).__init__(['path'])
+        self.path = os.path.join(os.path.expanduser(cache_dir or DEFAULT_CACHE_DIR), bucket_name, group_id)
+
+    def entry_path(self, artifact_id):
+        return os.path.join(self.path, '%s.json' % artifact_id)
+
+    def get(self, artifact_id):
+        """
+        :param artifact_id: artifact id to read
+        :return: tuple of (etag, index json text in unicode or bytes in a binary format),
+                 or (None, None) when not cached
+        """
+        try:
+            with open(self.entry_path(artifact_id), encoding='utf-8') as f:
+                d = json.load(f)
+            if d.get('encoding') == 'base64':
+                return d['etag'], base64.b64decode(d['body'])
+            return d['etag'], d['body']
+        except (IOError, ValueError, KeyError, TypeError):
+            return None, None
+
+    def put(self, artifact_id, etag, s):
+        """
+        Store index data atomically
+
+        :param artifact_id: artifact id to write
+        :param etag: ETag of the index object
+        :param s: index json text in unicode, or bytes in a binary format
+        :return: None
+        """
+        if not etag:
+            self.invalidate(artifact_id)
+            return
+
+        try:
+            os.makedirs(self.path, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.path, suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                    if isinstance(s, bytes):
+                        d = {'etag': etag, 'body': base64.b64encode(s).decode('ascii'), 'encoding': 'base64'}
+                    else:
+                        d = {'etag': etag, 'body': s}
+                    json.dump(d, f, ensure_ascii=False)
+                os.replace(tmp_path, self.entry_path(artifact_id))
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+        except (IOError, OSError) as e:
+            logging.debug('Failed to write index cache: %s' % e)
+
+    def invalidate(self, artifact_id):
+        """
+        Remove cached index data
+
+        :param artifact_id: artifact id to remove
+        :return: None
+        """
+        try:
+            os.unlink(self.entry_path(artifact_id))
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logging.debug('Failed to remove index cache: %s' % e)
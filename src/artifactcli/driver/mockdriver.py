@@ -1,4 +1,6 @@
+import hashlib
 import logging
+import threading
 from collections import defaultdict
 from .basedriver import BaseDriver
 from artifactcli.util import assert_type
@@ -12,6 +14,11 @@ class MockDriver(BaseDriver):
     def __init__(self):
         super(MockDriver, self).__init__(['index_data', 'uploaded_data', 'downloaded_data'])
         self.index_data = defaultdict(str)
+        self.delta_data = defaultdict(dict)
+        self.latest_data = {}
+        self.revision_data = set()
+        self.index_etags = {}
+        self._index_lock = threading.Lock()
         self.uploaded_data = {}
         self.downloaded_data = {}
 
@@ -21,19 +28,90 @@ class MockDriver(BaseDriver):
     def read_index(self, artifact_id):
         """
         :param artifact_id: artifact id to read
-        :return: index json text in unicode
+        :return: index json text in unicode, or bytes in a binary format
         """
-        return self.index_data[artifact_id]
+        with self._index_lock:
+            s = self.index_data[artifact_id]
+            self.index_etags[artifact_id] = self._etag(s)
+            return s
 
-    def write_index(self, artifact_id, s):
+    def write_index(self, artifact_id, s, if_match=None):
         """
         :param artifact_id: artifact id to write
-        :param s: index json text in unicode
-        :return: None
+        :param s: index json text in unicode, or bytes in a binary format
+        :param if_match: write only if the current index has this ETag, or does not exist if INDEX_ABSENT
+        :return: True if written, False if the index has been modified by others
         """
-        self.index_data[artifact_id] = s
+        with self._index_lock:
+            if if_match is not None and (self._etag(self.index_data.get(artifact_id)) or self.INDEX_ABSENT) != if_match:
+                self.index_etags.pop(artifact_id, None)
+                return False
+            self.index_data[artifact_id] = s
+            self.index_etags[artifact_id] = self._etag(s)
+            return True
 
-    def upload(self, local_path, remote_path, md5):
+    def index_etag(self, artifact_id):
+        """
+        :param artifact_id: artifact id
+        :return: ETag of the index data last read or written, or None if not available
+        """
+        return self.index_etags.get(artifact_id)
+
+    @classmethod
+    def _etag(cls, s):
+        # MD5 digest of the data, or None if the index does not exist
+        if not s:
+            return None
+        return hashlib.md5(s if isinstance(s, bytes) else s.encode('utf-8')).hexdigest()
+
+    def delta_names(self, artifact_id=None):
+        if artifact_id is None:
+            return dict((k, sorted(v)) for k, v in self.delta_data.items() if v)
+        return sorted(self.delta_data.get(artifact_id, {}))
+
+    def read_delta(self, artifact_id, name):
+        return self.delta_data.get(artifact_id, {}).get(name)
+
+    def append_delta(self, artifact_id, s, after=None):
+        name = self.new_delta_name(after)
+        self.delta_data[artifact_id][name] = s
+        return name
+
+    def delete_deltas(self, artifact_id, names):
+        for name in names:
+            self.delta_data[artifact_id].pop(name, None)
+
+    def read_latest(self, artifact_id, version, packaging, with_etag=False):
+        s = self.latest_data.get((artifact_id, version, packaging))
+        return (s, self._etag(s) or self.INDEX_ABSENT) if with_etag else s
+
+    def write_latest(self, artifact_id, version, packaging, s, if_match=None):
+        with self._index_lock:
+            key = (artifact_id, version, packaging)
+            if if_match is not None and (self._etag(self.latest_data.get(key)) or self.INDEX_ABSENT) != if_match:
+                return False
+            self.latest_data[key] = s
+            return True
+
+    def delete_latest(self, artifact_id, version, packaging):
+        self.latest_data.pop((artifact_id, version, packaging), None)
+
+    def reserve_revision(self, artifact_id, version, packaging, revision):
+        with self._index_lock:
+            key = (artifact_id, version, packaging, revision)
+            if key in self.revision_data:
+                return False
+            self.revision_data.add(key)
+            return True
+
+    def release_revision(self, artifact_id, version, packaging, revision):
+        with self._index_lock:
+            self.revision_data.discard((artifact_id, version, packaging, revision))
+
+    def is_reserved(self, artifact_id, version, packaging, revision):
+        return (artifact_id, version, packaging, revision) in self.revision_data
+
+    def upload(self, local_path, remote_path, md5, multipart_etag=None):
         if md5 is None:
             md5 = 'example_md5'
 
@@ -62,3 +140,16 @@ class MockDriver(BaseDriver):
 
         del self.uploaded_data[remote_path]
         logging.info('[Mock] deleted: %s' % remote_path)
+
+    def exists(self, remote_path, md5):
+        return remote_path in self.uploaded_data and md5 in (None, self.uploaded_data[remote_path][1])
+
+    def copy(self, src_path, dst_path, md5):
+        if src_path not in self.uploaded_data:
+            raise ValueError('File not found: %s' % src_path)
+
+        data, uploaded_md5 = self.uploaded_data[src_path]
+        assert md5 is None or md5 == uploaded_md5
+
+        self.uploaded_data[dst_path] = (data, uploaded_md5)
+        logging.info('[Mock] copied: %s -> %s' % (src_path, dst_path))
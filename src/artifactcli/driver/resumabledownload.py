@@ -0,0 +1,147 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class ResumableDownload(object):
+    """
+    Download an S3 object by concurrent ranged GETs into a preallocated temporary file
+
+    Completed parts are recorded in a state file next to the temporary file,
+    so an interrupted download restarts from the missing parts only.
+    The destination file appears atomically when the whole object has been downloaded and verified.
+    """
+
+    PART_SUFFIX = '.part'
+    STATE_SUFFIX = '.part.json'
+
+    def __init__(self, client, bucket_name, key, local_path, size, etag, chunksize, max_concurrency):
+        """
+        :param client: S3 client
+        :param bucket_name: bucket name
+        :param key: S3 key to download
+        :param local_path: local destination path
+        :param size: object size in bytes
+        :param etag: object ETag, used to make sure all parts come from the same object
+        :param chunksize: size of each range in bytes
+        :param max_concurrency: maximum number of concurrent requests
+        """
+        self.client = client
+        self.bucket_name = bucket_name
+        self.key = key
+        self.local_path = local_path
+        self.size = size
+        self.etag = etag
+        self.chunksize = max(1, chunksize)
+        self.max_concurrency = max(1, max_concurrency)
+        self.part_path = local_path + self.PART_SUFFIX
+        self.state_path = local_path + self.STATE_SUFFIX
+        self._lock = threading.Lock()
+        self._done = set()
+
+    def num_parts(self):
+        return max(1, (self.size + self.chunksize - 1) // self.chunksize)
+
+    def run(self, md5=None):
+        """
+        Download the object, verify it and move it to the destination path
+
+        :param md5: MD5 digest hex string to verify (None to skip)
+        :return: None
+        """
+        self._prepare()
+        missing = [i for i in range(self.num_parts()) if i not in self._done]
+        if self._done:
+            logging.info('Resuming download: %d of %d parts remaining' % (len(missing), self.num_parts()))
+
+        with open(self.part_path, 'r+b') as f:
+            if len(missing) == 1 or self.max_concurrency == 1:
+                for i in missing:
+                    self._fetch(f, i)
+            else:
+                with ThreadPoolExecutor(max_workers=min(self.max_concurrency, len(missing))) as executor:
+                    for future in [executor.submit(self._fetch, f, i) for i in missing]:
+                        future.result()
+
+        if md5 is not None:
+            local_md5 = self._hex_md5(self.part_path)
+            if local_md5 != md5:
+                # the partial file is useless, start over next time
+                self._remove_partial_files()
+                raise AssertionError('Failed to check MD5 digest: local=%s, remote=%s' % (local_md5, md5))
+
+        os.replace(self.part_path, self.local_path)
+        os.remove(self.state_path)
+
+    def _prepare(self):
+        state = self._load_state()
+        resumable = state == self._state(state.get('done', [])) and os.path.exists(self.part_path) and \
+            os.path.getsize(self.part_path) == self.size
+        if resumable:
+            self._done = set(state['done'])
+            return
+
+        self._done = set()
+        with open(self.part_path, 'wb') as f:
+            if hasattr(os, 'posix_fallocate') and self.size:
+                try:
+                    os.posix_fallocate(f.fileno(), 0, self.size)
+                except OSError:
+                    pass
+            f.truncate(self.size)
+        self._save_state()
+
+    def _fetch(self, f, index):
+        start = index * self.chunksize
+        end = min(start + self.chunksize, self.size) - 1
+        params = {'Bucket': self.bucket_name, 'Key': self.key, 'IfMatch': self.etag}
+        if self.size:
+            params['Range'] = 'bytes=%d-%d' % (start, end)
+        body = self.client.get_object(**params)['Body']
+
+        offset = start
+        for chunk in body.iter_chunks(1024 * 1024):
+            with self._lock:
+                f.seek(offset)
+                f.write(chunk)
+            offset += len(chunk)
+
+        with self._lock:
+            f.flush()
+            self._done.add(index)
+            self._save_state()
+
+    def _state(self, done):
+        return {'key': self.key, 'etag': self.etag, 'size': self.size, 'chunksize': self.chunksize,
+                'done': sorted(done)}
+
+    def _load_state(self):
+        try:
+            with open(self.state_path) as f:
+                return json.load(f)
+        except (IOError, ValueError):
+            return {}
+
+    def _save_state(self):
+        tmp_path = self.state_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self._state(self._done), f)
+        os.replace(tmp_path, self.state_path)
+
+    def _remove_partial_files(self):
+        for path in [self.part_path, self.state_path]:
+            if os.path.exists(path):
+                os.remove(path)
+
+    @classmethod
+    def _hex_md5(cls, path):
+        hasher = hashlib.md5()
+        with open(path, 'rb') as f:
+            buf = f.read(1024 * 1024)
+            while buf:
+                hasher.update(buf)
+                buf = f.read(1024 * 1024)
+        return hasher.hexdigest()
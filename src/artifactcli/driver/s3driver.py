@@ -1,12 +1,19 @@
 import logging
+import os
 import re
+import threading
+from collections import Counter
 import boto3
+from boto3.s3.transfer import TransferConfig
 from botocore.exceptions import ClientError
-from .basedriver import BaseDriver
-from artifactcli.util import assert_type, ProgressBar
+from s3transfer.manager import TransferManager
+from s3transfer.utils import ChunksizeAdjuster
+from .basedriver import BaseDriver, DEFAULT_INDEX_PREFIX, DEFAULT_DELTA_PREFIX, DEFAULT_LATEST_PREFIX, \
+    DEFAULT_REVISION_PREFIX
+from .resumabledownload import ResumableDownload
+from artifactcli.util import assert_type, ProgressBar, FileDigest
 
 DEFAULT_REGION = 'us-east-1'
-DEFAULT_INDEX_PREFIX = '.meta/index-'
 
 
 class S3Driver(BaseDriver):
@@ -15,18 +22,33 @@ class S3Driver(BaseDriver):
     """
 
     def __init__(self, aws_access_key, aws_secret_key, bucket_name, group_id,
-                 region=None, index_prefix=None, session=None):
+                 region=None, index_prefix=None, session=None, index_cache=None, transfer_config=None,
+                 blob_cache=None):
         super(S3Driver, self).__init__(['aws_access_key', 'bucket_name', 'region', 'index_prefix'])
         self.aws_access_key = aws_access_key
         self.aws_secret_key = aws_secret_key
         self.bucket_name = bucket_name
         self.region = region or DEFAULT_REGION
         self.index_prefix = '%s/%s' % (group_id, index_prefix or DEFAULT_INDEX_PREFIX)
+        self.delta_prefix = '%s/%s' % (group_id, DEFAULT_DELTA_PREFIX)
+        self.latest_prefix = '%s/%s' % (group_id, DEFAULT_LATEST_PREFIX)
+        self.revision_prefix = '%s/%s' % (group_id, DEFAULT_REVISION_PREFIX)
+        self.index_cache = index_cache
+        self.blob_cache = blob_cache
+        self.index_etags = {}
         self.session = session or boto3.session.Session(
             aws_access_key_id=self.aws_access_key,
             aws_secret_access_key=self.aws_secret_key,
             region_name=self.region)
         self.bucket = self.session.resource('s3').Bucket(self.bucket_name)
+        # unlike resources, clients are thread-safe
+        self.client = self.session.client('s3')
+        self.transfer_config = transfer_config or TransferConfig()
+
+        # count API calls by operation name, e.g. {'GetObject': 1, 'HeadObject': 2}
+        self.request_counts = Counter()
+        self._request_counts_lock = threading.Lock()
+        self.client.meta.events.register('before-call.s3', self._count_request)
 
     def index_path(self, artifact_id):
         return '%s%s.json' % (self.index_prefix, artifact_id)
@@ -44,32 +66,226 @@ class S3Driver(BaseDriver):
     def read_index(self, artifact_id):
         """
         Read index data from S3 bucket.
+        When index cache is enabled, the cached data is used unless the ETag has changed.
 
         :param artifact_id: artifact id to read
-        :return: index json text in unicode
+        :return: index json text in unicode, or bytes in a binary format
         """
         index_path = self.index_path(artifact_id)
         logging.debug('Reading index: %s' % self.s3_url(self.bucket_name, index_path))
-        if self.exists_object(index_path):
-            s = self.bucket.Object(index_path).get()['Body'].read().decode('utf-8')
-        else:
-            s = str()
 
+        etag, cached = self.index_cache.get(artifact_id) if self.index_cache else (None, None)
+        params = {'Bucket': self.bucket_name, 'Key': index_path}
+        if etag is not None:
+            params['IfNoneMatch'] = etag
+
+        try:
+            res = self.client.get_object(**params)
+        except ClientError as e:
+            if self._is_not_modified(e):
+                logging.debug('Using cached index: %s' % self.index_cache.entry_path(artifact_id))
+                self.index_etags[artifact_id] = etag
+                return cached
+            if e.response['Error']['Code'] == 'NoSuchKey':
+                if self.index_cache:
+                    self.index_cache.invalidate(artifact_id)
+                self.index_etags.pop(artifact_id, None)
+                return str()
+            raise
+
+        s = self._decode_index(res['Body'].read())
+        self.index_etags[artifact_id] = res.get('ETag')
+        if self.index_cache:
+            self.index_cache.put(artifact_id, res.get('ETag'), s)
         return s
 
-    def write_index(self, artifact_id, s):
+    def write_index(self, artifact_id, s, if_match=None):
         """
         Write index data to S3 bucket.
+        Cached data is replaced with the written one.
 
         :param artifact_id: artifact id to write
-        :param s: index json text in unicode
-        :return: None
+        :param s: index json text in unicode, or bytes in a binary format
+        :param if_match: write only if the current index has this ETag, or does not exist if INDEX_ABSENT
+                         (None to write unconditionally)
+        :return: True if written, False if the index has been modified by others
         """
         index_path = self.index_path(artifact_id)
         logging.debug('Writing index: %s' % self.s3_url(self.bucket_name, index_path))
-        self.bucket.Object(index_path).put(Body=s.encode('utf-8'), ContentType='application/json; charset=utf-8')
+        if self.index_cache:
+            self.index_cache.invalidate(artifact_id)
+        if isinstance(s, bytes):
+            body, content_type = s, 'application/octet-stream'
+        else:
+            body, content_type = s.encode('utf-8'), 'application/json; charset=utf-8'
+        params = {'Bucket': self.bucket_name, 'Key': index_path, 'Body': body, 'ContentType': content_type}
+        if if_match == self.INDEX_ABSENT:
+            params['IfNoneMatch'] = '*'
+        elif if_match is not None:
+            params['IfMatch'] = if_match
+
+        try:
+            res = self.client.put_object(**params)
+        except ClientError as e:
+            if self._is_conflict(e):
+                logging.debug('Index has been modified by others: %s' % self.s3_url(self.bucket_name, index_path))
+                self.index_etags.pop(artifact_id, None)
+                return False
+            raise
+
+        self.index_etags[artifact_id] = res.get('ETag')
+        if self.index_cache:
+            self.index_cache.put(artifact_id, res.get('ETag'), s)
+        return True
+
+    def delta_path(self, artifact_id, name):
+        return '%s%s/%s' % (self.delta_prefix, artifact_id, name)
+
+    def delta_names(self, artifact_id=None):
+        """
+        List index deltas with one request
+
+        :param artifact_id: artifact id (None for all artifact ids)
+        :return: sorted list of the names of the index deltas,
+                 or dict of artifact id to the sorted list when artifact_id is None
+        """
+        prefix = self.delta_prefix if artifact_id is None else self.delta_path(artifact_id, '')
+        ret = {}
+        for obj in self.list_objects(prefix):
+            aid, _, name = obj['Key'][len(self.delta_prefix):].partition('/')
+            if name:
+                ret.setdefault(aid, []).append(name)
+        for names in ret.values():
+            names.sort()
+        return ret if artifact_id is None else ret.get(artifact_id, [])
+
+    def read_delta(self, artifact_id, name):
+        """
+        :param artifact_id: artifact id
+        :param name: delta name
+        :return: delta json text in unicode, or None if it has been deleted
+        """
+        try:
+            res = self.client.get_object(Bucket=self.bucket_name, Key=self.delta_path(artifact_id, name))
+        except ClientError as e:
+            if e.response['Error']['Code'] == 'NoSuchKey':
+                return None
+            raise
+        return res['Body'].read().decode('utf-8')
+
+    def append_delta(self, artifact_id, s, after=None):
+        """
+        Write a new index delta, which is never modified afterwards
+
+        :param artifact_id: artifact id
+        :param s: delta json text in unicode
+        :param after: name of the last delta known to the caller, which the new name sorts after
+        :return: name of the new delta
+        """
+        name = self.new_delta_name(after)
+        path = self.delta_path(artifact_id, name)
+        logging.debug('Writing index delta: %s' % self.s3_url(self.bucket_name, path))
+        self.client.put_object(Bucket=self.bucket_name, Key=path, Body=s.encode('utf-8'),
+                               ContentType='application/json; charset=utf-8')
+        return name
+
+    def delete_deltas(self, artifact_id, names):
+        """
+        :param artifact_id: artifact id
+        :param names: list of the delta names to delete
+        :return: None
+        """
+        names = list(names)
+        for i in range(0, len(names), 1000):  # DeleteObjects accepts up to 1000 keys
+            objects = [{'Key': self.delta_path(artifact_id, name)} for name in names[i:i + 1000]]
+            self.client.delete_objects(Bucket=self.bucket_name, Delete={'Objects': objects, 'Quiet': True})
+
+    def latest_path(self, artifact_id, version, packaging):
+        return '%s%s/%s/%s.json' % (self.latest_prefix, artifact_id, version, packaging)
+
+    def read_latest(self, artifact_id, version, packaging, with_etag=False):
+        """
+        :param with_etag: if True, also return the ETag of the pointer, or INDEX_ABSENT if it does not exist
+        :return: latest pointer json text in unicode, or None if it does not exist,
+                 or tuple of the text and the ETag when with_etag is True
+        """
+        path = self.latest_path(artifact_id, version, packaging)
+        logging.debug('Reading latest pointer: %s' % self.s3_url(self.bucket_name, path))
+        try:
+            res = self.client.get_object(Bucket=self.bucket_name, Key=path)
+            s, etag = res['Body'].read().decode('utf-8'), res.get('ETag')
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'NoSuchKey':
+                raise
+            s, etag = None, self.INDEX_ABSENT
+        return (s, etag) if with_etag else s
+
+    def write_latest(self, artifact_id, version, packaging, s, if_match=None):
+        """
+        :param s: latest pointer json text in unicode
+        :param if_match: write only if the current pointer has this ETag, or does not exist if INDEX_ABSENT
+                         (None to write unconditionally)
+        :return: True if written, False if the pointer has been modified by others
+        """
+        path = self.latest_path(artifact_id, version, packaging)
+        logging.debug('Writing latest pointer: %s' % self.s3_url(self.bucket_name, path))
+        params = {'Bucket': self.bucket_name, 'Key': path, 'Body': s.encode('utf-8'),
+                  'ContentType': 'application/json; charset=utf-8'}
+        if if_match == self.INDEX_ABSENT:
+            params['IfNoneMatch'] = '*'
+        elif if_match is not None:
+            params['IfMatch'] = if_match
+
+        try:
+            self.client.put_object(**params)
+        except ClientError as e:
+            # the pointer deleted meanwhile does not match any ETag
+            if self._is_conflict(e) or (if_match and e.response['Error']['Code'] == 'NoSuchKey'):
+                logging.debug('Latest pointer has been modified by others: %s' % self.s3_url(self.bucket_name, path))
+                return False
+            raise
+        return True
+
+    def delete_latest(self, artifact_id, version, packaging):
+        path = self.latest_path(artifact_id, version, packaging)
+        logging.debug('Deleting latest pointer: %s' % self.s3_url(self.bucket_name, path))
+        self.client.delete_object(Bucket=self.bucket_name, Key=path)
+
+    def revision_path(self, artifact_id, version, packaging, revision):
+        return '%s%s/%s/%s/%d' % (self.revision_prefix, artifact_id, version, packaging, revision)
+
+    def reserve_revision(self, artifact_id, version, packaging, revision):
+        """
+        Create the marker of the revision by a conditional write only if it does not exist
+
+        :return: True if reserved, False if the revision has been taken by others
+        """
+        path = self.revision_path(artifact_id, version, packaging, revision)
+        logging.debug('Reserving revision: %s' % self.s3_url(self.bucket_name, path))
+        try:
+            self.client.put_object(Bucket=self.bucket_name, Key=path, Body=b'', IfNoneMatch='*')
+        except ClientError as e:
+            if self._is_conflict(e):
+                return False
+            raise
+        return True
+
+    def release_revision(self, artifact_id, version, packaging, revision):
+        path = self.revision_path(artifact_id, version, packaging, revision)
+        logging.debug('Releasing revision: %s' % self.s3_url(self.bucket_name, path))
+        self.client.delete_object(Bucket=self.bucket_name, Key=path)
+
+    def is_reserved(self, artifact_id, version, packaging, revision):
+        return self.exists_object(self.revision_path(artifact_id, version, packaging, revision))
 
-    def upload(self, local_path, remote_path, md5):
+    @classmethod
+    def _decode_index(cls, body):
+        try:
+            return body.decode('utf-8')
+        except UnicodeDecodeError:
+            return body  # binary format, which starts with a byte invalid in UTF-8
+
+    def upload(self, local_path, remote_path, md5, multipart_etag=None):
         """
         Upload local file to S3 bucket.
         File will be overwritten when already exists.
@@ -77,14 +293,27 @@ class S3Driver(BaseDriver):
         :param local_path: source file path
         :param remote_path: S3 path to upload
         :param md5: MD5 digest hex string to verify
+        :param multipart_etag: expected ETag of the multipart upload to verify (None to compute it)
         :return None
         """
+        size = os.path.getsize(local_path)
         with ProgressBar():
-            self.bucket.Object(remote_path).upload_file(Filename=local_path)
+            if size < self.transfer_config.multipart_threshold:
+                # single PUT returns the ETag
+                with open(local_path, 'rb') as f:
+                    res = self.client.put_object(Bucket=self.bucket_name, Key=remote_path, Body=f)
+                remote_etag = res['ETag'].strip('"')
+                expected_etag = md5
+            else:
+                # ETag of a multipart object is not the MD5 digest, so keep it in the metadata
+                extra_args = {'Metadata': {'md5': md5}} if md5 else None
+                with TransferManager(self.client, self.transfer_config) as manager:
+                    manager.upload(local_path, self.bucket_name, remote_path, extra_args=extra_args).result()
+                remote_etag = self.head_object(remote_path)['ETag'].strip('"')
+                expected_etag = multipart_etag or self.multipart_etag(local_path, self.part_size(size))
 
-        remote_md5 = self.bucket.Object(remote_path).e_tag.strip('"')
-        assert md5 is None or md5 == remote_md5, \
-            'Failed to check MD5 digest: local=%s, remote=%s' % (md5, remote_md5)
+        assert expected_etag is None or expected_etag == remote_etag, \
+            'Failed to check ETag: local=%s, remote=%s' % (expected_etag, remote_etag)
 
         logging.info('Uploaded: %s' % self.s3_url(self.bucket_name, remote_path))
 
@@ -97,17 +326,26 @@ class S3Driver(BaseDriver):
         :param md5: MD5 digest hex string to verify
         :return: None
         """
-        if not self.exists_object(remote_path):
+        if self.blob_cache and md5:
+            self.blob_cache.fetch(md5, local_path, lambda path: self._download(remote_path, path, md5))
+        else:
+            self._download(remote_path, local_path, md5)
+
+        logging.info('Downloaded: %s' % local_path)
+
+    def _download(self, remote_path, local_path, md5):
+        head = self.head_object(remote_path)
+        if head is None:
             raise ValueError('File not found: %s' % self.s3_url(self.bucket_name, remote_path))
-        obj = self.bucket.Object(remote_path)
-        remote_md5 = obj.e_tag.strip('"')
-        assert md5 is None or md5 == remote_md5, \
+        remote_md5 = self._remote_md5(head, remote_path)
+        assert md5 is None or remote_md5 is None or md5 == remote_md5, \
             'Failed to check MD5 digest: local=%s, remote=%s' % (md5, remote_md5)
 
+        download = ResumableDownload(self.client, self.bucket_name, remote_path, local_path, head['ContentLength'],
+                                     head['ETag'], self.transfer_config.multipart_chunksize,
+                                     self.transfer_config.max_concurrency)
         with ProgressBar():
-            obj.download_file(Filename=local_path)
-
-        logging.info('Downloaded: %s' % local_path)
+            download.run(md5)
 
     def delete(self, remote_path, md5):
         """
@@ -117,18 +355,54 @@ class S3Driver(BaseDriver):
         :param md5: MD5 digest hex string to verify
         :return: None
         """
-        if not self.exists_object(remote_path):
+        head = self.head_object(remote_path)
+        if head is None:
             raise ValueError('File not found: %s' % self.s3_url(self.bucket_name, remote_path))
-        obj = self.bucket.Object(remote_path)
-        remote_md5 = obj.e_tag.strip('"')
-        assert md5 is None or md5 == remote_md5, \
+        remote_md5 = self._remote_md5(head, remote_path)
+        assert md5 is None or remote_md5 is None or md5 == remote_md5, \
             'Failed to check MD5 digest: local=%s, remote=%s' % (md5, remote_md5)
 
-        obj.delete()
+        self.client.delete_object(Bucket=self.bucket_name, Key=remote_path)
         logging.info('Deleted: %s' % remote_path)
 
+    def exists(self, remote_path, md5):
+        """
+        Check if the file is stored in S3 bucket.
+
+        :param remote_path: S3 path to check
+        :param md5: MD5 digest hex string which the file should have
+        :return: True if the file exists and its MD5 digest matches
+        """
+        head = self.head_object(remote_path)
+        return head is not None and md5 in (None, self._remote_md5(head, remote_path))
+
+    def copy(self, src_path, dst_path, md5):
+        """
+        Copy file in S3 bucket without transferring the data.
+
+        :param src_path: S3 path to copy from
+        :param dst_path: S3 path to copy to
+        :param md5: MD5 digest hex string to verify
+        :return: None
+        """
+        head = self.head_object(src_path)
+        if head is None:
+            raise ValueError('File not found: %s' % self.s3_url(self.bucket_name, src_path))
+        remote_md5 = self._remote_md5(head, src_path)
+        assert md5 is None or remote_md5 is None or md5 == remote_md5, \
+            'Failed to check MD5 digest: local=%s, remote=%s' % (md5, remote_md5)
+
+        # keep the MD5 digest in the metadata since a large object will be copied by parts
+        extra_args = {'MetadataDirective': 'REPLACE', 'Metadata': {'md5': md5}} if md5 else None
+        with TransferManager(self.client, self.transfer_config) as manager:
+            manager.copy({'Bucket': self.bucket_name, 'Key': src_path}, self.bucket_name, dst_path,
+                         extra_args=extra_args).result()
+
+        logging.info('Copied: %s -> %s' % (self.s3_url(self.bucket_name, src_path),
+                                           self.s3_url(self.bucket_name, dst_path)))
+
     def list_objects(self, prefix):
-        client = self.session.client('s3')
+        client = self.client
         continuation_token = None
         while True:
             if continuation_token is None:
@@ -147,15 +421,77 @@ class S3Driver(BaseDriver):
             else:
                 break
 
-    def exists_object(self, key):
+    def head_object(self, key):
+        """
+        :param key: S3 key
+        :return: response of HeadObject, or None when the object does not exist
+        """
         try:
-            self.bucket.Object(key).get()
+            return self.client.head_object(Bucket=self.bucket_name, Key=key)
         except ClientError as e:
-            if e.response['Error']['Code'] == 'NoSuchKey':
-                return False
-            else:
-                raise
-        return True
+            if e.response['Error']['Code'] in ('404', 'NoSuchKey', 'NotFound'):
+                return None
+            raise
+
+    def _remote_md5(self, head, key):
+        etag = head['ETag'].strip('"')
+        if '-' not in etag:
+            return etag
+
+        # uploaded by multipart upload
+        md5 = head.get('Metadata', {}).get('md5')
+        if md5 is None:
+            logging.warning('Could not verify MD5 digest: %s' % self.s3_url(self.bucket_name, key))
+        return md5
+
+    def exists_object(self, key):
+        return self.head_object(key) is not None
+
+    def reset_request_counts(self):
+        with self._request_counts_lock:
+            self.request_counts.clear()
+
+    def _count_request(self, model, **kwargs):
+        with self._request_counts_lock:
+            self.request_counts[model.name] += 1
+
+    def index_etag(self, artifact_id):
+        """
+        :param artifact_id: artifact id
+        :return: ETag of the index data last read or written, or None if not available
+        """
+        return self.index_etags.get(artifact_id)
+
+    def part_size(self, size):
+        """
+        :param size: file size in bytes
+        :return: part size in bytes when the file will be uploaded in parts, otherwise None
+        """
+        if size < self.transfer_config.multipart_threshold:
+            return None
+        return ChunksizeAdjuster().adjust_chunksize(self.transfer_config.multipart_chunksize, size)
+
+    @classmethod
+    def multipart_etag(cls, path, chunksize):
+        """
+        Compute the ETag which S3 assigns to the file uploaded by multipart upload
+
+        :param path: local file path
+        :param chunksize: part size in bytes
+        :return: ETag string without quotes, e.g. "d41d8cd98f00b204e9800998ecf8427e-2"
+        """
+        return FileDigest.from_path(path, chunksize).multipart_etag()
+
+    @classmethod
+    def _is_not_modified(cls, e):
+        return e.response['Error']['Code'] in ('304', 'NotModified') or \
+            e.response.get('ResponseMetadata', {}).get('HTTPStatusCode') == 304
+
+    @classmethod
+    def _is_conflict(cls, e):
+        # 409 is returned when a conflicting conditional write is in progress
+        return e.response['Error']['Code'] in ('PreconditionFailed', 'ConditionalRequestConflict') or \
+            e.response.get('ResponseMetadata', {}).get('HTTPStatusCode') in (409, 412)
 
     @classmethod
     def s3_url(cls, bucket_name, key):
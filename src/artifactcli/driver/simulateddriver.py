@@ -0,0 +1,208 @@
+import os
+import random
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from .mockdriver import MockDriver
+
+
+class SlowDown(IOError):
+    """
+    Request rejected by the simulated throttling, like S3 SlowDown (HTTP 503)
+    """
+
+    def __init__(self, operation):
+        super(SlowDown, self).__init__('SlowDown: Please reduce your request rate. (503, %s)' % operation)
+        self.operation = operation
+        self.response = {'Error': {'Code': 'SlowDown', 'Message': 'Please reduce your request rate.'},
+                         'ResponseMetadata': {'HTTPStatusCode': 503}}
+
+
+class SimulatedDriver(MockDriver):
+    """
+    Mock driver which simulates the latency, bandwidth and throttling of a remote storage
+
+    Every method counts as the S3 request it would make, and takes
+    latency + random jitter + transferred bytes / bandwidth seconds.
+    A request is rejected with SlowDown at the error rate, and retried up to max_attempts times
+    with exponential backoff, as AWS SDKs do.
+    With a seed and a single thread, the sequence of delays and errors is reproducible.
+    Pass a fake sleep function to run without waiting; simulated_seconds sums up the delays anyway.
+    """
+
+    def __init__(self, latency=0.0, jitter=0.0, bandwidth=None, error_rate=0.0, max_attempts=1,
+                 backoff=0.05, max_connections=None, seed=None, sleep=None):
+        """
+        :param latency: seconds taken by every request
+        :param jitter: maximum seconds randomly added to the latency
+        :param bandwidth: bytes per second of each connection (None for unlimited)
+        :param error_rate: probability that a request is rejected with SlowDown
+        :param max_attempts: number of attempts of a request including retries
+        :param backoff: base seconds to wait before a retry, doubled on every retry with random jitter
+        :param max_connections: number of requests in flight at the same time (None for unlimited)
+                                Other requests wait for a free connection, as with a connection pool.
+        :param seed: seed of the random numbers
+        :param sleep: function to wait for the given seconds (default: time.sleep)
+        """
+        super(SimulatedDriver, self).__init__()
+        assert 0.0 <= error_rate <= 1.0, 'error_rate must be between 0 and 1: %s' % error_rate
+        assert max_attempts >= 1, 'max_attempts must be positive: %s' % max_attempts
+        self.latency = latency
+        self.jitter = jitter
+        self.bandwidth = bandwidth
+        self.error_rate = error_rate
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_connections = max_connections
+        self._random = random.Random(seed)
+        self._sleep = sleep or time.sleep
+        self._connections = threading.BoundedSemaphore(max_connections) if max_connections else None
+        self._stats_lock = threading.Lock()
+        self.reset_request_counts()
+
+    def reset_request_counts(self):
+        """
+        Reset the statistics
+
+        request_counts: attempts by S3 operation name, e.g. {'GetObject': 2}
+        error_counts: attempts rejected with SlowDown by operation name
+        transferred_bytes: bytes sent or received by the successful requests
+        simulated_seconds: total seconds of the simulated delays
+        max_in_flight: largest number of requests in flight at the same time
+        """
+        with self._stats_lock:
+            self.request_counts = Counter()
+            self.error_counts = Counter()
+            self.transferred_bytes = 0
+            self.simulated_seconds = 0.0
+            self.in_flight = 0
+            self.max_in_flight = 0
+
+    def artifact_ids(self):
+        self._request('ListObjectsV2')
+        return super(SimulatedDriver, self).artifact_ids()
+
+    def read_index(self, artifact_id):
+        self._request('GetObject', self._size(self.index_data.get(artifact_id)))
+        return super(SimulatedDriver, self).read_index(artifact_id)
+
+    def write_index(self, artifact_id, s, if_match=None):
+        self._request('PutObject', self._size(s))
+        return super(SimulatedDriver, self).write_index(artifact_id, s, if_match)
+
+    def delta_names(self, artifact_id=None):
+        self._request('ListObjectsV2')
+        return super(SimulatedDriver, self).delta_names(artifact_id)
+
+    def read_delta(self, artifact_id, name):
+        s = super(SimulatedDriver, self).read_delta(artifact_id, name)
+        self._request('GetObject', self._size(s))
+        return s
+
+    def append_delta(self, artifact_id, s, after=None):
+        self._request('PutObject', self._size(s))
+        return super(SimulatedDriver, self).append_delta(artifact_id, s, after)
+
+    def delete_deltas(self, artifact_id, names):
+        self._request('DeleteObjects')
+        super(SimulatedDriver, self).delete_deltas(artifact_id, names)
+
+    def read_latest(self, artifact_id, version, packaging, with_etag=False):
+        ret = super(SimulatedDriver, self).read_latest(artifact_id, version, packaging, with_etag)
+        self._request('GetObject', self._size(ret[0] if with_etag else ret))
+        return ret
+
+    def write_latest(self, artifact_id, version, packaging, s, if_match=None):
+        self._request('PutObject', self._size(s))
+        return super(SimulatedDriver, self).write_latest(artifact_id, version, packaging, s, if_match)
+
+    def delete_latest(self, artifact_id, version, packaging):
+        self._request('DeleteObject')
+        super(SimulatedDriver, self).delete_latest(artifact_id, version, packaging)
+
+    def reserve_revision(self, artifact_id, version, packaging, revision):
+        self._request('PutObject')
+        return super(SimulatedDriver, self).reserve_revision(artifact_id, version, packaging, revision)
+
+    def release_revision(self, artifact_id, version, packaging, revision):
+        self._request('DeleteObject')
+        super(SimulatedDriver, self).release_revision(artifact_id, version, packaging, revision)
+
+    def is_reserved(self, artifact_id, version, packaging, revision):
+        self._request('HeadObject')
+        return super(SimulatedDriver, self).is_reserved(artifact_id, version, packaging, revision)
+
+    def upload(self, local_path, remote_path, md5, multipart_etag=None):
+        self._request('PutObject', self._file_size(local_path))
+        super(SimulatedDriver, self).upload(local_path, remote_path, md5, multipart_etag)
+
+    def download(self, remote_path, local_path, md5):
+        uploaded = self.uploaded_data.get(remote_path)
+        self._request('GetObject', self._file_size(uploaded[0]) if uploaded else 0)
+        super(SimulatedDriver, self).download(remote_path, local_path, md5)
+
+    def delete(self, remote_path, md5):
+        self._request('DeleteObject')
+        super(SimulatedDriver, self).delete(remote_path, md5)
+
+    def exists(self, remote_path, md5):
+        self._request('HeadObject')
+        return super(SimulatedDriver, self).exists(remote_path, md5)
+
+    def copy(self, src_path, dst_path, md5):
+        self._request('CopyObject')  # copied in the storage without transferring the data
+        super(SimulatedDriver, self).copy(src_path, dst_path, md5)
+
+    def _request(self, operation, size=0):
+        """
+        Wait for one request and its retries
+
+        :param operation: S3 operation name
+        :param size: bytes to transfer
+        :return: None, or raise SlowDown when all attempts are throttled
+        """
+        with self._connection():
+            for attempt in range(self.max_attempts):
+                with self._stats_lock:
+                    self.request_counts[operation] += 1
+                    throttled = self._random.random() < self.error_rate
+                    delay = self.latency + self._random.uniform(0, self.jitter)
+                    if not throttled and self.bandwidth:
+                        delay += float(size) / self.bandwidth
+                    if throttled:
+                        self.error_counts[operation] += 1
+                        if attempt + 1 < self.max_attempts:
+                            delay += self._random.uniform(0, self.backoff * 2 ** attempt)
+                    else:
+                        self.transferred_bytes += size
+                    self.simulated_seconds += delay
+                self._sleep(delay)
+                if not throttled:
+                    return
+            raise SlowDown(operation)
+
+    @contextmanager
+    def _connection(self):
+        if self._connections:
+            self._connections.acquire()
+        with self._stats_lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            yield
+        finally:
+            with self._stats_lock:
+                self.in_flight -= 1
+            if self._connections:
+                self._connections.release()
+
+    @classmethod
+    def _size(cls, s):
+        if not s:
+            return 0
+        return len(s) if isinstance(s, bytes) else len(s.encode('utf-8'))
+
+    @classmethod
+    def _file_size(cls, path):
+        return os.path.getsize(path) if path and os.path.isfile(path) else 0
@@ -0,0 +1,93 @@
+import logging
+import os
+import sqlite3
+import time
+from .util import CaseClass
+from .util.cachedir import DEFAULT_CACHE_DIR
+
+# files modified this recently may still change within the same mtime tick, so they are not cached
+RACY_SECONDS = 2
+
+
+class HashCache(CaseClass):
+    """
+    Persistent cache of file digests keyed by (device, inode, size, mtime_ns)
+
+    A cached digest is used only while all of the key components are unchanged,
+    so modified, replaced or truncated files are rehashed automatically.
+    All errors on the database are logged and treated as cache misses.
+    """
+
+    def __init__(self, cache_dir=None):
+        super(HashCache, self).__init__(['path'])
+        self.path = os.path.join(os.path.expanduser(cache_dir or DEFAULT_CACHE_DIR), 'hashes.db')
+
+    def digest(self, path, name, func):
+        """
+        Return the cached digest of the file, or compute and store it
+
+        :param path: local file path
+        :param name: digest name (e.g. 'md5')
+        :param func: function which takes the path and computes the digest
+        :return: digest string
+        """
+        return self.digests(path, [name], lambda p: {name: func(p)})[name]
+
+    def digests(self, path, names, func):
+        """
+        Return the cached digests of the file, or compute and store all of them when any is missing
+
+        :param path: local file path
+        :param names: list of digest names
+        :param func: function which takes the path and computes a dict of all digests by name
+        :return: dict of digest strings by name
+        """
+        st = os.stat(path)
+        cached = dict((name, self._get(st, name)) for name in names)
+        if all(v is not None for v in cached.values()):
+            logging.debug('Using cached digests: %s' % path)
+            return cached
+
+        values = func(path)
+        if self._key(os.stat(path)) == self._key(st) and time.time() - st.st_mtime >= RACY_SECONDS:
+            self._put(st, dict((name, values[name]) for name in names))
+        return values
+
+    @classmethod
+    def _key(cls, st):
+        return st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns
+
+    def _connect(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=10)
+        conn.execute('CREATE TABLE IF NOT EXISTS digests (dev INTEGER, ino INTEGER, name TEXT, size INTEGER, '
+                     'mtime_ns INTEGER, value TEXT, PRIMARY KEY (dev, ino, name))')
+        return conn
+
+    def _get(self, st, name):
+        try:
+            conn = self._connect()
+            try:
+                row = conn.execute('SELECT value FROM digests WHERE dev=? AND ino=? AND name=? AND size=? '
+                                   'AND mtime_ns=?', (st.st_dev, st.st_ino, name, st.st_size, st.st_mtime_ns)
+                                   ).fetchone()
+            finally:
+                conn.close()
+        except (sqlite3.Error, OSError) as e:
+            logging.debug('Failed to read hash cache: %s' % e)
+            return None
+        return row[0] if row else None
+
+    def _put(self, st, values):
+        try:
+            conn = self._connect()
+            try:
+                with conn:
+                    # one row per inode and name, so stale entries are replaced rather than accumulated
+                    conn.executemany('INSERT OR REPLACE INTO digests VALUES (?, ?, ?, ?, ?, ?)',
+                                     [(st.st_dev, st.st_ino, name, st.st_size, st.st_mtime_ns, value)
+                                      for name, value in sorted(values.items())])
+            finally:
+                conn.close()
+        except (sqlite3.Error, OSError) as e:
+            logging.debug('Failed to write hash cache: %s' % e)
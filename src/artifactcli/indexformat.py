@@ -0,0 +1,196 @@
+import json
+import zlib
+from datetime import datetime, timedelta
+from .artifact import Artifact, BasicInfo, FileInfo, GitInfo
+from .util import parse_datetime
+
+FORMAT_JSON = 'json'
+FORMAT_COMPACT = 'compact'
+FORMATS = [FORMAT_JSON, FORMAT_COMPACT]
+
+# header of the compact format followed by one byte of the format version
+# The first byte is never valid in UTF-8, so the data cannot be mistaken for JSON text.
+COMPACT_MAGIC = b'\x89ARTIDX'
+COMPACT_VERSION = 1
+
+EPOCH = datetime(1970, 1, 1)
+
+# columns of a row in the compact format version 1
+# '@' marks references to the string table, '#' marks timestamps.
+# Rows of artifacts without SCM information have only the first 12 columns.
+COLUMNS = [
+    '@group_id', '@artifact_id', '@version', '@packaging', 'revision',
+    '@host', '@user', 'size', '#mtime', 'md5', 'sha256', '@location',
+    '@branch', '@tags', '@author_name', '@author_email', '#committed_date', 'summary', '@sha',
+]
+
+
+def detect(data):
+    """
+    :param data: index data in unicode or bytes
+    :return: format name of the data
+    """
+    return FORMAT_COMPACT if isinstance(data, bytes) and data.startswith(COMPACT_MAGIC) else FORMAT_JSON
+
+
+def encode(artifacts, index_format=FORMAT_JSON):
+    """
+    :param artifacts: list of artifacts
+    :param index_format: format name
+    :return: index json text in unicode, or bytes in the compact format
+    """
+    if index_format == FORMAT_JSON:
+        return json.dumps([x.to_dict() for x in artifacts], ensure_ascii=False)
+    if index_format == FORMAT_COMPACT:
+        return _encode_compact(artifacts)
+    raise ValueError('Unknown index format: %s' % index_format)
+
+
+def decode(data, lazy=True):
+    """
+    :param data: index data in either format, in unicode or bytes
+    :param lazy: if True, artifacts keep rows of raw values and are materialized on first access
+                 (see Artifact.lazy)
+    :return: list of artifacts
+    """
+    if not data:
+        return []
+    if detect(data) == FORMAT_COMPACT:
+        return _decode_compact(data, lazy)
+    if isinstance(data, bytes):
+        data = data.decode('utf-8')
+    records = json.loads(data)
+    if not lazy:
+        return [Artifact.from_dict(x) for x in records]
+    memo = {}
+    return [Artifact.lazy(_Rows, _json_row(x, memo)) for x in records]
+
+
+class _Rows(object):
+    """
+    Loader of lazy artifacts from rows of the values in the order of COLUMNS
+
+    Timestamps are kept as stored, and parsed when the artifact is materialized.
+    """
+
+    @classmethod
+    def materialize(cls, row):
+        bi = BasicInfo(row[0], row[1], row[2], row[3], row[4])
+        fi = FileInfo(row[5], row[6], row[7], _decode_time(row[8]), row[9], row[10])
+        si = None
+        if len(row) > 12:
+            si = GitInfo(row[12], list(row[13]), row[14], row[15], _decode_time(row[16]), row[17], row[18])
+        return Artifact(bi, fi, si, row[11])
+
+    @classmethod
+    def lookup_key(cls, row):
+        return row[1], row[2], row[3], row[4], row[7], row[9]
+
+    @classmethod
+    def to_dict(cls, row):
+        # same as Artifact.to_dict() of the materialized artifact, except that timestamps are written back as read
+        ret = {
+            'basic_info': dict(zip(BasicInfo.keys, row[:5])),
+            'file_info': {'host': row[5], 'user': row[6], 'size': row[7], 'mtime': _iso_time(row[8]),
+                          'hex_md5': row[9]},
+        }
+        if row[10]:
+            ret['file_info']['hex_sha256'] = row[10]
+        if len(row) > 12:
+            ret['scm_info'] = {
+                'system': 'git', 'branch': row[12], 'tags': list(row[13]), 'author_name': row[14],
+                'author_email': row[15], 'committed_date': _iso_time(row[16]), 'summary': row[17], 'sha': row[18],
+            }
+        if row[11]:
+            ret['location'] = row[11]
+        return ret
+
+
+def _json_row(d, memo):
+    """
+    Pack a record of the JSON format into a row, sharing repeated strings through the memo
+    """
+    def s(x):
+        return memo.setdefault(x, x)
+
+    bi, fi, si = d['basic_info'], d['file_info'], d.get('scm_info')
+    row = (s(bi['group_id']), s(bi['artifact_id']), s(bi['version']), s(bi['packaging']), bi['revision'],
+           s(fi['host']), s(fi['user']), fi['size'], fi['mtime'], fi['hex_md5'], fi.get('hex_sha256'),
+           d.get('location'))
+    if si and si['system'] == 'git':
+        row += (s(si['branch']), [s(t) for t in si['tags']], s(si['author_name']), s(si['author_email']),
+                si['committed_date'], si['summary'], s(si['sha']))
+    return row
+
+
+def _encode_time(dt):
+    # naive datetimes in whole seconds are stored as integers, others as ISO 8601 strings
+    if dt.tzinfo is None and not dt.microsecond:
+        return (dt - EPOCH) // timedelta(seconds=1)
+    return dt.isoformat()
+
+
+def _decode_time(x):
+    if isinstance(x, int):
+        return EPOCH + timedelta(seconds=x)
+    return parse_datetime(x)
+
+
+def _iso_time(x):
+    return _decode_time(x).isoformat() if isinstance(x, int) else x
+
+
+def _encode_compact(artifacts):
+    strings = []
+    refs = {}
+
+    def ref(s):
+        if s is None:
+            return None
+        i = refs.get(s)
+        if i is None:
+            i = refs[s] = len(strings)
+            strings.append(s)
+        return i
+
+    rows = []
+    for art in artifacts:
+        bi, fi, si = art.basic_info, art.file_info, art.scm_info
+        row = [
+            ref(bi.group_id), ref(bi.artifact_id), ref(bi.version), ref(bi.packaging), bi.revision,
+            ref(fi.host), ref(fi.user), fi.size, _encode_time(fi.mtime), fi.md5, fi.sha256, ref(art.location),
+        ]
+        if si:
+            row += [ref(si.branch), [ref(t) for t in si.tags], ref(si.author_name), ref(si.author_email),
+                    _encode_time(si.committed_date), si.summary, ref(si.sha)]
+        rows.append(row)
+
+    payload = json.dumps({'strings': strings, 'rows': rows}, ensure_ascii=False, separators=(',', ':'))
+    return COMPACT_MAGIC + bytes([COMPACT_VERSION]) + zlib.compress(payload.encode('utf-8'))
+
+
+def _decode_compact(data, lazy=True):
+    version = data[len(COMPACT_MAGIC)]
+    if version != COMPACT_VERSION:
+        raise ValueError('Unsupported index format version: %d' % version)
+
+    payload = json.loads(zlib.decompress(data[len(COMPACT_MAGIC) + 1:]).decode('utf-8'))
+    strings = payload['strings']
+    rows = (_compact_row(strings, row) for row in payload['rows'])
+    if lazy:
+        return [Artifact.lazy(_Rows, row) for row in rows]
+    return [_Rows.materialize(row) for row in rows]
+
+
+def _compact_row(strings, row):
+    """
+    Resolve the references to the string table in a row of the compact format
+    """
+    def s(i):
+        return None if i is None else strings[i]
+
+    ret = (strings[row[0]], strings[row[1]], strings[row[2]], strings[row[3]], row[4],
+           s(row[5]), s(row[6]), row[7], row[8], row[9], row[10], s(row[11]))
+    if len(row) > 12:
+        ret += (s(row[12]), [strings[t] for t in row[13]], s(row[14]), s(row[15]), row[16], row[17], s(row[18]))
+    return ret
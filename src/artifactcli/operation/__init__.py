@@ -5,6 +5,8 @@ __all__ = [
     'DownloadOperation',
     'InfoOperation',
     'DeleteOperation',
+    'MigrateOperation',
+    'DaemonOperation',
 ]
 from .help import HelpOperation
 from .list import ListOperation
@@ -12,6 +14,8 @@ from .upload import UploadOperation
 from .download import DownloadOperation
 from .info import InfoOperation
 from .delete import DeleteOperation
+from .migrate import MigrateOperation
+from .daemon import DaemonOperation
 
 
 def make(command, group_id, args, options):
@@ -23,7 +27,7 @@ def make(command, group_id, args, options):
     :return: Raise AssertionError when failure
     """
     if command == 'list':
-        return ListOperation(group_id, args, options['output'])
+        return ListOperation(group_id, args, options['output'], options['jobs'])
     if command == 'upload':
         return UploadOperation(group_id, args, options['force'], options['print_only'])
     if command == 'download':
@@ -32,4 +36,8 @@ def make(command, group_id, args, options):
         return InfoOperation(group_id, args, options['output'])
     if command == 'delete':
         return DeleteOperation(group_id, args, options['print_only'])
+    if command == 'migrate':
+        return MigrateOperation(group_id, args, options['print_only'], options.get('index_format'))
+    if command == 'daemon':
+        return DaemonOperation(([group_id] if group_id else []) + args)
     raise AssertionError('Unknown command: %s' % command)
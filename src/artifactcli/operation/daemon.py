@@ -0,0 +1,26 @@
+import logging
+from .baseoperation import BaseOperation
+
+
+class DaemonOperation(BaseOperation):
+    def __init__(self, args):
+        super(DaemonOperation, self).__init__(None, args)
+
+    def run(self, repo=None):
+        from artifactcli.daemon import ArtifactDaemon, socket_path
+
+        path = socket_path()
+        try:
+            server = ArtifactDaemon(path)
+        except ValueError as e:
+            logging.error(e)
+            return 1
+
+        logging.info('Listening on %s' % path)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+        return 0
@@ -14,8 +14,11 @@ class DownloadOperation(BaseOperation):
         revision = None if self.revision == 'latest' else int(self.revision)
 
         try:
-            repo.load(BasicInfo.from_path(self.group_id, self.local_path).artifact_id)
-            repo.download(self.local_path, revision, print_only=self.print_only)
+            if revision is None:
+                repo.download_latest(self.local_path, print_only=self.print_only)
+            else:
+                repo.load(BasicInfo.from_path(self.group_id, self.local_path).artifact_id)
+                repo.download(self.local_path, revision, print_only=self.print_only)
         except ValueError as e:
             logging.error(e)
             return 2
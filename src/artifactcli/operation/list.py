@@ -2,10 +2,11 @@ from .baseoperation import BaseOperation
 
 
 class ListOperation(BaseOperation):
-    def __init__(self, group_id, args, output=None):
-        super(ListOperation, self).__init__(group_id, args, {'output': output})
+    def __init__(self, group_id, args, output=None, jobs=None):
+        super(ListOperation, self).__init__(group_id, args, {'output': output, 'jobs': jobs})
+        assert jobs is None or jobs > 0
 
     def run(self, repo):
-        repo.load_all()
+        repo.load_all(self.jobs)
         repo.print_list(self.output)
         return 0
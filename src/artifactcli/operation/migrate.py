@@ -0,0 +1,31 @@
+import logging
+from .baseoperation import BaseOperation
+
+
+class MigrateOperation(BaseOperation):
+    def __init__(self, group_id, args, print_only, index_format=None):
+        """
+        :param index_format: format to convert the index files to
+                             When set, files are moved to blobs only if the repository is content-addressed.
+        """
+        super(MigrateOperation, self).__init__(group_id, args, {'print_only': print_only,
+                                                                'index_format': index_format})
+
+    def run(self, repo):
+        repo.load_all()
+        migrate_files = self.index_format is None or repo.content_addressed
+        for artifact_id in sorted(repo.artifacts.keys()):
+            count = repo.migrate(artifact_id, print_only=self.print_only) if migrate_files else 0
+            convert = self.index_format is not None and repo.index_format_of(artifact_id) != self.index_format
+            if self.print_only:
+                if convert:
+                    logging.info('Would convert index to %s format: %s' % (self.index_format, artifact_id))
+                continue
+
+            if count or convert:
+                repo.save(artifact_id, self.index_format)
+            if count:
+                logging.info('Migrated %d artifact(s): %s' % (count, artifact_id))
+            if convert:
+                logging.info('Converted index to %s format: %s' % (self.index_format, artifact_id))
+        return 0
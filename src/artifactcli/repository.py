@@ -1,50 +1,480 @@
 import json
 import logging
+import os
+import random
 import sys
-from copy import deepcopy
-from collections import defaultdict
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from copy import copy, deepcopy
 from .artifact import Artifact, BasicInfo
+from .artifactindex import ArtifactIndex
+from . import indexformat
 from .util import *
 
+DEFAULT_LOAD_JOBS = 8
+
+# number of index deltas at which saving writes the whole index and deletes the deltas
+JOURNAL_COMPACT_THRESHOLD = 32
+
+# number of attempts to write the whole index when it is modified by others concurrently
+SAVE_RETRIES = 10
+
+# base interval in seconds before retrying to write the index, doubled on every attempt with random jitter
+SAVE_RETRY_INTERVAL = 0.05
+
 
 class Repository(CaseClass):
-    def __init__(self, driver, group_id):
+    """
+    Artifacts index of a group and the operations on it
+
+    The repository is safe to use from multiple threads.
+    Operations modifying the artifacts of an artifact id hold the lock for the id,
+    so operations on different artifact ids run in parallel.
+    The index is updated by copy-on-write: a new index object is swapped in on every change,
+    so readers use a consistent snapshot without blocking writers.
+
+    The index of an artifact id is stored as a base index and append-only deltas,
+    which are merged on load. When journaling is enabled, saving writes only a delta
+    with the operations since the last load or save, and the deltas are folded into
+    the base index every JOURNAL_COMPACT_THRESHOLD saves.
+
+    The whole index is written only if it has not changed since it was read.
+    When another client has written it meanwhile, the index is read again, the operations
+    since the last load are replayed on it, and the write is retried.
+    Without journaling, upload writes the index before the file to reserve a unique revision.
+
+    Loaded artifacts keep the raw index records and are materialized only when they are accessed,
+    so finding one artifact does not build objects for the whole history.
+
+    For each version and packaging, a small latest pointer holding the latest artifact is written
+    after the index, so that the latest revision can be downloaded without reading the index.
+    """
+
+    def __init__(self, driver, group_id, content_addressed=False, hash_cache=None, index_format=None,
+                 journal=False):
+        """
+        :param driver: storage driver
+        :param group_id: group id
+        :param content_addressed: if True, new files are stored as blobs keyed by their SHA-256 digest
+                                  and identical files are stored only once in the group
+        :param hash_cache: HashCache object to avoid rehashing unchanged local files
+        :param index_format: format to write the index in, 'json' or 'compact'
+                             (default: the format read from storage, and JSON for new indexes)
+        :param journal: if True, save changes as index deltas instead of rewriting the whole index
+        """
         super(Repository, self).__init__(['driver', 'group_id', 'artifacts'])
         self.driver = driver
         self.group_id = group_id
-        self.artifacts = defaultdict(list)
+        self.content_addressed = content_addressed
+        self.hash_cache = hash_cache
+        self.index_format = index_format
+        self.journal = journal
+        self._index_formats = {}  # formats of the index data read from storage
+        self._meta_lock = threading.Lock()  # guards swapping the index and the lock table
+        self._locks = {}
+        self.artifacts = ArtifactIndex()
+
+    @property
+    def artifacts(self):
+        """
+        Current index, which must not be modified in place while other threads use the repository
+        """
+        return self._artifacts
+
+    @artifacts.setter
+    def artifacts(self, value):
+        self._artifacts = value if isinstance(value, ArtifactIndex) else ArtifactIndex(value)
+        # tuples of (ETag of the base index, delta names) which the loaded artifacts are parsed from
+        # and not modified since
+        self._loaded_etags = {}
+        # names of the deltas merged into the loaded artifacts
+        self._loaded_deltas = {}
+        # operations since the last load or save, or None if only the whole index can be saved
+        self._pending = {}
+        # ETags of the base indexes which the loaded artifacts are based on, for conditional writes
+        self._base_etags = {}
+        # uploaded artifacts renumbered by the last rebase, whose original revisions have been given up
+        self._given_up = {}
+
+    def lock(self, artifact_id):
+        """
+        Lock held by the operations on the artifact id
+
+        Hold it to run a sequence of operations atomically, e.g. load, upload and save.
+
+        :param artifact_id: artifact id
+        :return: reentrant lock object
+        """
+        with self._meta_lock:
+            lock = self._locks.get(artifact_id)
+            if lock is None:
+                lock = self._locks[artifact_id] = threading.RLock()
+            return lock
+
+    def snapshot(self):
+        """
+        :return: current index, which is never modified afterwards and can be read without locking
+        """
+        return self._artifacts
+
+    def _publish(self, artifact_id, artifacts):
+        # build the lookup tables outside the lock; swapping them takes time only per artifact id
+        index = ArtifactIndex({artifact_id: artifacts})
+        with self._meta_lock:
+            self._artifacts = self._artifacts.merge(index)
 
     def load(self, artifact_id):
         """
         Load artifacts index for specified artifact id from storage
 
+        Parsing is skipped when the index has not changed since the last load or save.
+
         :param artifact_id: artifact id to load
         :return: None
         """
-        s = self.driver.read_index(artifact_id)
-        xs = json.loads(s, encoding='utf-8') if s else []
-        self.artifacts[artifact_id] = [Artifact.from_dict(x) for x in xs]
-
-    def load_all(self):
+        with self.lock(artifact_id):
+            xs, etag = self._read_artifacts_if_changed(artifact_id)
+            if xs is not None:
+                self._publish(artifact_id, xs)
+                self._pending[artifact_id] = []
+            self._loaded(artifact_id, etag)
+
+    def load_all(self, jobs=None):
         """
         Load all artifacts index from storage
 
+        Index data are fetched and parsed concurrently.
+        When some of them fail, the error for the first artifact id in sorted order is raised
+        and the current index is left unchanged.
+        Artifact ids modified by other threads meanwhile keep their current artifacts.
+
+        :param jobs: maximum number of concurrent requests (default: DEFAULT_LOAD_JOBS)
         :return: None
         """
-        self.artifacts = defaultdict(list)
-        for artifact_id in self.driver.artifact_ids():
-            self.load(artifact_id)
+        start = self._artifacts
+        artifact_ids = self.driver.artifact_ids()
+        delta_names = self.driver.delta_names()
+        jobs = min(jobs or DEFAULT_LOAD_JOBS, len(artifact_ids))
+
+        def f(artifact_id):
+            return self._read_artifacts_locked(artifact_id, delta_names.get(artifact_id, []))
+
+        if jobs <= 1:
+            results = [f(artifact_id) for artifact_id in artifact_ids]
+        else:
+            with ThreadPoolExecutor(max_workers=jobs) as executor:
+                results = list(executor.map(f, artifact_ids))
+
+        # lookup tables are built outside the lock, which then only swaps references
+        loaded = ArtifactIndex(dict((k, xs) for k, (_, xs, _) in zip(artifact_ids, results) if xs is not None))
+
+        with self._meta_lock:
+            current = self._artifacts
+            # lists are replaced on every change, so identity tells if other threads have modified them
+            kept = set(k for k in current if current.get(k) is not start.get(k))
+            kept.update(k for k, (base, _, _) in zip(artifact_ids, results) if current.get(k) is not base)
+
+            for k in kept.intersection(loaded):
+                del loaded[k]
+            artifacts = current.merge(loaded)
+            for k in set(current).difference(kept, artifact_ids):
+                del artifacts[k]
+            self._loaded_etags = dict((k, self._loaded_etags[k]) for k in kept if k in self._loaded_etags)
+            for artifact_id, (_, xs, etag) in zip(artifact_ids, results):
+                if artifact_id not in kept:
+                    if artifact_id not in artifacts:
+                        artifacts[artifact_id] = []
+                    self._loaded(artifact_id, etag)
+                    if xs is not None:
+                        self._pending[artifact_id] = []
+            self._artifacts = artifacts
+
+    def _read_artifacts(self, artifact_id):
+        names = self.driver.delta_names(artifact_id)
+        s, deltas, _ = self._read_deltas(artifact_id, self.driver.read_index(artifact_id), names)
+        return self._merge_deltas(artifact_id, indexformat.decode(s), deltas)
+
+    def _read_artifacts_locked(self, artifact_id, delta_names=None):
+        """
+        :return: tuple of (list of artifacts when reading started, list of artifacts or None, ETag)
+        """
+        with self.lock(artifact_id):
+            return (self._artifacts.get(artifact_id),) + self._read_artifacts_if_changed(artifact_id, delta_names)
+
+    def _read_artifacts_if_changed(self, artifact_id, delta_names=None):
+        """
+        Deltas are listed before the base index is read, so that deltas folded into it meanwhile are not lost.
+
+        :param delta_names: names of the index deltas listed before this call (None to list them)
+        :return: tuple of (list of artifacts, or None if the loaded ones are up to date,
+                 tuple of (ETag of the base index or INDEX_ABSENT, delta names))
+        """
+        names = tuple(self.driver.delta_names(artifact_id) if delta_names is None else delta_names)
+        s = self.driver.read_index(artifact_id)
+        etag = (self._index_etag(artifact_id, s), names)
+        unchanged = etag[0] is not None and self._loaded_etags.get(artifact_id) == etag
+        if not unchanged:
+            s, deltas, etag = self._read_deltas(artifact_id, s, names)
+        if s:
+            self._index_formats[artifact_id] = indexformat.detect(s)
+        if unchanged:
+            return None, etag
+        return self._merge_deltas(artifact_id, indexformat.decode(s), deltas), etag
+
+    def _read_deltas(self, artifact_id, s, names):
+        """
+        Read the index deltas listed before the base index was read
 
-    def save(self, artifact_id):
+        A delta deleted meanwhile has been folded into a newer base index by a compaction,
+        so the base index is read again and the delta is skipped.
+
+        :param s: base index data read after listing the deltas
+        :param names: names of the deltas
+        :return: tuple of (base index data, list of tuples of (delta name, delta json text),
+                 tuple of (ETag of the base index or INDEX_ABSENT, names of the read deltas))
+        """
+        deltas = [(name, self.driver.read_delta(artifact_id, name)) for name in names]
+        if any(d is None for _, d in deltas):
+            logging.info('Index deltas have been folded by others. Reading the index again: %s' % artifact_id)
+            s = self.driver.read_index(artifact_id)
+            deltas = [(name, d) for name, d in deltas if d is not None]
+        return s, deltas, (self._index_etag(artifact_id, s), tuple(name for name, _ in deltas))
+
+    def _merge_deltas(self, artifact_id, artifacts, deltas):
+        """
+        Replay the operations in the index deltas on the artifacts of the base index
+
+        Operations already reflected are skipped, since deltas folded into the base index
+        may be read before they are deleted.
+
+        :param deltas: list of tuples of (delta name, delta json text)
+        """
+        if not deltas:
+            return artifacts
+
+        def key(x):
+            _, version, packaging, revision, _, md5 = x.lookup_key()
+            return version, packaging, revision, md5
+
+        xs = artifacts
+        keys = set(key(x) for x in xs)
+        for name, s in deltas:
+            for op, arg in json.loads(s)['ops']:
+                if op == 'add':
+                    art = Artifact.from_dict(arg)
+                    if key(art) not in keys:
+                        xs.append(art)
+                        keys.add(key(art))
+                elif op == 'delete':
+                    xs = [x for x in xs if key(x)[:3] != tuple(arg)]
+                    keys = set(k for k in keys if k[:3] != tuple(arg))
+                else:
+                    raise ValueError('Unknown operation in index delta: %s: %s' % (name, op))
+        return xs
+
+    def _index_etag(self, artifact_id, s):
+        etag = self.driver.index_etag(artifact_id)
+        return self.driver.INDEX_ABSENT if etag is None and not s else etag
+
+    def _loaded(self, artifact_id, etag):
+        self._loaded_etags[artifact_id] = etag
+        self._loaded_deltas[artifact_id] = etag[1]
+        self._base_etags[artifact_id] = etag[0]
+
+    def _journal(self, artifact_id, op, arg):
+        ops = self._pending.get(artifact_id)
+        if ops is not None:
+            ops.append([op, arg])
+
+    def _modified(self, artifact_id):
+        self._loaded_etags.pop(artifact_id, None)
+
+    def index_format_of(self, artifact_id):
+        """
+        :param artifact_id: artifact id
+        :return: format of the index data last read from or written to storage ('json' if unknown)
+        """
+        return self._index_formats.get(artifact_id, indexformat.FORMAT_JSON)
+
+    def save(self, artifact_id, index_format=None):
         """
         Persist current artifacts index for specified artifact id to storage
 
+        When journaling is enabled, only the operations since the last load or save are written as a delta
+        if possible.
+
         :param artifact_id: artifact id to save
+        :param index_format: format to write the whole index in, 'json' or 'compact'
+                             (default: the repository setting, or the format read from storage)
         :return: None
         """
-        xs = [x.to_dict() for x in self.artifacts[artifact_id]]
-        s = json.dumps(xs, ensure_ascii=False)
-        self.driver.write_index(artifact_id, s)
+        with self.lock(artifact_id):
+            self._update_latest(artifact_id, self._save(artifact_id, index_format))
+
+    def _save(self, artifact_id, index_format=None):
+        """
+        Persist the index without updating the latest pointers
+
+        :return: dict of (version, packaging) whose latest pointers should be updated
+                 to whether the pointer can be moved to a lower revision
+        """
+        ops = self._pending.get(artifact_id)
+        names = self._loaded_deltas.get(artifact_id, ())
+        self._given_up[artifact_id] = []
+        new_format = index_format or self.index_format or self.index_format_of(artifact_id)
+        if ops == [] and artifact_id in self._loaded_etags and new_format == self.index_format_of(artifact_id):
+            return {}  # nothing has changed since the last load or save
+
+        if ops is None:
+            keys = dict((x.lookup_key()[1:3], True) for x in self.artifacts.get(artifact_id, []))
+        else:
+            keys = {}
+            for op, arg in ops:
+                if op == 'add':
+                    keys.setdefault((arg.basic_info.version, arg.basic_info.packaging), False)
+                else:
+                    keys[tuple(arg[:2])] = True
+
+        if self.journal and index_format is None and ops is not None and artifact_id in self._index_formats \
+                and len(names) + 1 < JOURNAL_COMPACT_THRESHOLD:
+            if ops:
+                data = [[op, arg.to_dict() if op == 'add' else arg] for op, arg in ops]
+                # named after the loaded deltas, so that it is merged after them even when the clock lags
+                s = json.dumps({'ops': data}, ensure_ascii=False)
+                names += (self.driver.append_delta(artifact_id, s, max(names) if names else None),)
+            etag = self._base_etags.get(artifact_id)
+        else:
+            self._write_index(artifact_id, new_format)
+            names = self._loaded_deltas.get(artifact_id, ())
+            if names:
+                self.driver.delete_deltas(artifact_id, names)  # folded into the base index
+                names = ()
+            etag = self.driver.index_etag(artifact_id)
+        self._pending[artifact_id] = []
+        self._loaded(artifact_id, (etag, names))
+        return keys
+
+    def _update_latest(self, artifact_id, keys):
+        """
+        Write the latest pointers, or delete them when no revisions are left
+
+        Pointers are written only if they have not changed since read, and read again on conflicts.
+        A pointer is not moved to a lower revision unless an artifact has been deleted,
+        since others may have uploaded a higher revision meanwhile;
+        even then, it is kept at a higher revision whose marker still exists.
+        """
+        index = self.artifacts
+        for (version, packaging), lowering in sorted(keys.items()):
+            latest = index.find_latest(artifact_id, version, packaging)
+            revision = latest[0].basic_info.revision if latest else 0
+            s = json.dumps(latest[0].to_dict(), ensure_ascii=False) if latest else None
+            for i in range(SAVE_RETRIES):
+                current, etag = self._read_latest(artifact_id, version, packaging, with_etag=True)
+                if current and current.basic_info.revision > revision and \
+                        (not lowering or self.driver.is_reserved(artifact_id, version, packaging,
+                                                                 current.basic_info.revision)):
+                    break
+                if s is None:
+                    if current:
+                        self.driver.delete_latest(artifact_id, version, packaging)
+                    break
+                if self.driver.write_latest(artifact_id, version, packaging, s, etag):
+                    break
+                logging.info('Latest pointer has been modified by others. Retrying: %s-%s.%s'
+                             % (artifact_id, version, packaging))
+                time.sleep(random.uniform(0, SAVE_RETRY_INTERVAL * 2 ** i))
+            else:
+                logging.warning('Failed to update the latest pointer: too many concurrent updates: %s-%s.%s'
+                                % (artifact_id, version, packaging))
+
+    def _read_latest(self, artifact_id, version, packaging, with_etag=False):
+        """
+        :return: artifact object, or None when the pointer does not exist,
+                 or tuple of it and the ETag of the pointer when with_etag is True
+        """
+        ret = self.driver.read_latest(artifact_id, version, packaging, with_etag)
+        s = ret[0] if with_etag else ret
+        art = Artifact.from_dict(json.loads(s)) if s else None
+        return (art, ret[1]) if with_etag else art
+
+    def read_latest(self, file_name):
+        """
+        Find the latest revision by the latest pointer without reading the index
+
+        :param file_name: file name of the artifact
+                          artifact id, version and packaging is parsed from the file name
+        :return: artifact object, or None when the pointer does not exist
+        """
+        bi = BasicInfo.from_path(self.group_id, file_name)
+        return self._read_latest(bi.artifact_id, bi.version, bi.packaging)
+
+    def _write_index(self, artifact_id, index_format):
+        """
+        Write the whole index if it has not changed since read, otherwise rebase and retry
+        """
+        for i in range(SAVE_RETRIES):
+            s = indexformat.encode(self.artifacts.get(artifact_id, []), index_format)
+            if self.driver.write_index(artifact_id, s, self._base_etags.get(artifact_id)):
+                self._index_formats[artifact_id] = index_format
+                return
+            logging.info('Index has been modified by others. Retrying: %s' % artifact_id)
+            time.sleep(random.uniform(0, SAVE_RETRY_INTERVAL * 2 ** i))
+            self._rebase(artifact_id)
+        raise ValueError('Failed to save the index: too many concurrent updates: artifact_id=%s' % artifact_id)
+
+    def _rebase(self, artifact_id):
+        """
+        Read the index again and replay the operations since the last load on it
+
+        Uploaded artifacts whose revision has been taken by others are given the next revision,
+        and their files are copied to it before the index is written.
+        """
+        ops = self._pending.get(artifact_id)
+        if ops is None:
+            raise ValueError('Index has been modified by others: artifact_id=%s' % artifact_id)
+
+        self._loaded_etags.pop(artifact_id, None)
+        xs, etag = self._read_artifacts_if_changed(artifact_id)
+        index = ArtifactIndex({artifact_id: xs})
+        for i, (op, arg) in enumerate(ops):
+            if op == 'add':
+                bi = arg.basic_info
+                taken = index.find(artifact_id, bi.version, bi.packaging, bi.revision)
+                if any(x.file_info.md5 == arg.file_info.md5 for x in taken):
+                    continue
+                if taken:
+                    latest = index.find_latest(artifact_id, bi.version, bi.packaging)
+                    given_up, arg = arg, deepcopy(arg)
+                    arg.basic_info.revision = latest[0].basic_info.revision + 1
+                    self._reserve_revision(arg.basic_info, not arg.location)
+                    ops[i][1] = arg
+                    self._given_up.setdefault(artifact_id, []).append(given_up)
+                    logging.info('Revision has been taken by others. Renumbered: %s' % arg)
+                    if not arg.location:
+                        # server-side copy, which is much shorter than the upload
+                        self.driver.copy(given_up.s3_path(), arg.s3_path(), arg.file_info.md5)
+                index.append(arg)
+            else:
+                index.remove(artifact_id, *arg)
+        self._publish(artifact_id, index[artifact_id])
+        self._loaded(artifact_id, etag)
+        self._modified(artifact_id)
+
+    def compact(self, artifact_id):
+        """
+        Fold the index deltas into the base index
+
+        :param artifact_id: artifact id to compact
+        :return: number of folded deltas
+        """
+        with self.lock(artifact_id):
+            self.load(artifact_id)
+            count = len(self._loaded_deltas.get(artifact_id, ()))
+            if count:
+                self._pending[artifact_id] = None
+                self.save(artifact_id)
+            return count
 
     def upload(self, local_path, artifact=None, force=False, print_only=False):
         """
@@ -56,37 +486,127 @@ class Repository(CaseClass):
                          Revision will be updated.
         :param force:
         :param print_only:
-        :return: None
+        :return: uploaded artifact, or the existing one when it is already uploaded
         """
         art = deepcopy(artifact)
         if not artifact:
-            art = Artifact.from_path(self.group_id, local_path)
+            part_size = self.driver.part_size(os.path.getsize(local_path))
+            art = Artifact.from_path(self.group_id, local_path, self.hash_cache, part_size)
 
+        with self.lock(art.basic_info.artifact_id):
+            return self._upload(local_path, art, force, print_only)
+
+    def _upload(self, local_path, art, force, print_only):
         bi = art.basic_info
         fi = art.file_info
 
         # check if the artifact is already in index
-        revisions = self._get_artifacts(bi.artifact_id, bi.version, bi.packaging)
-        xs = [x for x in revisions if (x.file_info.size, x.file_info.md5) == (fi.size, fi.md5)]
+        xs = self.artifacts.find_by_digest(bi.artifact_id, bi.version, bi.packaging, fi.size, fi.md5)
         if xs and not force:
             logging.warning('Already uploaded as:\n%s' % xs[0])
-            return
+            return xs[0]
 
         # increment revision
         latest = self._get_latest_artifact(bi.artifact_id, bi.version, bi.packaging)
         current_revision = latest[0].basic_info.revision if latest else 0
         bi.revision = current_revision + 1
+        art.location = self._blob_path(fi) if self.content_addressed else None
 
         # upload file
         if print_only:
             logging.info('Would upload artifact: \n\n%s\n' % art)
-            return
+            return art
+
+        self._reserve_revision(bi, not art.location)
+        self._upload_reserved(local_path, art)
+        ops = self._add_artifact(art)
+        if self.journal or bi.artifact_id not in self._base_etags:
+            return art
+
+        # write the index right away; the revision may be renumbered when taken by older clients meanwhile
+        try:
+            keys = self._save(bi.artifact_id)
+        except BaseException:
+            logging.warning('Failed to save the index. Removing the uploaded file: %s' % art)
+            self._discard_upload(ops[-1][1] if ops else art)
+            raise
+        self._update_latest(bi.artifact_id, keys)
+        return ops[-1][1] if ops else art
+
+    def _upload_reserved(self, local_path, art):
+        """
+        Upload the file of the artifact whose revision is reserved, releasing the revision on failure
+        """
+        bi = art.basic_info
+        try:
+            self._upload_file(local_path, art)
+        except BaseException:
+            self.driver.release_revision(bi.artifact_id, bi.version, bi.packaging, bi.revision)
+            raise
 
-        logging.info('Uploading artifact: \n%s\n' % art)
-        self.driver.upload(local_path, bi.s3_path(), fi.md5)
+    def _discard_upload(self, art):
+        """
+        Remove the uploaded artifact whose index entry could not be saved, and release its revision
+        along with the revisions given up by renumbering
 
-        # update index
-        self.artifacts[bi.artifact_id].append(art)
+        The files at the given-up revisions are left, since they belong to the older clients which took them.
+        """
+        bi = art.basic_info
+        self._del_artifacts(bi.artifact_id, bi.version, bi.packaging, bi.revision)
+        if not art.location and self.driver.exists(art.s3_path(), art.file_info.md5):
+            self.driver.delete(art.s3_path(), art.file_info.md5)
+        for x in [art] + self._given_up.get(bi.artifact_id, []):
+            self.driver.release_revision(bi.artifact_id, bi.version, bi.packaging, x.basic_info.revision)
+
+    def _reserve_revision(self, basic_info, check_path=False):
+        """
+        Take the revision, or the next one not taken by others, so that concurrent uploads
+        never get the same revision even when only index deltas are written
+
+        :param check_path: if True, also skip revisions whose path has a file, which older clients
+                           may have uploaded without the marker
+        """
+        bi = basic_info
+        while True:
+            if self.driver.reserve_revision(bi.artifact_id, bi.version, bi.packaging, bi.revision):
+                if not (check_path and self.driver.exists(bi.s3_path(), None)):
+                    return
+                logging.info('Revision has been taken by older clients: %s' % bi.s3_path())
+            else:
+                logging.info('Revision has been taken by others: %s-%s.%s revision %d'
+                             % (bi.artifact_id, bi.version, bi.packaging, bi.revision))
+            bi.revision += 1
+
+    def _upload_file(self, local_path, art):
+        fi = art.file_info
+        if art.location and self._is_stored(art.location, fi):
+            logging.info('Registering artifact (already stored as %s): \n%s\n' % (art.location, art))
+        else:
+            logging.info('Uploading artifact: \n%s\n' % art)
+            self.driver.upload(local_path, art.s3_path(), fi.md5, fi.multipart_etag)
+
+    def _blob_path(self, file_info):
+        # blobs are keyed by SHA-256, and by MD5 only for artifacts registered without it
+        return Artifact.blob_path(self.group_id, file_info.sha256 or file_info.md5)
+
+    def _is_stored(self, location, file_info):
+        """
+        Check if the blob is already stored, so that the file need not be transferred again
+
+        Blobs at MD5 keys are never trusted, since another file with a colliding digest may be stored there.
+        """
+        return bool(file_info.sha256) and location == self._blob_path(file_info) and \
+            self.driver.exists(location, file_info.md5)
+
+    def _add_artifact(self, art):
+        """
+        :return: list of the pending operations ending with the addition
+        """
+        aid = art.basic_info.artifact_id
+        self._publish(aid, self.artifacts.get(aid, []) + [art])
+        self._modified(aid)
+        self._journal(aid, 'add', art)
+        return self._pending.get(aid)
 
     def download(self, local_path, revision=None, print_only=False):
         """
@@ -97,17 +617,57 @@ class Repository(CaseClass):
         :param revision: revision to download
                          if revision is None, download latest revision
         :param print_only:
-        :return: None
+        :return: downloaded artifact
         """
-        art = self._get_artifact_from_path(local_path, revision)
+        return self._download(local_path, self._get_artifact_from_path(local_path, revision), print_only)
 
+    def download_latest(self, local_path, print_only=False):
+        """
+        Download the latest revision found by the latest pointer
+
+        The index is loaded only when the pointer does not exist or is out of date.
+        Older clients upload and delete artifacts without updating the pointers,
+        so the pointer is out of date when the next revision exists
+        or the file of the pointed revision does not.
+
+        :param local_path: destination path (including file name)
+                           artifact id, version and packaging is parsed from the file name
+        :param print_only:
+        :return: downloaded artifact
+        """
+        art = self.read_latest(local_path)
+        if art is not None and self._is_superseded(art):
+            logging.info('Latest pointer is out of date: %s' % art.basic_info.s3_path())
+            art = None
+        if art is not None:
+            try:
+                return self._download(local_path, art, print_only)
+            except ValueError as e:
+                logging.info('Latest pointer is out of date: %s' % e)
+
+        bi = BasicInfo.from_path(self.group_id, local_path)
+        self.load(bi.artifact_id)
+        return self._download(local_path, self._get_artifact(bi.artifact_id, bi.version, bi.packaging), print_only)
+
+    def _is_superseded(self, art):
+        """
+        Check if the next revision exists, by its marker, or by its file for older clients
+        which upload in the path layout without the marker
+        """
+        bi = copy(art.basic_info)
+        bi.revision += 1
+        return self.driver.is_reserved(bi.artifact_id, bi.version, bi.packaging, bi.revision) or \
+            self.driver.exists(bi.s3_path(), None)
+
+    def _download(self, local_path, art, print_only):
         # download file
         if print_only:
             logging.info('Would download artifact: \n\n%s\n' % art)
-            return
+            return art
 
         logging.info('Downloading artifact: \n%s\n' % art)
-        self.driver.download(art.basic_info.s3_path(), local_path, art.file_info.md5)
+        self.driver.download(art.s3_path(), local_path, art.file_info.md5)
+        return art
 
     def delete(self, file_name, revision, print_only=False):
         """
@@ -117,27 +677,84 @@ class Repository(CaseClass):
                           artifact id, version and packaging is parsed from the file name
         :param revision: revision to delete (should not be none)
         :param print_only:
-        :return: None
+        :return: deleted artifact
         """
         if revision is None:
             raise ValueError('Revision should be specified to delete.')
+        with self.lock(BasicInfo.from_path(self.group_id, file_name).artifact_id):
+            return self._delete(file_name, revision, print_only)
+
+    def _delete(self, file_name, revision, print_only):
         art = self._get_artifact_from_path(file_name, revision)
         bi = art.basic_info
 
         # delete file
         if print_only:
             logging.info('Would delete artifact: \n\n%s\n' % art)
-            return
+            return art
 
         logging.info('Deleting artifact: \n%s\n' % art)
-        self.driver.delete(bi.s3_path(), art.file_info.md5)
+        if art.location and self._is_shared(art):
+            logging.info('Keeping the file shared with other artifacts: %s' % art.location)
+        else:
+            self.driver.delete(art.s3_path(), art.file_info.md5)
 
         # update index
         self._del_artifacts(bi.artifact_id, bi.version, bi.packaging, revision)
+        self.driver.release_revision(bi.artifact_id, bi.version, bi.packaging, revision)
+        return art
+
+    def migrate(self, artifact_id, print_only=False):
+        """
+        Move artifacts stored in the path layout to content-addressed blobs
 
-    def print_list(self, output=None, fp=sys.stdout):
+        Files are copied in the storage and the original files are kept,
+        so that older clients which do not know blobs can still download them.
+        Call save() afterwards to persist the index.
+
+        :param artifact_id: artifact id to migrate
+        :param print_only:
+        :return: number of migrated artifacts
+        """
+        with self.lock(artifact_id):
+            count = 0
+            xs = []
+            for art in self.artifacts.get(artifact_id, []):
+                if not art.location:
+                    fi = art.file_info
+                    location = self._blob_path(fi)
+                    if print_only:
+                        logging.info('Would migrate artifact: %s -> %s' % (art.basic_info.s3_path(), location))
+                    else:
+                        if not self._is_stored(location, fi):
+                            self.driver.copy(art.basic_info.s3_path(), location, fi.md5)
+                        art = copy(art)
+                        art.location = location
+                    count += 1
+                xs.append(art)
+
+            if count and not print_only:
+                self._publish(artifact_id, xs)
+                self._modified(artifact_id)
+                self._pending[artifact_id] = None
+            return count
+
+    def get_artifact(self, file_name, revision=None):
+        """
+        Find the artifact in the loaded index
+
+        :param file_name: file name of the artifact
+                          artifact id, version and packaging is parsed from the file name
+        :param revision: revision to find
+                         if revision is None, find latest revision
+        :return: artifact object, or raise ValueError when not found
+        """
+        return self._get_artifact_from_path(file_name, revision)
+
+    def print_list(self, output=None, fp=None):
         output = output or 'text'
-        arts = sorted(x for xs in self.artifacts.values() for x in xs)
+        fp = fp or sys.stdout
+        arts = sorted(x for xs in self.snapshot().values() for x in xs)
         if not arts:
             logging.info('No artifacts.')
             return
@@ -166,8 +783,9 @@ class Repository(CaseClass):
         for line in buf:
             fp.write(line + '\n')
 
-    def print_info(self, file_name, revision=None, output=None, fp=sys.stdout):
+    def print_info(self, file_name, revision=None, output=None, fp=None):
         output = output or 'text'
+        fp = fp or sys.stdout
         art = self._get_artifact_from_path(file_name, revision)
 
         if output == 'text':
@@ -178,6 +796,20 @@ class Repository(CaseClass):
             raise ValueError('Unknown output format: %s' % output)
         fp.write(s + '\n')
 
+    def _is_shared(self, artifact):
+        """
+        Check if the file of the artifact is referenced by any other artifacts in the group
+
+        Index of the other artifact ids is read from the storage.
+        """
+        aid = artifact.basic_info.artifact_id
+        others = [x for x in self.artifacts.get(aid, []) if x is not artifact]
+        if any(x.location == artifact.location for x in others):
+            return True
+        return any(x.location == artifact.location
+                   for other_id in self.driver.artifact_ids() if other_id != aid
+                   for x in self._read_artifacts(other_id))
+
     def _get_artifact_from_path(self, path, revision=None):
         bi = BasicInfo.from_path(self.group_id, path)
         return self._get_artifact(bi.artifact_id, bi.version, bi.packaging, revision)
@@ -208,17 +840,23 @@ class Repository(CaseClass):
                 (revision is None or artifact.basic_info.revision == revision))
 
     def _get_artifacts(self, artifact_id=None, version=None, packaging=None, revision=None):
+        if None not in (artifact_id, version, packaging):
+            if revision is None:
+                return self.artifacts.find_all(artifact_id, version, packaging)
+            return self.artifacts.find(artifact_id, version, packaging, revision)
+
+        # partial match needs a full scan
         return [
             x for xs in self.artifacts.values() for x in xs
             if self._match_artifact(x, artifact_id, version, packaging, revision)
         ]
 
     def _del_artifacts(self, artifact_id, version, packaging, revision):
-        self.artifacts[artifact_id] = [
-            x for x in self.artifacts[artifact_id]
-            if not self._match_artifact(x, artifact_id, version, packaging, revision)
-        ]
+        index = self.artifacts
+        removing = set(id(x) for x in index.find(artifact_id, version, packaging, revision))
+        self._publish(artifact_id, [x for x in index.get(artifact_id, []) if id(x) not in removing])
+        self._modified(artifact_id)
+        self._journal(artifact_id, 'delete', [version, packaging, revision])
 
     def _get_latest_artifact(self, artifact_id, version, packaging):
-        ret = self._get_artifacts(artifact_id, version, packaging)
-        return [max(ret, key=lambda x: x.basic_info.revision)] if ret else []
+        return self.artifacts.find_latest(artifact_id, version, packaging)[:1]
@@ -1,13 +1,17 @@
 import logging
 import copy
-from .driver import S3Driver
 from os.path import expanduser, expandvars
 from . import operation as op
 from .operation import HelpOperation
 from .repository import Repository
 from .util import CaseClass
+from .util.fileurl import is_file_url
 from . import argparser
 
+# transfer settings in both command line options and configuration file
+TRANSFER_OPTIONS = ['multipart_threshold', 'multipart_chunksize', 'max_concurrency']
+MB = 1024 * 1024
+
 
 class Settings(CaseClass):
     """
@@ -39,12 +43,12 @@ class Settings(CaseClass):
         Parse command line arguments and update operation and options
         """
         options, args = Settings.parser.parse_args(argv[1:])
-        if len(args) < 2:
+        if len(args) < 2 and args[:1] != ['daemon']:
             return self
 
         opt_dict = vars(options)
         try:
-            operation = op.make(args[0], args[1], args[2:], opt_dict)
+            operation = op.make(args[0], args[1] if len(args) > 1 else None, args[2:], opt_dict)
         except AssertionError:
             return self
 
@@ -67,9 +71,12 @@ class Settings(CaseClass):
         else:
             return self
 
-    def load_config(self):
+    def load_config(self, repo_cache=None):
         """
         Load configuration file and set repo
+
+        :param repo_cache: dict to reuse repositories (with their drivers and loaded indexes)
+                           created with the same settings, or None to always create a new one
         """
         if self.options is None:
             return Settings()
@@ -85,38 +92,97 @@ class Settings(CaseClass):
         config = self.options['config']
         region = self.options['region']
 
-        if not all([access_key, secret_key, bucket]):
-            # command line arguments are prior to the configuration file
-            path = expandvars(expanduser(config))
-
-            try:
-                with open(path) as fp:
-                    a, s, b, r = self._read_aws_config(fp, group_id)
-                    access_key = a if access_key is None else access_key
-                    secret_key = s if secret_key is None else secret_key
-                    bucket = b if bucket is None else bucket
-                    region = r if region is None else region
-            except IOError:
+        transfer_settings = [self.options.get(k) for k in TRANSFER_OPTIONS]
+        content_addressed = self.options.get('content_addressed')
+        journal = self.options.get('journal')
+        blob_cache_size = self.options.get('blob_cache_size')
+        path = expandvars(expanduser(config))
+        try:
+            with open(path) as fp:
+                from_file = self._read_config(fp, group_id)
+        except IOError:
+            if not self._is_complete(access_key, secret_key, bucket):
                 logging.error('Failed to open configuration file: %s' % config)
                 return Settings()
-
+        except ValueError as e:
+            logging.error('Failed to read configuration file: %s: %s' % (config, e))
+            return Settings()
+        else:
+            # command line arguments are prior to the configuration file
+            if not self._is_complete(access_key, secret_key, bucket):
+                access_key = from_file['access_key'] if access_key is None else access_key
+                secret_key = from_file['secret_key'] if secret_key is None else secret_key
+                bucket = from_file['bucket'] if bucket is None else bucket
+                region = from_file['region'] if region is None else region
+            transfer_settings = [from_file[k] if x is None else x for k, x in zip(TRANSFER_OPTIONS, transfer_settings)]
+            if content_addressed is None:
+                content_addressed = from_file['content_addressed']
+            if journal is None:
+                journal = from_file['journal']
+            if blob_cache_size is None:
+                blob_cache_size = from_file['blob_cache_size']
+
+        is_local = is_file_url(bucket)
         for x, arg, opt in [
             (access_key, 'access_key', '--access'),
             (secret_key, 'secret_key', '--secret'),
             (bucket, 'bucket', '--bucket'),
         ]:
-            if x is None:
+            if x is None and not (is_local and arg != 'bucket'):
                 logging.error('Oops! "%s" setting is missing.' % arg)
                 logging.error('Use "%s" option or write configuration file: %s' % (opt, config))
                 return Settings()
 
+        for x, arg in zip(transfer_settings, TRANSFER_OPTIONS):
+            if x is not None and x <= 0:
+                logging.error('Oops! "%s" setting must be positive: %d' % (arg, x))
+                return Settings()
+
+        if blob_cache_size is not None and blob_cache_size < 0:
+            logging.error('Oops! "blob_cache_size" setting must not be negative: %d' % blob_cache_size)
+            return Settings()
+
+        no_cache = bool(self.options.get('no_cache'))
+        index_format = self.options.get('index_format')
+        key = (group_id, access_key, secret_key, bucket, region, tuple(transfer_settings), bool(content_addressed),
+               blob_cache_size, no_cache, index_format, bool(journal))
+        if repo_cache is not None and key in repo_cache:
+            return Settings(self.operation, self.options, repo_cache[key])
+
+        # import the driver only when it is needed, since boto3 takes long to import
+        from .driver import S3Driver, FileSystemDriver, IndexCache, BlobCache
+        from .hashcache import HashCache
+
         # set repository driver
-        driver = S3Driver(access_key, secret_key, bucket, group_id, region)
-        repo = Repository(driver, group_id)
+        if is_local:
+            driver = FileSystemDriver(bucket, group_id)
+        else:
+            index_cache = None if no_cache else IndexCache(bucket, group_id)
+            blob_cache = None if no_cache or not blob_cache_size else BlobCache(blob_cache_size * MB)
+            transfer_config = self._make_transfer_config(*transfer_settings)
+            driver = S3Driver(access_key, secret_key, bucket, group_id, region, index_cache=index_cache,
+                              transfer_config=transfer_config, blob_cache=blob_cache)
+        hash_cache = None if no_cache else HashCache()
+        repo = Repository(driver, group_id, bool(content_addressed), hash_cache, index_format, bool(journal))
+        if repo_cache is not None:
+            repo = repo_cache.setdefault(key, repo)  # another thread may have created one meanwhile
         return Settings(self.operation, self.options, repo)
 
     @classmethod
-    def _read_aws_config(cls, fp, group_id):
+    def _is_complete(cls, access_key, secret_key, bucket):
+        # credentials are not needed for the repository on a file system
+        return bool(bucket) and (is_file_url(bucket) or all([access_key, secret_key]))
+
+    @classmethod
+    def _read_config(cls, fp, group_id):
+        """
+        Read all settings of the group from the configuration file
+
+        The section named after the group id is used if it exists, otherwise the default section.
+
+        :return: dict of the setting names (as the command line options) to the values, None if not set
+                 Raise ValueError when any of them is invalid.
+        """
         import configparser
 
         parser = configparser.ConfigParser()
@@ -125,12 +191,47 @@ class Settings(CaseClass):
         # use group id as section name
         section_name = group_id if parser.has_section(group_id) else 'default'
 
-        def f(attr):
-            return parser.get(section_name, attr) if parser.has_option(section_name, attr) else None
+        def f(attr, getter=parser.get):
+            return getter(section_name, attr) if parser.has_option(section_name, attr) else None
+
+        ret = {
+            'access_key': f('aws_access_key_id'),
+            'secret_key': f('aws_secret_access_key'),
+            'bucket': f('bucket'),
+            'region': f('region'),
+            'content_addressed': f('content_addressed', parser.getboolean),
+            'journal': f('journal', parser.getboolean),
+            'blob_cache_size': f('blob_cache_size', parser.getint),
+        }
+
+        # transfer settings in MB or count
+        for attr in TRANSFER_OPTIONS:
+            x = ret[attr] = f(attr, parser.getint)
+            if x is not None and x <= 0:
+                raise ValueError('%s must be positive: %d' % (attr, x))
+
+        x = ret['blob_cache_size']
+        if x is not None and x < 0:
+            raise ValueError('blob_cache_size must not be negative: %d' % x)
+        return ret
 
-        access_key = f('aws_access_key_id')
-        secret_key = f('aws_secret_access_key')
-        bucket = f('bucket')
-        region = f('region')
+    @classmethod
+    def _read_aws_config(cls, fp, group_id):
+        """
+        :return: tuple of access key, secret key, bucket and region
+        """
+        d = cls._read_config(fp, group_id)
+        return d['access_key'], d['secret_key'], d['bucket'], d['region']
 
-        return access_key, secret_key, bucket, region
+    @classmethod
+    def _make_transfer_config(cls, multipart_threshold=None, multipart_chunksize=None, max_concurrency=None):
+        from boto3.s3.transfer import TransferConfig
+
+        kwargs = {}
+        if multipart_threshold is not None:
+            kwargs['multipart_threshold'] = multipart_threshold * MB
+        if multipart_chunksize is not None:
+            kwargs['multipart_chunksize'] = multipart_chunksize * MB
+        if max_concurrency is not None:
+            kwargs['max_concurrency'] = max_concurrency
+        return TransferConfig(**kwargs)
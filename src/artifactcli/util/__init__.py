@@ -2,3 +2,5 @@ from .caseclass import CaseClass
 from .asserttype import assert_type
 from .progressbar import ProgressBar
 from .unicodeutil import *
+from .filedigest import FileDigest
+from .timeutil import parse_datetime
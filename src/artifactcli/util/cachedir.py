@@ -0,0 +1,4 @@
+import os
+
+# root directory of all local caches
+DEFAULT_CACHE_DIR = os.path.join(os.environ.get('XDG_CACHE_HOME', '~/.cache'), 'artifact-cli')
@@ -0,0 +1,90 @@
+import hashlib
+import mmap
+import os
+from concurrent.futures import ThreadPoolExecutor
+from .caseclass import CaseClass
+
+# hashlib releases the GIL while hashing buffers of this size
+DEFAULT_BUFFER_SIZE = 8 * 1024 * 1024
+
+
+class FileDigest(CaseClass):
+    """
+    MD5 and SHA-256 digests of a file, with the MD5 digests of each multipart upload part
+    """
+
+    def __init__(self, md5, sha256, part_size=None, part_md5s=None):
+        """
+        :param md5: MD5 digest hex string
+        :param sha256: SHA-256 digest hex string
+        :param part_size: part size in bytes, or None if part digests are not computed
+        :param part_md5s: list of binary MD5 digests of each part
+        """
+        super(FileDigest, self).__init__(['md5', 'sha256', 'part_size', 'part_md5s'])
+        self.md5 = md5
+        self.sha256 = sha256
+        self.part_size = part_size
+        self.part_md5s = part_md5s
+
+    def multipart_etag(self):
+        """
+        :return: ETag which S3 assigns to the file uploaded by multipart upload with the part size,
+                 e.g. "d41d8cd98f00b204e9800998ecf8427e-2", or None if part digests are not computed
+        """
+        if self.part_size is None:
+            return None
+        return '%s-%d' % (hashlib.md5(b''.join(self.part_md5s)).hexdigest(), len(self.part_md5s))
+
+    @classmethod
+    def from_path(cls, path, part_size=None, buffer_size=DEFAULT_BUFFER_SIZE):
+        """
+        Compute all digests in a single pass over the memory-mapped file
+
+        :param path: local file path
+        :param part_size: part size in bytes to compute part digests (None to skip)
+        :param buffer_size: number of bytes to hash at once
+        :return: FileDigest object
+        """
+        md5 = hashlib.md5()
+        sha256 = hashlib.sha256()
+        part_md5s = []
+
+        with open(path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            if size:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+                    view = memoryview(m)
+                    try:
+                        part_end = part_size or size
+                        part = hashlib.md5()
+                        offset = 0
+                        while offset < size:
+                            end = min(offset + buffer_size, part_end, size)
+                            buf = view[offset:end]
+                            md5.update(buf)
+                            sha256.update(buf)
+                            if part_size:
+                                part.update(buf)
+                                if end == part_end or end == size:
+                                    part_md5s.append(part.digest())
+                                    part = hashlib.md5()
+                                    part_end += part_size
+                            buf.release()
+                            offset = end
+                    finally:
+                        view.release()
+
+        return cls(md5.hexdigest(), sha256.hexdigest(), part_size, part_md5s if part_size else None)
+
+    @classmethod
+    def from_paths(cls, paths, part_size=None, jobs=4):
+        """
+        Compute digests of files concurrently
+
+        :param paths: list of local file paths
+        :param part_size: part size in bytes to compute part digests (None to skip)
+        :param jobs: number of threads
+        :return: list of FileDigest objects in the same order as paths
+        """
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            return list(executor.map(lambda p: cls.from_path(p, part_size), paths))
@@ -0,0 +1,10 @@
+# bucket setting for the repository on a local or network file system, e.g. file:///mnt/artifacts
+FILE_URL_SCHEME = 'file://'
+
+
+def is_file_url(bucket):
+    """
+    :param bucket: bucket setting, or None
+    :return: True if the bucket setting is a file URL
+    """
+    return bucket is not None and bucket.startswith(FILE_URL_SCHEME)
@@ -7,14 +7,15 @@ class ProgressBar(object):
     Print progress bar in the separated thread
     """
 
-    def __init__(self, interval=1, fp=sys.stdout):
+    def __init__(self, interval=1, fp=None):
         """
         Start thread for progress bar
         :param interval: interval seconds to write dots
-        :param fp: file pointer to write
+        :param fp: file pointer to write (default: current sys.stdout)
         """
         self.interval = interval
-        self.fp = fp
+        # resolved here, since the daemon captures sys.stdout per thread
+        self.fp = fp or getattr(sys.stdout, 'current', sys.stdout)
 
         # create event for handling termination
         self.__stop_event = threading.Event()
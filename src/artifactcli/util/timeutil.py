@@ -0,0 +1,19 @@
+from datetime import datetime
+
+
+def parse_datetime(s):
+    """
+    Parse a date and time string
+
+    Strings written by datetime.isoformat(), as stored in the index, are parsed by datetime.fromisoformat(),
+    which is much faster than dateutil. Other strings fall back to dateutil.
+
+    :param s: date and time string
+    :return: datetime
+    """
+    try:
+        return datetime.fromisoformat(s)
+    except ValueError:
+        import dateutil.parser
+
+        return dateutil.parser.parse(s)
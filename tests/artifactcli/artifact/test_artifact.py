@@ -125,3 +125,12 @@ class TestArtifactInfo(unittest.TestCase):
         self.assertEqual(Artifact.from_dict(self.test_data[0].to_dict()), self.test_data[0])
         self.assertEqual(Artifact.from_dict(self.test_data[1].to_dict()), self.test_data[1])
         self.assertEqual(Artifact.from_dict(self.test_data[2].to_dict()), self.test_data[2])
+
+    def test_location(self):
+        a = Artifact(self.test_bi[1], self.test_fi[1], self.test_si[1])
+        self.assertEqual(a.s3_path(), 'com.github.mogproject/xxx-yyy-assembly/0.1.2あ/345/xxx-yyy-assembly-0.1.2あ.zip')
+        self.assertFalse('location' in a.to_dict())
+
+        b = Artifact(self.test_bi[1], self.test_fi[1], self.test_si[1], Artifact.blob_path('GROUP_ID', 'ffff'))
+        self.assertEqual(b.s3_path(), 'GROUP_ID/.blobs/ffff')
+        self.assertEqual(Artifact.from_dict(b.to_dict()).location, 'GROUP_ID/.blobs/ffff')
@@ -1,6 +1,9 @@
 import unittest
+import shutil
+import tempfile
 from datetime import datetime
 from artifactcli.artifact import FileInfo
+from artifactcli.hashcache import HashCache
 
 
 class TestFileInfo(unittest.TestCase):
@@ -48,6 +51,27 @@ class TestFileInfo(unittest.TestCase):
     def test_from_path(self):
         fi = FileInfo.from_path('tests/resources/test-artifact-1.2.3.dat')
         self.assertEqual((fi.size, fi.md5), (11, '7a38cb250db7127113e00ad5e241d563'))
+        self.assertEqual(fi.sha256, 'e009551bf9a4560426eeb1ac9c3f1734ed51da520f39168324a5df73e3f628d8')
+        self.assertEqual(fi.multipart_etag, None)
+
+    def test_from_path_multipart_etag(self):
+        fi = FileInfo.from_path('tests/resources/test-artifact-1.2.3.dat', part_size=5)
+        self.assertEqual(fi.multipart_etag[-2:], '-3')
+
+    def test_from_path_hash_cache(self):
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        cache = HashCache(tmp_dir)
+        for _ in range(2):
+            fi = FileInfo.from_path('tests/resources/test-artifact-1.2.3.dat', cache)
+            self.assertEqual((fi.size, fi.md5), (11, '7a38cb250db7127113e00ad5e241d563'))
+
+    def test_dict_conversions_sha256(self):
+        fi = FileInfo('HOST', 'USER', 0, datetime(2014, 12, 31, 12, 34, 56), '0', 'abcd')
+        self.assertEqual(fi.to_dict()['hex_sha256'], 'abcd')
+        self.assertEqual(FileInfo.from_dict(fi.to_dict()).sha256, 'abcd')
+        self.assertFalse('hex_sha256' in self.test_data[0].to_dict())
+        self.assertEqual(str(fi).splitlines()[-1], '  SHA-256 : abcd')
 
     def test_dict_conversions(self):
         self.assertEqual(FileInfo.from_dict(self.test_data[0].to_dict()), self.test_data[0])
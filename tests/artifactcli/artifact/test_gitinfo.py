@@ -1,6 +1,11 @@
 import unittest
+import os
+import shutil
+import subprocess
+import tempfile
 from datetime import datetime
 from artifactcli.artifact import GitInfo
+from artifactcli.artifact.gitreader import GitReader
 
 
 class TestGitInfo(unittest.TestCase):
@@ -65,6 +70,36 @@ class TestGitInfo(unittest.TestCase):
         gi = GitInfo.from_path('tests/resources/test-artifact-1.2.3.dat')
         self.assertFalse(gi is None)
 
+    def test_from_path_tags(self):
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+
+        def run(*args):
+            subprocess.check_call(['git', '-c', 'user.name=AUTHOR', '-c', 'user.email=x@example.com'] + list(args),
+                                  cwd=tmp_dir, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+        run('init', '-q')
+        path = os.path.join(tmp_dir, 'test-artifact-1.2.3.dat')
+        for msg in ['first', 'second']:
+            with open(path, 'w') as f:
+                f.write(msg)
+            run('add', path)
+            run('commit', '-q', '-m', msg)
+            run('tag', 'light-%s' % msg)
+            run('tag', '-a', '-m', msg, 'annotated-%s' % msg)
+        run('pack-refs', '--all')
+        run('tag', '-a', '-m', 'loose', 'loose')
+
+        gi = GitInfo.from_path(path)
+        self.assertEqual(gi.tags, ['annotated-second', 'light-second', 'loose'])
+        self.assertEqual(gi.summary, 'second')
+        self.assertEqual(gi, GitInfo._from_git_python(path))
+
+        # packed objects are also read without GitPython
+        run('gc', '-q')
+        self.assertEqual(GitInfo._from_reader(GitReader.find(path)), gi)
+        self.assertEqual(GitInfo.from_path(path), gi)
+
     def test_from_path_error(self):
         self.assertEqual(GitInfo.from_path('tests/resources/test001_no_such_path.dat'), None)
         self.assertEqual(GitInfo.from_path('/'), None)
@@ -0,0 +1,136 @@
+import unittest
+import os
+import shutil
+import subprocess
+import tempfile
+from artifactcli.artifact.gitreader import GitReader
+
+
+class TestGitReader(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.work_tree = os.path.join(self.tmp_dir, 'repo')
+        os.makedirs(self.work_tree)
+        self._git('init', '-q')
+        self.path = os.path.join(self.work_tree, 'sub', 'test-artifact-1.2.3.dat')
+        os.makedirs(os.path.dirname(self.path))
+        with open(self.path, 'w') as f:
+            f.write('test')
+        self._git('add', self.path)
+        self._git('commit', '-q', '-m', 'summary line\n\nbody')
+        self._git('tag', '-a', '-m', 'tag message', 'v1.0')
+        self.sha = self._git('rev-parse', 'HEAD')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def _git(self, *args, **kwargs):
+        cmd = ['git', '-c', 'user.name=AUTHOR', '-c', 'user.email=x@example.com'] + list(args)
+        return subprocess.check_output(cmd, cwd=kwargs.get('cwd', self.work_tree),
+                                       stderr=subprocess.DEVNULL).decode('utf-8').strip()
+
+    def test_find(self):
+        reader = GitReader.find(self.path)
+        self.assertEqual(reader.work_tree, self.work_tree)
+        self.assertEqual(reader.git_dir, os.path.join(self.work_tree, '.git'))
+        self.assertEqual(reader.common_dir, os.path.join(self.work_tree, '.git'))
+
+    def test_find_error(self):
+        self.assertEqual(GitReader.find(os.path.join(self.tmp_dir, 'no_such_file')), None)
+        self.assertEqual(GitReader.find(self.tmp_dir), None)
+
+    def test_find_worktree(self):
+        worktree = os.path.join(self.tmp_dir, 'worktree')
+        self._git('worktree', 'add', '-q', '-b', 'feature/x', worktree)
+        reader = GitReader.find(os.path.join(worktree, 'sub'))
+        self.assertEqual(reader.work_tree, worktree)
+        self.assertEqual(reader.git_dir, os.path.join(self.work_tree, '.git', 'worktrees', 'worktree'))
+        self.assertEqual(reader.common_dir, os.path.join(self.work_tree, '.git'))
+        self.assertEqual(reader.head(), ('feature/x', self.sha))
+        self.assertEqual(GitReader.find_common_dir(reader.git_dir), os.path.join(self.work_tree, '.git'))
+        self.assertEqual(GitReader.find_common_dir(reader.common_dir), os.path.join(self.work_tree, '.git'))
+
+    def test_head(self):
+        reader = GitReader.find(self.path)
+        branch = self._git('symbolic-ref', '--short', 'HEAD')
+        self.assertEqual(reader.head(), (branch, self.sha))
+
+        # packed refs
+        self._git('pack-refs', '--all')
+        self.assertEqual(reader.head(), (branch, self.sha))
+
+        # detached HEAD
+        self._git('checkout', '-q', '--detach')
+        self.assertEqual(reader.head(), ('', self.sha))
+
+    def test_read_commit(self):
+        commit = GitReader.find(self.path).read_commit(self.sha)
+        self.assertEqual(commit['author_name'], 'AUTHOR')
+        self.assertEqual(commit['author_email'], 'x@example.com')
+        self.assertEqual(commit['committed_date'], int(self._git('log', '-1', '--format=%ct')))
+        self.assertEqual(commit['message'], 'summary line\n\nbody\n')
+
+    def test_peel(self):
+        reader = GitReader.find(self.path)
+        self.assertEqual(reader.peel(self._git('rev-parse', 'v1.0')), self.sha)
+        self.assertEqual(reader.peel(self.sha), self.sha)
+
+    def _make_history(self):
+        # similar versions of a file so that git stores them as deltas
+        lines = ['line %d\n' % i for i in range(200)]
+        for i in range(5):
+            lines[i * 30] = 'changed %d\n' % i
+            with open(self.path, 'w') as f:
+                f.write(''.join(lines))
+            self._git('commit', '-q', '-a', '-m', 'commit %d' % i)
+        self._git('tag', '-a', '-m', 'tag message', 'v2.0')
+
+    def _assert_objects(self, work_tree):
+        reader = GitReader.find(work_tree)
+        self.assertFalse(os.path.exists(os.path.join(reader.common_dir, 'objects', self.sha[:2], self.sha[2:])))
+        pack_dir = os.path.join(reader.common_dir, 'objects', 'pack')
+        entries = [line.split(' ') for idx in os.listdir(pack_dir) if idx.endswith('.idx')
+                   for line in self._git('verify-pack', '-v', os.path.join(pack_dir, idx)).split('\n')]
+        self.assertTrue(any(len([x for x in e if x]) == 7 for e in entries))  # deltified entries
+
+        shas = self._git('rev-list', '--objects', '--all', cwd=work_tree).split('\n')
+        self.assertEqual(len(shas), 26)
+        for sha in [x.split(' ')[0] for x in shas]:
+            obj_type = self._git('cat-file', '-t', sha, cwd=work_tree)
+            body = subprocess.check_output(['git', 'cat-file', obj_type, sha], cwd=work_tree)
+            self.assertEqual(reader.read_object(sha), (obj_type, body))
+
+        sha = self._git('rev-parse', 'HEAD', cwd=work_tree)
+        self.assertEqual(reader.read_commit(sha)['message'], 'commit 4\n')
+        self.assertEqual(reader.peel(self._git('rev-parse', 'v2.0', cwd=work_tree)), sha)
+        self.assertEqual(reader.peel(self._git('rev-parse', 'v1.0', cwd=work_tree)), self.sha)
+
+    def test_read_object_packed(self):
+        self._make_history()
+        self._git('gc', '-q')
+        self._assert_objects(self.work_tree)
+
+    def test_read_object_cloned(self):
+        self._make_history()
+        clone = os.path.join(self.tmp_dir, 'clone')
+        self._git('clone', '-q', '--no-local', self.work_tree, clone)
+        self._git('gc', '-q', '--aggressive', cwd=clone)
+        self._assert_objects(clone)
+
+    def test_read_object_ref_delta(self):
+        self._make_history()
+        self._git('-c', 'repack.useDeltaBaseOffset=false', 'repack', '-q', '-a', '-d', '-f')
+        self._git('prune-packed')
+        self._assert_objects(self.work_tree)
+
+    def test_read_object_not_found(self):
+        self._git('gc', '-q')
+        self.assertRaises(ValueError, GitReader.find(self.path).read_object, '0' * 40)
+
+    def test_apply_delta(self):
+        base = b'0123456789' * 10
+        # source size 100, target size 14, copy 5 bytes from offset 3, insert 'abc', copy 6 bytes from offset 90
+        delta = b'\x64\x0e' + b'\x91\x03\x05' + b'\x03abc' + b'\x91\x5a\x06'
+        self.assertEqual(GitReader._apply_delta(base, delta), b'34567abc012345')
+        self.assertRaises(ValueError, GitReader._apply_delta, base[1:], delta)
+        self.assertRaises(ValueError, GitReader._apply_delta, base, b'\x64\x0e\x00')
@@ -0,0 +1,98 @@
+import unittest
+import os
+import shutil
+import tempfile
+from artifactcli.artifact.gittagindex import GitTagIndex
+
+C1 = '1' * 40
+C2 = '2' * 40
+T1 = 'a' * 40
+T2 = 'b' * 40
+
+
+class TestGitTagIndex(unittest.TestCase):
+    def setUp(self):
+        self.git_dir = tempfile.mkdtemp()
+        self.cache_dir = tempfile.mkdtemp()
+        os.makedirs(os.path.join(self.git_dir, 'refs', 'tags'))
+        self.peeled = []
+        GitTagIndex._memo.clear()
+
+    def tearDown(self):
+        shutil.rmtree(self.git_dir)
+        shutil.rmtree(self.cache_dir)
+        GitTagIndex._memo.clear()
+
+    def _peel(self, sha):
+        self.peeled.append(sha)
+        return {T1: C1, T2: C2}.get(sha, sha)
+
+    def _write(self, path, lines):
+        path = os.path.join(self.git_dir, path)
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        with open(path, 'w') as f:
+            f.write('\n'.join(lines) + '\n')
+
+    def _load(self):
+        return GitTagIndex.load(self.git_dir, self._peel, self.cache_dir)
+
+    def test_read_refs_peeled(self):
+        self._write('packed-refs', [
+            '# pack-refs with: peeled fully-peeled sorted ',
+            '%s refs/heads/master' % C1,
+            '%s refs/tags/release/1.0' % T1,
+            '^%s' % C1,
+            '%s refs/tags/v1.0' % C1,
+        ])
+        self.assertEqual(GitTagIndex.read_refs(self.git_dir), {'release/1.0': (T1, C1), 'v1.0': (C1, C1)})
+
+    def test_read_refs_not_peeled(self):
+        self._write('packed-refs', ['%s refs/tags/v1.0' % T1])
+        self._write('refs/tags/v2.0', [C2])
+        self._write('refs/tags/release/2.0', [T2])
+        self.assertEqual(GitTagIndex.read_refs(self.git_dir),
+                         {'v1.0': (T1, None), 'v2.0': (C2, None), 'release/2.0': (T2, None)})
+
+    def test_read_refs_loose_overrides_packed(self):
+        self._write('packed-refs', ['# pack-refs with: peeled', '%s refs/tags/v1.0' % C1])
+        self._write('refs/tags/v1.0', [C2])
+        self.assertEqual(GitTagIndex.read_refs(self.git_dir), {'v1.0': (C2, None)})
+
+    def test_find(self):
+        self._write('packed-refs', [
+            '# pack-refs with: peeled fully-peeled sorted ',
+            '%s refs/tags/v1.0' % C1,
+            '%s refs/tags/v1.0-annotated' % T1,
+            '^%s' % C1,
+        ])
+        self._write('refs/tags/v2.0', [T2])
+        index = self._load()
+        self.assertEqual(index.find(C1), ['v1.0', 'v1.0-annotated'])
+        self.assertEqual(index.find(C2), ['v2.0'])
+        self.assertEqual(index.find(T1), [])
+
+        # only the loose tag is peeled
+        self.assertEqual(self.peeled, [T2])
+
+    def test_load_cached(self):
+        self._write('refs/tags/v1.0', [T1])
+        self._write('refs/tags/v2.0', [T2])
+        self.assertEqual(self._load().find(C1), ['v1.0'])
+        self.assertEqual(sorted(self.peeled), [T1, T2])
+
+        # from the file cache
+        GitTagIndex._memo.clear()
+        self.assertEqual(self._load().find(C1), ['v1.0'])
+        self.assertEqual(len(self.peeled), 2)
+
+    def test_load_refs_changed(self):
+        self._write('refs/tags/v1.0', [T1])
+        self.assertEqual(self._load().find(C2), [])
+
+        self._write('refs/tags/v2.0', [T2])
+        os.utime(os.path.join(self.git_dir, 'refs', 'tags'), ns=(0, 0))
+        self.assertEqual(self._load().find(C2), ['v2.0'])
+
+        # unchanged tags are not peeled again
+        self.assertEqual(self.peeled, [T1, T2])
@@ -0,0 +1,125 @@
+import unittest
+import hashlib
+import os
+import shutil
+import tempfile
+from artifactcli.driver import BlobCache
+
+
+class TestBlobCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.cache = BlobCache(2500, os.path.join(self.tmp_dir, 'cache'))
+        self.fills = []
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def _fill(self, data):
+        def f(path):
+            self.fills.append(path)
+            with open(path, 'wb') as fp:
+                fp.write(data)
+        return f
+
+    def _fetch(self, data, name='x.dat'):
+        md5 = hashlib.md5(data).hexdigest()
+        path = os.path.join(self.tmp_dir, name)
+        return self.cache.fetch(md5, path, self._fill(data)), path
+
+    def _read(self, path):
+        with open(path, 'rb') as f:
+            return f.read()
+
+    def test_init(self):
+        self.assertEqual(BlobCache(100, '/tmp/xxx').path, '/tmp/xxx/blobs')
+        self.assertEqual(self.cache.entry_path('7a38cb250db7127113e00ad5e241d563'),
+                         os.path.join(self.tmp_dir, 'cache', 'blobs', '7a', '7a38cb250db7127113e00ad5e241d563'))
+
+    def test_fetch(self):
+        data = os.urandom(1000)
+        self.assertEqual(self._fetch(data), (False, os.path.join(self.tmp_dir, 'x.dat')))
+        self.assertEqual(self._read(os.path.join(self.tmp_dir, 'x.dat')), data)
+        self.assertEqual(len(self.fills), 1)
+
+        hit, path = self._fetch(data, 'y.dat')
+        self.assertTrue(hit)
+        self.assertEqual(self._read(path), data)
+        self.assertEqual(len(self.fills), 1)
+        self.assertEqual(self.cache.size(), 1000)
+
+    def test_fetch_overwrite(self):
+        with open(os.path.join(self.tmp_dir, 'x.dat'), 'wb') as f:
+            f.write(b'old')
+        data = os.urandom(100)
+        self._fetch(data)
+        hit, path = self._fetch(data)
+        self.assertTrue(hit)
+        self.assertEqual(self._read(path), data)
+        self.assertEqual(sorted(os.listdir(self.tmp_dir)), ['cache', 'x.dat'])
+
+    def test_fetch_fill_error(self):
+        def f(path):
+            with open(path, 'wb') as fp:
+                fp.write(b'xxx')
+            raise IOError('connection reset')
+
+        self.assertRaises(IOError, self.cache.fetch, '7a38cb250db7127113e00ad5e241d563',
+                          os.path.join(self.tmp_dir, 'x.dat'), f)
+        self.assertEqual(self.cache.size(), 0)
+        self.assertFalse(os.path.exists(os.path.join(self.tmp_dir, 'x.dat')))
+
+    def test_evict_least_recently_used(self):
+        xs = [os.urandom(1000) for _ in range(3)]
+        md5s = [hashlib.md5(x).hexdigest() for x in xs]
+        self._fetch(xs[0])
+        self._fetch(xs[1])
+        os.utime(self.cache.entry_path(md5s[0]), (1, 1))
+        os.utime(self.cache.entry_path(md5s[1]), (2, 2))
+
+        # touch the first entry
+        self.assertTrue(self._fetch(xs[0])[0])
+
+        self._fetch(xs[2])
+        self.assertTrue(os.path.exists(self.cache.entry_path(md5s[0])))
+        self.assertFalse(os.path.exists(self.cache.entry_path(md5s[1])))
+        self.assertTrue(os.path.exists(self.cache.entry_path(md5s[2])))
+        self.assertEqual(self.cache.size(), 2000)
+
+    def test_fetch_too_large(self):
+        data = os.urandom(3000)
+        hit, path = self._fetch(data)
+        self.assertFalse(hit)
+        self.assertEqual(self._read(path), data)
+        self.assertEqual(self.cache.size(), 0)
+
+    def test_fetch_not_linked(self):
+        data = os.urandom(100)
+        self._fetch(data)
+        hit, path = self._fetch(data, 'y.dat')
+        self.assertTrue(hit)
+        entry = self.cache.entry_path(hashlib.md5(data).hexdigest())
+        self.assertEqual(os.stat(path).st_nlink, 1)
+        self.assertNotEqual(os.stat(path).st_ino, os.stat(entry).st_ino)
+
+        # modifying the destination does not affect the cache
+        os.chmod(path, 0o644)
+        with open(path, 'wb') as f:
+            f.write(b'modified')
+        self.assertTrue(self._fetch(data, 'z.dat')[0])
+        self.assertEqual(self._read(os.path.join(self.tmp_dir, 'z.dat')), data)
+
+    def test_fetch_corrupted(self):
+        data = os.urandom(100)
+        self._fetch(data)
+        entry = self.cache.entry_path(hashlib.md5(data).hexdigest())
+        os.chmod(entry, 0o644)
+        with open(entry, 'wb') as f:
+            f.write(os.urandom(100))
+
+        hit, path = self._fetch(data, 'y.dat')
+        self.assertFalse(hit)
+        self.assertEqual(self._read(path), data)
+        self.assertEqual(len(self.fills), 2)
+        self.assertEqual(self._read(entry), data)
+        self.assertTrue(self._fetch(data, 'z.dat')[0])
@@ -0,0 +1,173 @@
+# -*- encoding: utf-8 -*-
+
+import unittest
+import os
+import shutil
+import stat
+import tempfile
+from unittest import mock
+from artifactcli.driver import FileSystemDriver
+from artifactcli.repository import Repository
+
+
+class TestFileSystemDriver(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.root = os.path.join(self.tmp_dir, 'repo')
+        self.driver = FileSystemDriver('file://' + self.root, 'gid')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def _write_local(self, name, data):
+        path = os.path.join(self.tmp_dir, name)
+        with open(path, 'wb') as f:
+            f.write(data)
+        return path
+
+    def _read(self, path):
+        with open(path, 'rb') as f:
+            return f.read()
+
+    def test_init(self):
+        self.assertEqual(self.driver.root, self.root)
+        self.assertEqual(FileSystemDriver('/path/to/repo', 'gid'), FileSystemDriver('file:///path/to/repo', 'gid'))
+        self.assertTrue(FileSystemDriver.is_url('file:///path/to/repo'))
+        self.assertFalse(FileSystemDriver.is_url('bucket4art'))
+
+    def test_index(self):
+        d = self.driver
+        self.assertEqual(d.artifact_ids(), [])
+        self.assertEqual(d.read_index('test-artifact'), '')
+        self.assertEqual(d.index_etag('test-artifact'), None)
+
+        self.assertTrue(d.write_index('test-artifact', '[{"json": "メッセージ"}]'))
+        self.assertTrue(d.write_index('test-artifact10', b'\x89ARTIDX\x01'))
+        self.assertEqual(d.read_index('test-artifact'), '[{"json": "メッセージ"}]')
+        self.assertEqual(d.read_index('test-artifact10'), b'\x89ARTIDX\x01')
+        self.assertEqual(d.artifact_ids(), ['test-artifact', 'test-artifact10'])
+        self.assertTrue(os.path.isfile(os.path.join(self.root, 'gid', '.meta', 'index-test-artifact.json')))
+
+        # no temporary files are left
+        self.assertEqual(sorted(os.listdir(os.path.join(self.root, 'gid', '.meta'))),
+                         ['index-test-artifact.json', 'index-test-artifact.json.lock',
+                          'index-test-artifact10.json', 'index-test-artifact10.json.lock'])
+
+    def test_write_index_conditional(self):
+        d = self.driver
+        other = FileSystemDriver(self.root, 'gid')
+        self.assertTrue(d.write_index('test-artifact', '[]', d.INDEX_ABSENT))
+        self.assertFalse(other.write_index('test-artifact', '[0]', other.INDEX_ABSENT))
+
+        etag = d.index_etag('test-artifact')
+        self.assertEqual(other.read_index('test-artifact'), '[]')
+        self.assertTrue(other.write_index('test-artifact', '[1]', other.index_etag('test-artifact')))
+        self.assertFalse(d.write_index('test-artifact', '[2]', etag))
+        self.assertEqual(d.index_etag('test-artifact'), None)
+        self.assertEqual(d.read_index('test-artifact'), '[1]')
+
+    def test_deltas(self):
+        d = self.driver
+        self.assertEqual(d.delta_names('test-artifact'), [])
+        self.assertEqual(d.delta_names(), {})
+
+        names = [d.append_delta('test-artifact', '{"ops": [%d]}' % i) for i in range(3)]
+        other = d.append_delta('test-artifact2', '{"ops": []}')
+        self.assertEqual(d.delta_names('test-artifact'), sorted(names))
+        self.assertEqual(d.delta_names(), {'test-artifact': sorted(names), 'test-artifact2': [other]})
+        self.assertEqual(d.read_delta('test-artifact', names[1]), '{"ops": [1]}')
+        self.assertEqual(d.artifact_ids(), [])
+
+        d.delete_deltas('test-artifact', names[:2] + ['unknown'])
+        self.assertEqual(d.delta_names('test-artifact'), names[2:])
+        self.assertEqual(d.read_delta('test-artifact', names[1]), None)
+
+    def test_latest(self):
+        d = self.driver
+        self.assertEqual(d.read_latest('test-artifact', '0.0.1', 'jar'), None)
+        d.write_latest('test-artifact', '0.0.1', 'jar', '{"revision": "あ"}')
+        self.assertEqual(d.read_latest('test-artifact', '0.0.1', 'jar'), '{"revision": "あ"}')
+        d.delete_latest('test-artifact', '0.0.1', 'jar')
+        d.delete_latest('test-artifact', '0.0.1', 'jar')
+        self.assertEqual(d.read_latest('test-artifact', '0.0.1', 'jar'), None)
+
+    def test_write_latest_conditional(self):
+        d = self.driver
+        self.assertEqual(d.read_latest('test-artifact', '0.0.1', 'jar', with_etag=True), (None, d.INDEX_ABSENT))
+        self.assertTrue(d.write_latest('test-artifact', '0.0.1', 'jar', '{}', d.INDEX_ABSENT))
+        self.assertFalse(d.write_latest('test-artifact', '0.0.1', 'jar', '{"revision": 1}', d.INDEX_ABSENT))
+        s, etag = d.read_latest('test-artifact', '0.0.1', 'jar', with_etag=True)
+        self.assertTrue(d.write_latest('test-artifact', '0.0.1', 'jar', '{"revision": 1}', etag))
+        self.assertFalse(d.write_latest('test-artifact', '0.0.1', 'jar', '{"revision": 2}', etag))
+        self.assertEqual(d.read_latest('test-artifact', '0.0.1', 'jar'), '{"revision": 1}')
+
+    def test_reserve_revision(self):
+        d = self.driver
+        self.assertTrue(d.reserve_revision('test-artifact', '0.0.1', 'jar', 1))
+        self.assertFalse(d.reserve_revision('test-artifact', '0.0.1', 'jar', 1))
+        self.assertTrue(d.reserve_revision('test-artifact', '0.0.1', 'jar', 2))
+        self.assertTrue(d.is_reserved('test-artifact', '0.0.1', 'jar', 1))
+        self.assertFalse(d.is_reserved('test-artifact', '0.0.1', 'jar', 3))
+        self.assertTrue(os.path.isfile(os.path.join(self.root, 'gid', '.meta', 'revision-test-artifact', '0.0.1',
+                                                    'jar', '1')))
+        d.release_revision('test-artifact', '0.0.1', 'jar', 1)
+        d.release_revision('test-artifact', '0.0.1', 'jar', 1)
+        self.assertTrue(d.reserve_revision('test-artifact', '0.0.1', 'jar', 1))
+        self.assertEqual(d.artifact_ids(), [])
+
+    def test_upload_and_download(self):
+        d = self.driver
+        data = os.urandom(100000)
+        src = self._write_local('test-artifact-1.2.3.dat', data)
+        d.upload(src, 'gid/test-artifact/1.2.3/1/test-artifact-1.2.3.dat', None)
+        remote = os.path.join(self.root, 'gid', 'test-artifact', '1.2.3', '1', 'test-artifact-1.2.3.dat')
+        self.assertEqual(self._read(remote), data)
+        self.assertTrue(d.exists('gid/test-artifact/1.2.3/1/test-artifact-1.2.3.dat', None))
+
+        # default permissions, not the ones of temporary files
+        umask = os.umask(0)
+        os.umask(umask)
+        self.assertEqual(stat.S_IMODE(os.stat(remote).st_mode), 0o666 & ~umask)
+
+        dst = os.path.join(self.tmp_dir, 'out.dat')
+        d.download('gid/test-artifact/1.2.3/1/test-artifact-1.2.3.dat', dst, None)
+        self.assertEqual(self._read(dst), data)
+
+        d.copy('gid/test-artifact/1.2.3/1/test-artifact-1.2.3.dat', 'gid/.blobs/x', None)
+        self.assertEqual(self._read(os.path.join(self.root, 'gid', '.blobs', 'x')), data)
+
+        d.delete('gid/test-artifact/1.2.3/1/test-artifact-1.2.3.dat', None)
+        self.assertFalse(d.exists('gid/test-artifact/1.2.3/1/test-artifact-1.2.3.dat', None))
+        self.assertRaises(ValueError, d.download, 'gid/test-artifact/1.2.3/1/test-artifact-1.2.3.dat', dst, None)
+        self.assertRaises(ValueError, d.delete, 'gid/test-artifact/1.2.3/1/test-artifact-1.2.3.dat', None)
+
+    def test_copy_file_fallback(self):
+        data = os.urandom(100000)
+        src = self._write_local('src.dat', data)
+        dst = os.path.join(self.tmp_dir, 'dst.dat')
+
+        # zero-copy methods are not supported
+        with mock.patch.object(FileSystemDriver, '_copy_zero', return_value=False):
+            FileSystemDriver.copy_file(src, dst)
+        self.assertEqual(self._read(dst), data)
+
+        with mock.patch('artifactcli.driver.filesystemdriver.fcntl', None), \
+                mock.patch('os.copy_file_range', side_effect=OSError(18, 'Invalid cross-device link'), create=True):
+            FileSystemDriver.copy_file(src, dst)
+        self.assertEqual(self._read(dst), data)
+
+    def test_repository(self):
+        r = Repository(self.driver, 'gid')
+        r.load('test-artifact')
+        path = self._write_local('test-artifact-1.2.3.dat', b'abc')
+        art = r.upload(path)
+        r.save('test-artifact')
+        self.assertEqual(art.basic_info.revision, 1)
+
+        r2 = Repository(FileSystemDriver(self.root, 'gid'), 'gid')
+        r2.load_all()
+        self.assertEqual(r2.artifacts['test-artifact'], [art])
+        dst = os.path.join(self.tmp_dir, 'out', 'test-artifact-1.2.3.dat')
+        os.mkdir(os.path.dirname(dst))
+        r2.download_latest(dst)
+        self.assertEqual(self._read(dst), b'abc')
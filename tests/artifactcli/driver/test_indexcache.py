@@ -0,0 +1,54 @@
+# -*- encoding: utf-8 -*-
+
+import unittest
+import os
+import shutil
+import tempfile
+from artifactcli.driver import IndexCache
+
+
+class TestIndexCache(unittest.TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir)
+
+    def test_path(self):
+        c = IndexCache('bucket4art', 'gid', self.cache_dir)
+        self.assertEqual(c.entry_path('test-artifact'),
+                         os.path.join(self.cache_dir, 'bucket4art', 'gid', 'test-artifact.json'))
+
+    def test_get_not_cached(self):
+        self.assertEqual(IndexCache('bucket4art', 'gid', self.cache_dir).get('test-artifact'), (None, None))
+
+    def test_put_and_get(self):
+        c = IndexCache('bucket4art', 'gid', self.cache_dir)
+        c.put('test-artifact', '"abc"', '[{json: "メッセージ"}]')
+        self.assertEqual(c.get('test-artifact'), ('"abc"', '[{json: "メッセージ"}]'))
+        self.assertEqual(IndexCache('bucket4art', 'gid2', self.cache_dir).get('test-artifact'), (None, None))
+
+    def test_put_and_get_binary(self):
+        c = IndexCache('bucket4art', 'gid', self.cache_dir)
+        c.put('test-artifact', '"abc"', b'\x89\x00\xff')
+        self.assertEqual(c.get('test-artifact'), ('"abc"', b'\x89\x00\xff'))
+
+    def test_put_without_etag(self):
+        c = IndexCache('bucket4art', 'gid', self.cache_dir)
+        c.put('test-artifact', '"abc"', '[]')
+        c.put('test-artifact', None, '[]')
+        self.assertEqual(c.get('test-artifact'), (None, None))
+
+    def test_invalidate(self):
+        c = IndexCache('bucket4art', 'gid', self.cache_dir)
+        c.put('test-artifact', '"abc"', '[]')
+        c.invalidate('test-artifact')
+        c.invalidate('test-artifact')
+        self.assertEqual(c.get('test-artifact'), (None, None))
+
+    def test_get_broken(self):
+        c = IndexCache('bucket4art', 'gid', self.cache_dir)
+        c.put('test-artifact', '"abc"', '[]')
+        with open(c.entry_path('test-artifact'), 'w') as f:
+            f.write('xxx')
+        self.assertEqual(c.get('test-artifact'), (None, None))
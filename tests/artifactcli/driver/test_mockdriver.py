@@ -1,4 +1,5 @@
 import unittest
+from unittest import mock
 
 from artifactcli.driver.mockdriver import MockDriver
 
@@ -31,6 +32,34 @@ class TestMockDriver(unittest.TestCase):
         m.write_index('test-artifact', s)
         self.assertEqual(m.read_index('test-artifact'), s)
 
+    def test_deltas(self):
+        m = MockDriver()
+        name = m.append_delta('test-artifact', '{"ops": []}')
+        self.assertEqual(m.delta_names(), {'test-artifact': [name]})
+        self.assertEqual(m.read_delta('test-artifact', name), '{"ops": []}')
+        m.delete_deltas('test-artifact', [name])
+        self.assertEqual(m.read_delta('test-artifact', name), None)
+        self.assertEqual(m.read_delta('test-unknown', name), None)
+
+    def test_deltas_clock_behind(self):
+        m = MockDriver()
+        name = m.append_delta('test-artifact', '{"ops": []}')
+        with mock.patch('artifactcli.driver.basedriver.time.time', return_value=0):
+            self.assertTrue(m.append_delta('test-artifact', '{"ops": []}').startswith('0000000000000-'))
+            names = [m.append_delta('test-artifact', '{"ops": [%d]}' % i, name) for i in range(2)]
+        self.assertGreater(names[0], name)
+        self.assertEqual(names[0][:13], '%013d' % (int(name[:13]) + 1))
+        self.assertEqual(m.delta_names('test-artifact')[-2:], sorted(names))
+
+    def test_reserve_revision(self):
+        m = MockDriver()
+        self.assertTrue(m.reserve_revision('test-artifact', '0.0.1', 'jar', 1))
+        self.assertFalse(m.reserve_revision('test-artifact', '0.0.1', 'jar', 1))
+        self.assertTrue(m.reserve_revision('test-artifact', '0.0.1', 'jar', 2))
+        self.assertTrue(m.reserve_revision('test-artifact', '0.0.2', 'jar', 1))
+        m.release_revision('test-artifact', '0.0.1', 'jar', 1)
+        self.assertTrue(m.reserve_revision('test-artifact', '0.0.1', 'jar', 1))
+
     def test_upload(self):
         m = MockDriver()
         m.upload('/path/to/art-test-0.0.1.jar', 'a/b/c/d/art-test-0.0.1', None)
@@ -66,3 +95,19 @@ class TestMockDriver(unittest.TestCase):
         self.assertRaises(AssertionError, m.delete, 'a/b/c/d/art-test-0.0.1', 'xxx')
         m.delete('a/b/c/d/art-test-0.0.1', 'ffffeeeeddddccccbbbbaaaa99998888')
         self.assertEqual(m.uploaded_data, {})
+
+    def test_exists(self):
+        m = MockDriver()
+        self.assertFalse(m.exists('a/b/c/d/art-test-0.0.1', None))
+        m.upload('/path/to/art-test-0.0.1.jar', 'a/b/c/d/art-test-0.0.1', 'ffffeeeeddddccccbbbbaaaa99998888')
+        self.assertTrue(m.exists('a/b/c/d/art-test-0.0.1', None))
+        self.assertTrue(m.exists('a/b/c/d/art-test-0.0.1', 'ffffeeeeddddccccbbbbaaaa99998888'))
+        self.assertFalse(m.exists('a/b/c/d/art-test-0.0.1', 'ffffeeeeddddccccbbbbaaaa99998887'))
+
+    def test_copy(self):
+        m = MockDriver()
+        self.assertRaises(ValueError, m.copy, 'a/b/c/d/art-test-0.0.1', 'x/y', None)
+        m.upload('/path/to/art-test-0.0.1.jar', 'a/b/c/d/art-test-0.0.1', 'ffffeeeeddddccccbbbbaaaa99998888')
+        m.copy('a/b/c/d/art-test-0.0.1', 'x/y', 'ffffeeeeddddccccbbbbaaaa99998888')
+        self.assertEqual(m.uploaded_data['x/y'], ('/path/to/art-test-0.0.1.jar', 'ffffeeeeddddccccbbbbaaaa99998888'))
+        self.assertRaises(AssertionError, m.copy, 'a/b/c/d/art-test-0.0.1', 'x/z', 'ffffeeeeddddccccbbbbaaaa99998887')
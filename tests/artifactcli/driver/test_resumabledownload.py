@@ -0,0 +1,108 @@
+import unittest
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import boto3
+from moto import mock_s3
+from artifactcli.driver.resumabledownload import ResumableDownload
+
+
+class FailingClient(object):
+    """
+    Client wrapper which fails on the specified ranges
+    """
+
+    def __init__(self, client, failing_ranges):
+        self.client = client
+        self.failing_ranges = failing_ranges
+        self.requested_ranges = []
+
+    def get_object(self, **kwargs):
+        self.requested_ranges.append(kwargs.get('Range'))
+        if kwargs.get('Range') in self.failing_ranges:
+            raise IOError('connection reset')
+        return self.client.get_object(**kwargs)
+
+    def head_object(self, **kwargs):
+        return self.client.head_object(**kwargs)
+
+
+class TestResumableDownload(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.local_path = os.path.join(self.tmp_dir, 'test-artifact-1.2.3.dat')
+        self.data = os.urandom(1000)
+        self.md5 = hashlib.md5(self.data).hexdigest()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def _get_client(self):
+        session = boto3.session.Session(aws_access_key_id='XXX', aws_secret_access_key='YYY', region_name='us-east-1')
+        client = session.client('s3')
+        client.create_bucket(Bucket='bucket4art')
+        client.put_object(Bucket='bucket4art', Key='a/b/c', Body=self.data)
+        return client
+
+    def _download(self, client, chunksize=300, max_concurrency=3):
+        head = client.head_object(Bucket='bucket4art', Key='a/b/c')
+        return ResumableDownload(client, 'bucket4art', 'a/b/c', self.local_path, head['ContentLength'],
+                                 head['ETag'], chunksize, max_concurrency)
+
+    def _read(self, path):
+        with open(path, 'rb') as f:
+            return f.read()
+
+    @mock_s3
+    def test_run(self):
+        d = self._download(self._get_client())
+        self.assertEqual(d.num_parts(), 4)
+        d.run(self.md5)
+        self.assertEqual(self._read(self.local_path), self.data)
+        self.assertEqual(sorted(os.listdir(self.tmp_dir)), ['test-artifact-1.2.3.dat'])
+
+    @mock_s3
+    def test_run_empty(self):
+        self.data = b''
+        d = self._download(self._get_client())
+        d.run(hashlib.md5(b'').hexdigest())
+        self.assertEqual(self._read(self.local_path), b'')
+
+    @mock_s3
+    def test_run_resume(self):
+        client = FailingClient(self._get_client(), ['bytes=300-599'])
+        self.assertRaises(IOError, self._download(client, max_concurrency=1).run, self.md5)
+
+        # partial files are left
+        self.assertFalse(os.path.exists(self.local_path))
+        with open(self.local_path + '.part.json') as f:
+            self.assertEqual(json.load(f)['done'], [0])
+        self.assertEqual(os.path.getsize(self.local_path + '.part'), 1000)
+
+        # resume from the failed part
+        client.failing_ranges = []
+        client.requested_ranges = []
+        self._download(client, max_concurrency=1).run(self.md5)
+        self.assertEqual(client.requested_ranges, ['bytes=300-599', 'bytes=600-899', 'bytes=900-999'])
+        self.assertEqual(self._read(self.local_path), self.data)
+        self.assertEqual(sorted(os.listdir(self.tmp_dir)), ['test-artifact-1.2.3.dat'])
+
+    @mock_s3
+    def test_run_restart_when_object_changed(self):
+        client = FailingClient(self._get_client(), ['bytes=300-599'])
+        self.assertRaises(IOError, self._download(client, max_concurrency=1).run, self.md5)
+
+        self.data = os.urandom(1000)
+        client.client.put_object(Bucket='bucket4art', Key='a/b/c', Body=self.data)
+        client.failing_ranges = []
+        client.requested_ranges = []
+        self._download(client).run(hashlib.md5(self.data).hexdigest())
+        self.assertEqual(len(client.requested_ranges), 4)
+        self.assertEqual(self._read(self.local_path), self.data)
+
+    @mock_s3
+    def test_run_md5_error(self):
+        self.assertRaises(AssertionError, self._download(self._get_client()).run, '7a')
+        self.assertEqual(os.listdir(self.tmp_dir), [])
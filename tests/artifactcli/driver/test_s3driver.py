@@ -2,19 +2,33 @@
 
 import unittest
 import os
+import shutil
+import tempfile
+import hashlib
+from unittest import mock
 import boto3
+from botocore.exceptions import ClientError
+from boto3.s3.transfer import TransferConfig
 from moto import mock_s3
-from artifactcli.driver import S3Driver
+from artifactcli.driver import S3Driver, IndexCache, BlobCache
 
 
 class TestS3Driver(unittest.TestCase):
     def setUp(self):
         self.tmp_path = 'tests/resources/test-artifact-1.2.3.dat.tmp'
 
-    def _get_driver(self):
+    def _get_driver(self, index_cache=None):
         session = boto3.session.Session(aws_access_key_id='XXX', aws_secret_access_key='YYY')
         session.resource('s3').Bucket('bucket4art').create()
-        return S3Driver('XXX', 'YYY', 'bucket4art', 'gid', session=session)
+        return S3Driver('XXX', 'YYY', 'bucket4art', 'gid', session=session, index_cache=index_cache)
+
+    def _get_tmp_dir(self):
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        return tmp_dir
+
+    def _get_cache(self):
+        return IndexCache('bucket4art', 'gid', self._get_tmp_dir())
 
     @mock_s3
     def test_get_artifact_ids_empty(self):
@@ -38,6 +52,31 @@ class TestS3Driver(unittest.TestCase):
     def test_write_index_unicode(self):
         self._get_driver().write_index('test-artifact', '[{json: "メッセージ"}]')
 
+    @mock_s3
+    def test_write_index_conditional(self):
+        d = self._get_driver(self._get_cache())
+        with mock.patch.object(d.client, 'put_object', wraps=d.client.put_object) as m:
+            self.assertTrue(d.write_index('test-artifact', '[]', d.INDEX_ABSENT))
+            self.assertEqual(m.call_args[1]['IfNoneMatch'], '*')
+            etag = d.index_etag('test-artifact')
+            self.assertTrue(d.write_index('test-artifact', '[1]', etag))
+            self.assertEqual(m.call_args[1]['IfMatch'], etag)
+            self.assertTrue(d.write_index('test-artifact', '[2]'))
+            self.assertFalse('IfMatch' in m.call_args[1] or 'IfNoneMatch' in m.call_args[1])
+
+        # written by others
+        error = ClientError({'Error': {'Code': 'PreconditionFailed'}, 'ResponseMetadata': {'HTTPStatusCode': 412}},
+                            'PutObject')
+        with mock.patch.object(d.client, 'put_object', side_effect=error):
+            self.assertFalse(d.write_index('test-artifact', '[3]', d.index_etag('test-artifact')))
+        self.assertEqual(d.index_etag('test-artifact'), None)
+        self.assertEqual(d.read_index('test-artifact'), '[2]')
+
+        error = ClientError({'Error': {'Code': 'AccessDenied'}, 'ResponseMetadata': {'HTTPStatusCode': 403}},
+                            'PutObject')
+        with mock.patch.object(d.client, 'put_object', side_effect=error):
+            self.assertRaises(ClientError, d.write_index, 'test-artifact', '[3]')
+
     @mock_s3
     def test_read_index(self):
         d = self._get_driver()
@@ -50,10 +89,114 @@ class TestS3Driver(unittest.TestCase):
         d.write_index('test-artifact', '[{json: "メッセージ"}]')
         self.assertEqual(d.read_index('test-artifact'), '[{json: "メッセージ"}]')
 
+    @mock_s3
+    def test_read_index_binary(self):
+        cache = self._get_cache()
+        d = self._get_driver(cache)
+        d.write_index('test-artifact', b'\x89binary\x00')
+        res = d.client.get_object(Bucket='bucket4art', Key=d.index_path('test-artifact'))
+        self.assertEqual(res['ContentType'], 'application/octet-stream')
+        self.assertEqual(d.read_index('test-artifact'), b'\x89binary\x00')
+        self.assertEqual(cache.get('test-artifact')[1], b'\x89binary\x00')
+
     @mock_s3
     def test_read_index_not_found(self):
         self.assertEqual(self._get_driver().read_index('test-artifact'), '')
 
+    @mock_s3
+    def test_read_index_cached(self):
+        cache = self._get_cache()
+        d = self._get_driver(cache)
+        d.write_index('test-artifact', '[{json: "message"}]')
+        etag, body = cache.get('test-artifact')
+        self.assertEqual(body, '[{json: "message"}]')
+
+        # not modified: cached body is returned
+        cache.put('test-artifact', etag, '[{json: "cached"}]')
+        self.assertEqual(d.read_index('test-artifact'), '[{json: "cached"}]')
+
+        # modified by others
+        d.client.put_object(Bucket='bucket4art', Key=d.index_path('test-artifact'), Body=b'[{json: "updated"}]')
+        self.assertEqual(d.read_index('test-artifact'), '[{json: "updated"}]')
+        self.assertEqual(cache.get('test-artifact')[1], '[{json: "updated"}]')
+
+        # deleted by others
+        d.client.delete_object(Bucket='bucket4art', Key=d.index_path('test-artifact'))
+        self.assertEqual(d.read_index('test-artifact'), '')
+        self.assertEqual(cache.get('test-artifact'), (None, None))
+
+    @mock_s3
+    def test_deltas(self):
+        d = self._get_driver()
+        self.assertEqual(d.delta_names('test-artifact'), [])
+        self.assertEqual(d.delta_names(), {})
+
+        d.write_index('test-artifact', '[]')
+        names = [d.append_delta('test-artifact', '{"ops": [%d]}' % i) for i in range(3)]
+        other = d.append_delta('test-artifact2', '{"ops": []}')
+        self.assertEqual(d.delta_names('test-artifact'), sorted(names))
+        self.assertEqual(d.delta_names(), {'test-artifact': sorted(names), 'test-artifact2': [other]})
+        self.assertEqual(d.read_delta('test-artifact', names[1]), '{"ops": [1]}')
+        self.assertEqual(d.artifact_ids(), ['test-artifact'])
+
+        d.delete_deltas('test-artifact', names[:2])
+        self.assertEqual(d.delta_names('test-artifact'), names[2:])
+        self.assertEqual(d.read_delta('test-artifact', names[1]), None)
+
+    @mock_s3
+    def test_latest(self):
+        d = self._get_driver()
+        self.assertEqual(d.read_latest('test-artifact', '0.0.1', 'jar'), None)
+
+        d.write_latest('test-artifact', '0.0.1', 'jar', '{"revision": "あ"}')
+        self.assertEqual(d.read_latest('test-artifact', '0.0.1', 'jar'), '{"revision": "あ"}')
+        self.assertEqual(d.latest_path('test-artifact', '0.0.1', 'jar'),
+                         'gid/.meta/latest-test-artifact/0.0.1/jar.json')
+        self.assertEqual(d.artifact_ids(), [])
+
+        d.delete_latest('test-artifact', '0.0.1', 'jar')
+        self.assertEqual(d.read_latest('test-artifact', '0.0.1', 'jar'), None)
+
+    @mock_s3
+    def test_write_latest_conditional(self):
+        d = self._get_driver()
+        self.assertEqual(d.read_latest('test-artifact', '0.0.1', 'jar', with_etag=True), (None, d.INDEX_ABSENT))
+        with mock.patch.object(d.client, 'put_object', wraps=d.client.put_object) as m:
+            self.assertTrue(d.write_latest('test-artifact', '0.0.1', 'jar', '{}', d.INDEX_ABSENT))
+            self.assertEqual(m.call_args[1]['IfNoneMatch'], '*')
+            s, etag = d.read_latest('test-artifact', '0.0.1', 'jar', with_etag=True)
+            self.assertEqual(s, '{}')
+            self.assertTrue(d.write_latest('test-artifact', '0.0.1', 'jar', '{"revision": 1}', etag))
+            self.assertEqual(m.call_args[1]['IfMatch'], etag)
+
+        # written or deleted by others
+        for code, status in [('PreconditionFailed', 412), ('NoSuchKey', 404)]:
+            error = ClientError({'Error': {'Code': code}, 'ResponseMetadata': {'HTTPStatusCode': status}}, 'PutObject')
+            with mock.patch.object(d.client, 'put_object', side_effect=error):
+                self.assertFalse(d.write_latest('test-artifact', '0.0.1', 'jar', '{"revision": 2}', etag))
+        self.assertEqual(d.read_latest('test-artifact', '0.0.1', 'jar'), '{"revision": 1}')
+
+    @mock_s3
+    def test_reserve_revision(self):
+        d = self._get_driver()
+        with mock.patch.object(d.client, 'put_object', wraps=d.client.put_object) as m:
+            self.assertTrue(d.reserve_revision('test-artifact', '0.0.1', 'jar', 1))
+            self.assertEqual(m.call_args[1]['Key'], 'gid/.meta/revision-test-artifact/0.0.1/jar/1')
+            self.assertEqual(m.call_args[1]['IfNoneMatch'], '*')
+        self.assertTrue(d.exists_object('gid/.meta/revision-test-artifact/0.0.1/jar/1'))
+        self.assertTrue(d.is_reserved('test-artifact', '0.0.1', 'jar', 1))
+        self.assertFalse(d.is_reserved('test-artifact', '0.0.1', 'jar', 2))
+        self.assertEqual(d.artifact_ids(), [])
+
+        # taken by others
+        error = ClientError({'Error': {'Code': 'PreconditionFailed'}, 'ResponseMetadata': {'HTTPStatusCode': 412}},
+                            'PutObject')
+        with mock.patch.object(d.client, 'put_object', side_effect=error):
+            self.assertFalse(d.reserve_revision('test-artifact', '0.0.1', 'jar', 1))
+
+        d.release_revision('test-artifact', '0.0.1', 'jar', 1)
+        self.assertFalse(d.exists_object('gid/.meta/revision-test-artifact/0.0.1/jar/1'))
+
     @mock_s3
     def test_upload(self):
         d = self._get_driver()
@@ -68,6 +211,39 @@ class TestS3Driver(unittest.TestCase):
         self.assertEqual(d.bucket.Object('a/b/c/test-artifact-1.2.3.dat').e_tag.strip('"'),
                          '7a38cb250db7127113e00ad5e241d563')
 
+    @mock_s3
+    def test_upload_multipart(self):
+        mb = 1024 * 1024
+        path = os.path.join(self._get_tmp_dir(), 'test-artifact-1.2.3.dat')
+        data = os.urandom(mb) * 11
+        with open(path, 'wb') as f:
+            f.write(data)
+        md5 = hashlib.md5(data).hexdigest()
+
+        d = self._get_driver()
+        d.transfer_config = TransferConfig(multipart_threshold=5 * mb, multipart_chunksize=5 * mb, max_concurrency=2)
+        d.upload(path, 'a/b/c/test-artifact-1.2.3.dat', md5)
+
+        etag = d.bucket.Object('a/b/c/test-artifact-1.2.3.dat').e_tag.strip('"')
+        self.assertEqual(etag, S3Driver.multipart_etag(path, 5 * mb))
+        self.assertTrue(etag.endswith('-3'))
+
+        # MD5 digest is verified with the metadata
+        self.assertRaises(AssertionError, d.download, 'a/b/c/test-artifact-1.2.3.dat', self.tmp_path, '7a')
+        d.download('a/b/c/test-artifact-1.2.3.dat', self.tmp_path, md5)
+        with open(self.tmp_path, 'rb') as f:
+            self.assertEqual(hashlib.md5(f.read()).hexdigest(), md5)
+        os.remove(self.tmp_path)
+        d.delete('a/b/c/test-artifact-1.2.3.dat', md5)
+
+    def test_multipart_etag(self):
+        path = 'tests/resources/test-artifact-1.2.3.dat'
+        with open(path, 'rb') as f:
+            data = f.read()
+        parts = [data[0:4], data[4:8], data[8:]]
+        expected = hashlib.md5(b''.join(hashlib.md5(x).digest() for x in parts)).hexdigest() + '-3'
+        self.assertEqual(S3Driver.multipart_etag(path, 4), expected)
+
     @mock_s3
     def test_upload_md5_error(self):
         self.assertRaises(AssertionError, self._get_driver().upload, 'tests/resources/test-artifact-1.2.3.dat',
@@ -88,6 +264,24 @@ class TestS3Driver(unittest.TestCase):
         self.assertTrue(os.path.exists(self.tmp_path))
         os.remove(self.tmp_path)
 
+    @mock_s3
+    def test_download_blob_cache(self):
+        d = self._get_driver()
+        d.blob_cache = BlobCache(1024 * 1024, self._get_tmp_dir())
+        d.upload('tests/resources/test-artifact-1.2.3.dat', 'a/b/x/test-artifact-1.2.3.dat', None)
+        local_path = os.path.join(self._get_tmp_dir(), 'test-artifact-1.2.3.dat')
+
+        d.download('a/b/x/test-artifact-1.2.3.dat', local_path, '7a38cb250db7127113e00ad5e241d563')
+        self.assertTrue(os.path.exists(d.blob_cache.entry_path('7a38cb250db7127113e00ad5e241d563')))
+        os.remove(local_path)
+
+        # served from the cache without any request
+        d.reset_request_counts()
+        d.download('a/b/x/test-artifact-1.2.3.dat', local_path, '7a38cb250db7127113e00ad5e241d563')
+        self.assertEqual(d.request_counts, {})
+        with open(local_path, 'rb') as f:
+            self.assertEqual(hashlib.md5(f.read()).hexdigest(), '7a38cb250db7127113e00ad5e241d563')
+
     @mock_s3
     def test_download_not_found(self):
         self.assertRaises(ValueError, self._get_driver().download, 'a/b/c/test-artifact-1.2.3.dat', self.tmp_path, None)
@@ -163,5 +357,83 @@ class TestS3Driver(unittest.TestCase):
 
         self.assertTrue(d.exists_object('a/b/c/test-artifact-1.2.3.dat'))
 
+    @mock_s3
+    def test_exists(self):
+        d = self._get_driver()
+        self.assertFalse(d.exists('a/b/c/test-artifact-1.2.3.dat', None))
+        d.upload('tests/resources/test-artifact-1.2.3.dat', 'a/b/c/test-artifact-1.2.3.dat', None)
+        self.assertTrue(d.exists('a/b/c/test-artifact-1.2.3.dat', None))
+        self.assertTrue(d.exists('a/b/c/test-artifact-1.2.3.dat', '7a38cb250db7127113e00ad5e241d563'))
+        self.assertFalse(d.exists('a/b/c/test-artifact-1.2.3.dat', '7a'))
+
+    @mock_s3
+    def test_copy(self):
+        d = self._get_driver()
+        self.assertRaises(ValueError, d.copy, 'a/b/c/test-artifact-1.2.3.dat', 'x/y', None)
+        d.upload('tests/resources/test-artifact-1.2.3.dat', 'a/b/c/test-artifact-1.2.3.dat', None)
+        self.assertRaises(AssertionError, d.copy, 'a/b/c/test-artifact-1.2.3.dat', 'x/y', '7a')
+
+        d.reset_request_counts()
+        d.copy('a/b/c/test-artifact-1.2.3.dat', 'x/y', '7a38cb250db7127113e00ad5e241d563')
+        self.assertEqual(d.request_counts['PutObject'] + d.request_counts['UploadPart'], 0)
+        self.assertTrue(d.exists('x/y', '7a38cb250db7127113e00ad5e241d563'))
+
+    @mock_s3
+    def test_index_etag(self):
+        d = self._get_driver(self._get_cache())
+        self.assertEqual(d.index_etag('art-test'), None)
+        d.write_index('art-test', 'abc')
+        etag = d.index_etag('art-test')
+        self.assertEqual(etag, '"%s"' % hashlib.md5(b'abc').hexdigest())
+
+        d.index_etags.clear()
+        d.read_index('art-test')
+        self.assertEqual(d.index_etag('art-test'), etag)
+
+        d.client.delete_object(Bucket='bucket4art', Key=d.index_path('art-test'))
+        d.read_index('art-test')
+        self.assertEqual(d.index_etag('art-test'), None)
+
+    @mock_s3
+    def test_request_counts(self):
+        d = self._get_driver()
+        d.write_index('test-artifact', '[]')
+        d.upload('tests/resources/test-artifact-1.2.3.dat', 'a/b/c/test-artifact-1.2.3.dat',
+                 '7a38cb250db7127113e00ad5e241d563')
+
+        d.reset_request_counts()
+        d.read_index('test-artifact')
+        self.assertEqual(d.request_counts, {'GetObject': 1})
+
+        d.reset_request_counts()
+        d.read_index('no-such-artifact')
+        self.assertEqual(d.request_counts, {'GetObject': 1})
+
+        d.reset_request_counts()
+        d.write_index('test-artifact', '[]')
+        self.assertEqual(d.request_counts, {'PutObject': 1})
+
+        d.reset_request_counts()
+        d.upload('tests/resources/test-artifact-1.2.3.dat', 'a/b/c/test-artifact-1.2.3.dat',
+                 '7a38cb250db7127113e00ad5e241d563')
+        self.assertEqual(d.request_counts, {'PutObject': 1})
+
+        d.reset_request_counts()
+        d.download('a/b/c/test-artifact-1.2.3.dat', self.tmp_path, '7a38cb250db7127113e00ad5e241d563')
+        os.remove(self.tmp_path)
+        self.assertEqual(d.request_counts, {'HeadObject': 1, 'GetObject': 1})
+
+        d.reset_request_counts()
+        self.assertRaises(AssertionError, d.download, 'a/b/c/test-artifact-1.2.3.dat', self.tmp_path, '7a')
+        self.assertEqual(d.request_counts, {'HeadObject': 1})
+
+        d.reset_request_counts()
+        d.delete('a/b/c/test-artifact-1.2.3.dat', '7a38cb250db7127113e00ad5e241d563')
+        self.assertEqual(d.request_counts, {'HeadObject': 1, 'DeleteObject': 1})
+
+        d.reset_request_counts()
+        self.assertFalse(d.exists_object('a/b/c/test-artifact-1.2.3.dat'))
+        self.assertEqual(d.request_counts, {'HeadObject': 1})
+
     def test_s3_url(self):
         self.assertEqual(S3Driver.s3_url('bucket-name', 'a/b/c'), 's3://bucket-name/a/b/c')
@@ -0,0 +1,121 @@
+import threading
+import time
+import unittest
+from datetime import datetime
+
+from artifactcli.artifact import *
+from artifactcli.driver.simulateddriver import SimulatedDriver, SlowDown
+from artifactcli.repository import Repository
+
+
+class TestSimulatedDriver(unittest.TestCase):
+    def setUp(self):
+        self.sleeps = []
+
+    def _driver(self, **kwargs):
+        return SimulatedDriver(sleep=self.sleeps.append, **kwargs)
+
+    def test_latency_and_bandwidth(self):
+        m = self._driver(latency=0.1, bandwidth=1000)
+        self.assertTrue(m.write_index('test-artifact', 'x' * 500))
+        self.assertEqual(m.read_index('test-artifact'), 'x' * 500)
+        self.assertEqual(m.read_index('other-artifact'), '')
+        self.assertEqual(m.artifact_ids(), ['other-artifact', 'test-artifact'])
+
+        self.assertEqual(self.sleeps, [0.6, 0.6, 0.1, 0.1])
+        self.assertAlmostEqual(m.simulated_seconds, 1.4)
+        self.assertEqual(m.transferred_bytes, 1000)
+        self.assertEqual(m.request_counts, {'PutObject': 1, 'GetObject': 2, 'ListObjectsV2': 1})
+        self.assertEqual(m.error_counts, {})
+
+        m.reset_request_counts()
+        self.assertEqual(m.request_counts, {})
+        self.assertEqual(m.simulated_seconds, 0.0)
+        self.assertEqual(m.transferred_bytes, 0)
+
+    def test_jitter_deterministic(self):
+        def run():
+            self.sleeps = []
+            m = self._driver(latency=0.01, jitter=0.02, seed=1)
+            for _ in range(10):
+                m.read_index('test-artifact')
+            return self.sleeps
+
+        xs = run()
+        self.assertEqual(run(), xs)
+        self.assertEqual(len(set(xs)), 10)
+        self.assertTrue(all(0.01 <= x <= 0.03 for x in xs))
+
+    def test_throttling(self):
+        m = self._driver(error_rate=1.0)
+        with self.assertRaises(SlowDown) as cm:
+            m.write_index('test-artifact', 'xxx')
+        self.assertEqual(cm.exception.operation, 'PutObject')
+        self.assertEqual(cm.exception.response['Error']['Code'], 'SlowDown')
+        self.assertEqual(cm.exception.response['ResponseMetadata']['HTTPStatusCode'], 503)
+        self.assertEqual(m.index_data, {})
+        self.assertEqual(m.error_counts, {'PutObject': 1})
+
+    def test_throttling_retry(self):
+        m = self._driver(error_rate=0.5, max_attempts=10, backoff=0.1, seed=3)
+        for i in range(20):
+            m.upload('/path/to/test-artifact-1.2.3.jar', 'com/github/mogproject/test-artifact-1.2.3.jar/%d' % i, None)
+        self.assertEqual(len(m.uploaded_data), 20)
+        self.assertGreater(m.error_counts['PutObject'], 0)
+        self.assertEqual(m.request_counts['PutObject'], 20 + m.error_counts['PutObject'])
+        self.assertGreater(m.simulated_seconds, 0.0)
+
+        # same seed, same errors
+        n = self._driver(error_rate=0.5, max_attempts=10, backoff=0.1, seed=3)
+        for i in range(20):
+            n.upload('/path/to/test-artifact-1.2.3.jar', 'com/github/mogproject/test-artifact-1.2.3.jar/%d' % i, None)
+        self.assertEqual(n.error_counts, m.error_counts)
+        self.assertEqual(n.simulated_seconds, m.simulated_seconds)
+
+    def test_max_connections(self):
+        m = SimulatedDriver(latency=0.02, max_connections=2)
+        threads = [threading.Thread(target=m.read_index, args=('art-%d' % i,)) for i in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(m.request_counts, {'GetObject': 8})
+        self.assertEqual(m.max_in_flight, 2)
+        self.assertEqual(m.in_flight, 0)
+
+    def test_load_all_concurrently(self):
+        m = SimulatedDriver()
+        r = Repository(m, 'com.github.mogproject')
+        for i in range(16):
+            art = Artifact(BasicInfo('com.github.mogproject', 'art-%02d' % i, '0.0.1', 'jar', None),
+                           FileInfo('host1', 'user1', 4567890, datetime(2014, 12, 31, 9, 12, 34),
+                                    'ffffeeeeddddccccbbbbaaaa99998888'))
+            r.upload('/path/to/art-%02d-0.0.1.jar' % i, art)
+            r.save('art-%02d' % i)
+
+        m.latency = 0.05
+        m.reset_request_counts()
+        r2 = Repository(m, 'com.github.mogproject')
+        t = time.time()
+        r2.load_all(jobs=16)
+        elapsed = time.time() - t
+
+        self.assertEqual(r2.artifacts, r.artifacts)
+        self.assertEqual(m.request_counts, {'ListObjectsV2': 2, 'GetObject': 16})
+        self.assertGreater(m.max_in_flight, 1)
+        self.assertAlmostEqual(m.simulated_seconds, 0.05 * 18)
+        self.assertLess(elapsed, 0.05 * 18)
+
+    def test_download_latest_requests(self):
+        m = SimulatedDriver()
+        r = Repository(m, 'com.github.mogproject')
+        art = Artifact(BasicInfo('com.github.mogproject', 'art-test', '0.0.1', 'jar', None),
+                       FileInfo('host1', 'user1', 4567890, datetime(2014, 12, 31, 9, 12, 34),
+                                'ffffeeeeddddccccbbbbaaaa99998888'))
+        r.upload('/path/to/art-test-0.0.1.jar', art)
+        r.save('art-test')
+
+        # the pointer, the marker and the file of the next revision, and the file
+        m.reset_request_counts()
+        Repository(m, 'com.github.mogproject').download_latest('/tmp/art-test-0.0.1.jar')
+        self.assertEqual(m.request_counts, {'GetObject': 2, 'HeadObject': 2})
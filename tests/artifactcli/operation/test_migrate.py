@@ -0,0 +1,66 @@
+import unittest
+from datetime import datetime
+
+from artifactcli.artifact import *
+from artifactcli.driver import *
+from artifactcli.operation import *
+from artifactcli.repository import Repository
+
+
+class TestMigrateOperation(unittest.TestCase):
+    def test_run(self):
+        arts = [
+            Artifact(BasicInfo('com.github.mogproject', 'art-test', '0.0.1', 'jar', 1),
+                     FileInfo('host1', 'user1', 4567890, datetime(2014, 12, 31, 9, 12, 34),
+                              'ffffeeeeddddccccbbbbaaaa99998888')),
+            Artifact(BasicInfo('com.github.mogproject', 'art-test2', '0.0.1', 'jar', 1),
+                     FileInfo('host1', 'user1', 4567891, datetime(2014, 12, 31, 9, 12, 34),
+                              'ffffeeeeddddccccbbbbaaaa99998887')),
+        ]
+        r = Repository(MockDriver(), 'com.github.mogproject')
+        r.upload('/path/to/art-test-0.0.1.jar', arts[0])
+        r.upload('/path/to/art-test2-0.0.1.jar', arts[1])
+        r.save('art-test')
+        r.save('art-test2')
+
+        rc = MigrateOperation('com.github.mogproject', [], True).run(r)
+        self.assertEqual(rc, 0)
+        self.assertEqual(len(r.driver.uploaded_data), 2)
+
+        rc = MigrateOperation('com.github.mogproject', [], False).run(r)
+        self.assertEqual(rc, 0)
+        self.assertEqual(len(r.driver.uploaded_data), 4)
+
+        r.artifacts = {}
+        r.load_all()
+        self.assertEqual(r.artifacts['art-test'][0].location,
+                         'com.github.mogproject/.blobs/ffffeeeeddddccccbbbbaaaa99998888')
+        self.assertEqual(r.artifacts['art-test2'][0].location,
+                         'com.github.mogproject/.blobs/ffffeeeeddddccccbbbbaaaa99998887')
+
+    def test_run_index_format(self):
+        arts = [
+            Artifact(BasicInfo('com.github.mogproject', 'art-test', '0.0.1', 'jar', 1),
+                     FileInfo('host1', 'user1', 4567890, datetime(2014, 12, 31, 9, 12, 34),
+                              'ffffeeeeddddccccbbbbaaaa99998888')),
+        ]
+        r = Repository(MockDriver(), 'com.github.mogproject')
+        r.upload('/path/to/art-test-0.0.1.jar', arts[0])
+        r.save('art-test')
+
+        rc = MigrateOperation('com.github.mogproject', [], True, 'compact').run(r)
+        self.assertEqual(rc, 0)
+        self.assertTrue(isinstance(r.driver.index_data['art-test'], str))
+
+        rc = MigrateOperation('com.github.mogproject', [], False, 'compact').run(r)
+        self.assertEqual(rc, 0)
+        self.assertTrue(r.driver.index_data['art-test'].startswith(b'\x89ARTIDX'))
+        self.assertEqual(len(r.driver.uploaded_data), 1)  # files are not moved to blobs
+
+        r.artifacts = {}
+        r.load_all()
+        self.assertEqual(r.artifacts['art-test'], arts)
+
+        rc = MigrateOperation('com.github.mogproject', [], False, 'json').run(r)
+        self.assertEqual(rc, 0)
+        self.assertTrue(isinstance(r.driver.index_data['art-test'], str))
@@ -0,0 +1,99 @@
+import unittest
+import copy
+from datetime import datetime
+
+from artifactcli.artifact import *
+from artifactcli.artifactindex import ArtifactIndex
+
+
+class TestArtifactIndex(unittest.TestCase):
+    def _artifact(self, version, revision, size=11, md5='ffffeeeeddddccccbbbbaaaa99998888'):
+        return Artifact(BasicInfo('com.github.mogproject', 'art-test', version, 'jar', revision),
+                        FileInfo('host1', 'user1', size, datetime(2014, 12, 31, 9, 12, 34), md5))
+
+    def test_init(self):
+        a = self._artifact('0.0.1', 1)
+        index = ArtifactIndex({'art-test': [a]})
+        self.assertEqual(index, {'art-test': [a]})
+        self.assertEqual(index.find('art-test', '0.0.1', 'jar', 1), [a])
+
+    def test_missing(self):
+        index = ArtifactIndex()
+        self.assertEqual(index['art-test'], [])
+        self.assertEqual(index, {'art-test': []})
+
+    def test_find_latest(self):
+        xs = [self._artifact('0.0.1', r) for r in [3, 1, 10, 2]]
+        index = ArtifactIndex({'art-test': xs})
+        self.assertEqual(index.find_latest('art-test', '0.0.1', 'jar'), [xs[2]])
+        self.assertEqual(index.find_latest('art-test', '0.0.2', 'jar'), [])
+        self.assertEqual(index.find_all('art-test', '0.0.1', 'jar'), [xs[1], xs[3], xs[0], xs[2]])
+
+    def test_find_by_digest(self):
+        xs = [self._artifact('0.0.1', 1), self._artifact('0.0.1', 2, size=12), self._artifact('0.0.2', 1)]
+        index = ArtifactIndex({'art-test': xs})
+        self.assertEqual(index.find_by_digest('art-test', '0.0.1', 'jar', 11, 'ffffeeeeddddccccbbbbaaaa99998888'),
+                         [xs[0]])
+        self.assertEqual(index.find_by_digest('art-test', '0.0.1', 'jar', 13, 'ffffeeeeddddccccbbbbaaaa99998888'),
+                         [])
+
+    def test_append_and_remove(self):
+        index = ArtifactIndex()
+        a, b = self._artifact('0.0.1', 1), self._artifact('0.0.1', 2)
+        index.append(a)
+        index.append(b)
+        self.assertEqual(index, {'art-test': [a, b]})
+        self.assertEqual(index.find_latest('art-test', '0.0.1', 'jar'), [b])
+
+        index.remove('art-test', '0.0.1', 'jar', 2)
+        self.assertEqual(index, {'art-test': [a]})
+        self.assertEqual(index.find_latest('art-test', '0.0.1', 'jar'), [a])
+        self.assertEqual(index.find_by_digest('art-test', '0.0.1', 'jar', 11, b.file_info.md5), [a])
+
+        index.remove('art-test', '0.0.1', 'jar', 1)
+        self.assertEqual(index, {'art-test': []})
+        self.assertEqual(index.find_latest('art-test', '0.0.1', 'jar'), [])
+
+    def test_setitem_replaces_entries(self):
+        index = ArtifactIndex({'art-test': [self._artifact('0.0.1', 5)]})
+        a = self._artifact('0.0.1', 1)
+        index['art-test'] = [a]
+        self.assertEqual(index.find_latest('art-test', '0.0.1', 'jar'), [a])
+
+        index['art-test'] += [self._artifact('0.0.1', 2)]
+        self.assertEqual(index.find_latest('art-test', '0.0.1', 'jar')[0].basic_info.revision, 2)
+
+        del index['art-test']
+        self.assertEqual(index.find_latest('art-test', '0.0.1', 'jar'), [])
+
+    def test_merge(self):
+        a, b, c = self._artifact('0.0.1', 1), self._artifact('0.0.1', 2), self._artifact('0.0.2', 1)
+        other = Artifact(BasicInfo('com.github.mogproject', 'art-other', '0.0.1', 'jar', 1), c.file_info)
+        index = ArtifactIndex({'art-test': [a], 'art-other': [other]})
+        update = ArtifactIndex({'art-test': [a, b, c]})
+
+        merged = index.merge(update)
+        self.assertEqual(merged, {'art-test': [a, b, c], 'art-other': [other]})
+        self.assertEqual(merged.find_latest('art-test', '0.0.1', 'jar'), [b])
+        self.assertEqual(merged.find_latest('art-test', '0.0.2', 'jar'), [c])
+        self.assertTrue(merged._shards['art-test'] is update._shards['art-test'])
+        self.assertTrue(merged._shards['art-other'] is index._shards['art-other'])
+        self.assertEqual(index.find_latest('art-test', '0.0.1', 'jar'), [a])
+        self.assertEqual(index.find_latest('art-test', '0.0.2', 'jar'), [])
+
+        # removing an artifact id from the merged index leaves the original one unchanged
+        del merged['art-other']
+        self.assertEqual(index.find_latest('art-other', '0.0.1', 'jar'), [other])
+        self.assertEqual(index.merge(ArtifactIndex({'art-new': []}))['art-new'], [])
+
+    def test_duplicated_revision(self):
+        a, b = self._artifact('0.0.1', 1), self._artifact('0.0.1', 1)
+        index = ArtifactIndex({'art-test': [a, b]})
+        self.assertEqual(index.find('art-test', '0.0.1', 'jar', 1), [a, b])
+
+    def test_deepcopy(self):
+        index = ArtifactIndex({'art-test': [self._artifact('0.0.1', 1)]})
+        copied = copy.deepcopy(index)
+        self.assertTrue(isinstance(copied, ArtifactIndex))
+        self.assertEqual(copied, index)
+        self.assertEqual(len(copied.find('art-test', '0.0.1', 'jar', 1)), 1)
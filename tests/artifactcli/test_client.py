@@ -0,0 +1,85 @@
+import unittest
+import os
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+import boto3
+from moto import mock_s3
+
+from artifactcli.client import ArtifactClient
+from artifactcli.driver import MockDriver
+from artifactcli.repository import Repository
+
+
+class TestArtifactClient(unittest.TestCase):
+    def setUp(self):
+        self.client = ArtifactClient('com.github.mogproject', Repository(MockDriver(), 'com.github.mogproject'))
+        self.local_path = 'tests/resources/test-artifact-1.2.3.dat'
+
+    def test_upload(self):
+        art = self.client.upload(self.local_path)
+        self.assertEqual(art.basic_info.revision, 1)
+        self.assertEqual(art.file_info.md5, '7a38cb250db7127113e00ad5e241d563')
+
+        # already uploaded
+        self.assertEqual(self.client.upload(self.local_path), art)
+        self.assertEqual(self.client.upload(self.local_path, force=True).basic_info.revision, 2)
+
+    def test_upload_print_only(self):
+        self.assertEqual(self.client.upload(self.local_path, print_only=True).basic_info.revision, 1)
+        self.assertEqual(self.client.list(), [])
+
+    def test_list_and_info(self):
+        self.assertEqual(self.client.list(), [])
+        a = self.client.upload(self.local_path)
+        b = self.client.upload(self.local_path, force=True)
+        self.assertEqual(self.client.list(), [a, b])
+        self.assertEqual(self.client.list('test-artifact'), [a, b])
+        self.assertEqual(self.client.list('no-such-artifact'), [])
+        self.assertEqual(self.client.info('test-artifact-1.2.3.dat'), b)
+        self.assertEqual(self.client.info('test-artifact-1.2.3.dat', 1), a)
+        self.assertRaises(ValueError, self.client.info, 'test-artifact-1.2.3.dat', 3)
+
+    def test_returns_copies(self):
+        art = self.client.upload(self.local_path)
+        art.basic_info.revision = 100
+        self.assertEqual(self.client.info('test-artifact-1.2.3.dat').basic_info.revision, 1)
+
+    def test_download(self):
+        art = self.client.upload(self.local_path)
+        self.assertEqual(self.client.download('/tmp/test-artifact-1.2.3.dat'), art)
+        self.assertEqual(self.client.repo.driver.downloaded_data,
+                         {'/tmp/test-artifact-1.2.3.dat': (art.s3_path(), art.file_info.md5)})
+        self.assertRaises(ValueError, self.client.download, '/tmp/test-artifact-1.2.3.dat', 2)
+
+    def test_delete(self):
+        a = self.client.upload(self.local_path)
+        b = self.client.upload(self.local_path, force=True)
+        self.assertEqual(self.client.delete('test-artifact-1.2.3.dat', 1), a)
+        self.assertEqual(self.client.list(), [b])
+        self.assertRaises(ValueError, self.client.delete, 'test-artifact-1.2.3.dat', 1)
+
+    def test_concurrent_uploads(self):
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            arts = list(executor.map(lambda _: self.client.upload(self.local_path, force=True), range(20)))
+        self.assertEqual(sorted(x.basic_info.revision for x in arts), list(range(1, 21)))
+        self.assertEqual(len(self.client.list()), 20)
+
+    def test_init_error(self):
+        self.assertRaises(ValueError, ArtifactClient, 'gid', no_such_option=1)
+        self.assertRaises(ValueError, ArtifactClient, 'gid', config='tests/resources/no_such_file')
+
+    @mock_s3
+    def test_s3(self):
+        boto3.session.Session(aws_access_key_id='XXX', aws_secret_access_key='YYY').resource('s3') \
+            .Bucket('bucket4art').create()
+        client = ArtifactClient('com.github.mogproject', bucket='bucket4art', access_key='XXX', secret_key='YYY',
+                                no_cache=True)
+        art = client.upload(self.local_path)
+
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        local_path = os.path.join(tmp_dir, 'test-artifact-1.2.3.dat')
+        self.assertEqual(client.download(local_path), art)
+        with open(local_path) as f:
+            self.assertEqual(f.read(), 'test001.dat')
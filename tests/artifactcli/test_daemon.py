@@ -0,0 +1,147 @@
+import unittest
+import os
+import json
+import shutil
+import socket
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import redirect_stdout, redirect_stderr
+from io import StringIO
+from unittest import mock
+import boto3
+from moto import mock_s3
+
+from artifactcli import daemon
+from artifactcli.daemon import ArtifactDaemon
+
+
+class TestDaemon(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_dir, 'daemon.sock')
+        self.env = {'ARTIFACT_CLI_SOCKET': self.path, 'AWS_ACCESS_KEY_ID': 'XXX', 'AWS_SECRET_ACCESS_KEY': 'YYY'}
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def _start(self):
+        server = ArtifactDaemon(self.path)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.start()
+
+        def stop():
+            server.shutdown()
+            thread.join()
+            server.server_close()
+        self.addCleanup(stop)
+        return server
+
+    def _forward(self, *args):
+        out, err = StringIO(), StringIO()
+        with redirect_stdout(out), redirect_stderr(err):
+            argv = ['art', '--bucket', 'bucket4art', '--access', 'XXX', '--secret', 'YYY', '--no-cache']
+            status = daemon.forward(argv + list(args), self.env)
+        return status, out.getvalue(), err.getvalue()
+
+    def test_socket_path(self):
+        self.assertEqual(daemon.socket_path({'ARTIFACT_CLI_SOCKET': '/tmp/x.sock'}), '/tmp/x.sock')
+        self.assertTrue(daemon.socket_path({}).endswith('/artifact-cli/daemon.sock'))
+
+    def test_forward_not_running(self):
+        self.assertEqual(daemon.forward(['art', 'list', 'gid'], self.env), None)
+
+        # stale socket file
+        open(self.path, 'w').close()
+        self.assertEqual(daemon.forward(['art', 'list', 'gid'], self.env), None)
+
+    def test_forward_disabled(self):
+        self._start()
+        self.env['ARTIFACT_CLI_NO_DAEMON'] = '1'
+        self.assertEqual(daemon.forward(['art', 'list', 'gid'], self.env), None)
+
+    def test_already_running(self):
+        self._start()
+        self.assertRaises(ValueError, ArtifactDaemon, self.path)
+
+    @mock_s3
+    def test_forward(self):
+        boto3.session.Session(aws_access_key_id='XXX', aws_secret_access_key='YYY').resource('s3') \
+            .Bucket('bucket4art').create()
+        server = self._start()
+        self.assertEqual(oct(os.stat(self.path).st_mode & 0o777), '0o700')
+
+        status, out, err = self._forward('list', 'com.github.mogproject')
+        self.assertEqual(status, 0)
+        self.assertTrue('[INFO] No artifacts.' in err)
+
+        local_path = os.path.join(self.tmp_dir, 'test-artifact-1.2.3.dat')
+        shutil.copy('tests/resources/test-artifact-1.2.3.dat', local_path)
+        cwd = os.getcwd()
+        os.chdir(self.tmp_dir)
+        try:
+            status, out, err = self._forward('upload', 'com.github.mogproject', 'test-artifact-1.2.3.dat')
+        finally:
+            os.chdir(cwd)
+        self.assertEqual(status, 0, err)
+        self.assertTrue('[INFO] Uploading artifact' in err)
+
+        status, out, err = self._forward('list', 'com.github.mogproject')
+        self.assertEqual(status, 0)
+        self.assertTrue('test-artifact' in out)
+
+        # the same repository is reused
+        self.assertEqual(len(server.repo_cache), 1)
+        repo = list(server.repo_cache.values())[0]
+        # artifact ids and index deltas for each list command, and index deltas for the upload command
+        self.assertEqual(repo.driver.request_counts.get('ListObjects', 0) +
+                         repo.driver.request_counts.get('ListObjectsV2', 0), 5)
+
+    @mock_s3
+    def test_forward_errors(self):
+        self._start()
+        status, out, err = self._forward('--version')
+        self.assertEqual(status, 0)
+        self.assertTrue(out.startswith('artifact-cli '))
+
+        status, out, err = self._forward('info', 'com.github.mogproject')
+        self.assertEqual(status, 1)
+
+        status, out, err = self._forward('daemon')
+        self.assertEqual(status, 1)
+        self.assertTrue('already running' in err)
+
+    def _request(self, *args):
+        # a client which does not redirect the standard streams of this process
+        argv = ['art', '--bucket', 'bucket4art', '--access', 'XXX', '--secret', 'YYY', '--no-cache']
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.connect(self.path)
+        with sock, sock.makefile('rwb') as f:
+            f.write(json.dumps({'argv': argv + list(args), 'env': {}, 'cwd': os.getcwd()}).encode('utf-8') + b'\n')
+            f.flush()
+            return json.loads(f.readline().decode('utf-8'))
+
+    @mock_s3
+    def test_forward_concurrently(self):
+        self._start()
+        barrier = threading.Barrier(2, timeout=10)
+
+        def run(operation, repo):
+            # both commands must be running at the same time to pass the barrier
+            print(operation.group_id)
+            barrier.wait()
+            return 0
+
+        with mock.patch('artifactcli.operation.list.ListOperation.run', autospec=True, side_effect=run):
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                responses = list(executor.map(lambda g: self._request('list', g), ['gid1', 'gid2']))
+        self.assertEqual([(x['status'], x['stdout']) for x in responses], [(0, 'gid1\n'), (0, 'gid2\n')])
+
+    def test_forward_no_response(self):
+        server = self._start()
+        with mock.patch.object(server, 'run_command', side_effect=RuntimeError), \
+                mock.patch.object(server, 'handle_error'):
+            status, out, err = self._forward('list', 'com.github.mogproject')
+
+        # the command may have been run, so it is not run locally again
+        self.assertEqual(status, 1)
@@ -0,0 +1,75 @@
+import unittest
+import os
+import shutil
+import tempfile
+
+from artifactcli.hashcache import HashCache
+
+
+class TestHashCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.cache = HashCache(os.path.join(self.tmp_dir, 'cache'))
+        self.path = os.path.join(self.tmp_dir, 'test-artifact-1.2.3.dat')
+        self._write(b'abc', 1000000000)
+        self.calls = []
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def _write(self, data, mtime):
+        with open(self.path, 'wb') as f:
+            f.write(data)
+        os.utime(self.path, (mtime, mtime))
+
+    def _func(self, path):
+        self.calls.append(path)
+        with open(path, 'rb') as f:
+            return f.read().decode('utf-8')
+
+    def test_init(self):
+        self.assertEqual(HashCache('/tmp/xxx').path, '/tmp/xxx/hashes.db')
+
+    def test_digest(self):
+        self.assertEqual(self.cache.digest(self.path, 'md5', self._func), 'abc')
+        self.assertEqual(self.cache.digest(self.path, 'md5', self._func), 'abc')
+        self.assertEqual(len(self.calls), 1)
+
+        # digest names are cached separately
+        self.assertEqual(self.cache.digest(self.path, 'sha256', self._func), 'abc')
+        self.assertEqual(len(self.calls), 2)
+
+    def test_digest_invalidated_by_mtime(self):
+        self.cache.digest(self.path, 'md5', self._func)
+        self._write(b'xyz', 1000000001)
+        self.assertEqual(self.cache.digest(self.path, 'md5', self._func), 'xyz')
+        self.assertEqual(len(self.calls), 2)
+
+    def test_digest_invalidated_by_size(self):
+        self.cache.digest(self.path, 'md5', self._func)
+        self._write(b'abcd', 1000000000)
+        self.assertEqual(self.cache.digest(self.path, 'md5', self._func), 'abcd')
+        self.assertEqual(len(self.calls), 2)
+
+    def test_digest_invalidated_by_inode(self):
+        self.cache.digest(self.path, 'md5', self._func)
+        tmp_path = self.path + '.tmp'
+        shutil.copy2(self.path, tmp_path)
+        os.replace(tmp_path, self.path)
+        self.assertEqual(self.cache.digest(self.path, 'md5', self._func), 'abc')
+        self.assertEqual(len(self.calls), 2)
+
+    def test_digest_recently_modified(self):
+        with open(self.path, 'wb') as f:
+            f.write(b'abc')
+        self.cache.digest(self.path, 'md5', self._func)
+        self.cache.digest(self.path, 'md5', self._func)
+        self.assertEqual(len(self.calls), 2)
+
+    def test_digest_broken_database(self):
+        os.makedirs(os.path.dirname(self.cache.path))
+        with open(self.cache.path, 'w') as f:
+            f.write('not a database')
+        self.assertEqual(self.cache.digest(self.path, 'md5', self._func), 'abc')
+        self.assertEqual(self.cache.digest(self.path, 'md5', self._func), 'abc')
+        self.assertEqual(len(self.calls), 2)
@@ -0,0 +1,132 @@
+# -*- encoding: utf-8 -*-
+
+import unittest
+import copy
+import json
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+from artifactcli.artifact import *
+from artifactcli import indexformat
+
+
+class TestIndexFormat(unittest.TestCase):
+    def setUp(self):
+        self.artifacts = [
+            Artifact(BasicInfo('com.github.mogproject', 'art-test', '0.0.1', 'jar', 1),
+                     FileInfo('host1', 'user1', 4567890, datetime(2014, 12, 31, 9, 12, 34),
+                              'ffffeeeeddddccccbbbbaaaa99998888'),
+                     GitInfo('master', ['release 0.0.1', 'v0.0.1'], 'あいう', 'x@example.com',
+                             datetime(2014, 12, 30, 8, 11, 29), 'かきく',
+                             '111122223333444455556666777788889999aaaa')),
+            Artifact(BasicInfo('com.github.mogproject', 'art-test', '0.0.1', 'jar', 2),
+                     FileInfo('host1', 'user1', 22222, datetime(1969, 12, 31, 23, 59, 59, 123456),
+                              'ffffeeeeddddccccbbbbaaaa99998887', 'ab' * 32),
+                     GitInfo('', [], 'mogproject', 'x@example.com',
+                             datetime(2014, 12, 30, 8, 11, 29, tzinfo=timezone(timedelta(hours=9))), '',
+                             '111122223333444455556666777788889999aaaa'),
+                     'com.github.mogproject/.blobs/ffffeeeeddddccccbbbbaaaa99998887'),
+            Artifact(BasicInfo('com.github.mogproject', 'art-test', '0.0.2', 'zip', 1),
+                     FileInfo('host2', 'user2', 0, datetime(2015, 1, 1), 'ffffeeeeddddccccbbbbaaaa99998886')),
+        ]
+
+    def assertSameArtifacts(self, xs, ys):
+        # locations and SHA-256 digests are not compared in equality
+        self.assertEqual(xs, ys)
+        self.assertEqual([x.to_dict() for x in xs], [y.to_dict() for y in ys])
+
+    def test_json(self):
+        s = indexformat.encode(self.artifacts)
+        self.assertEqual(json.loads(s), [x.to_dict() for x in self.artifacts])
+        self.assertEqual(indexformat.detect(s), 'json')
+        self.assertSameArtifacts(indexformat.decode(s), self.artifacts)
+        self.assertSameArtifacts(indexformat.decode(s.encode('utf-8')), self.artifacts)
+
+    def test_compact(self):
+        data = indexformat.encode(self.artifacts, 'compact')
+        self.assertTrue(isinstance(data, bytes))
+        self.assertTrue(data.startswith(b'\x89ARTIDX\x01'))
+        self.assertEqual(indexformat.detect(data), 'compact')
+        self.assertSameArtifacts(indexformat.decode(data), self.artifacts)
+        self.assertEqual(indexformat.decode(data)[1].file_info.sha256, 'ab' * 32)
+
+        # strings are stored once and timestamps are integers
+        payload = json.loads(zlib.decompress(data[8:]).decode('utf-8'))
+        self.assertEqual(payload['strings'].count('com.github.mogproject'), 1)
+        self.assertEqual(payload['rows'][0][8], 1420017154)
+        self.assertEqual(payload['rows'][1][8], '1969-12-31T23:59:59.123456')
+        self.assertEqual(len(payload['rows'][2]), 12)
+
+    def test_compact_is_small(self):
+        xs = [Artifact(BasicInfo('com.github.mogproject', 'art-test', '0.0.1', 'jar', i),
+                       FileInfo('host1', 'user1', 4567890 + i, datetime(2014, 12, 31, 9, 12, 34) + timedelta(hours=i),
+                                '%032x' % i),
+                       GitInfo('master', ['release 0.0.1'], 'mogproject', 'x@example.com',
+                               datetime(2014, 12, 30, 8, 11, 29), 'commit %d' % i, '%040x' % (i // 10)))
+              for i in range(1, 1001)]
+        data = indexformat.encode(xs, 'compact')
+        self.assertLess(len(data) * 5, len(indexformat.encode(xs).encode('utf-8')))
+        self.assertSameArtifacts(indexformat.decode(data), xs)
+
+    def test_lazy(self):
+        def is_lazy(x):
+            return 'basic_info' not in x.__dict__
+
+        for index_format in ['json', 'compact']:
+            data = indexformat.encode(self.artifacts, index_format)
+            xs = indexformat.decode(data)
+            self.assertTrue(all(map(is_lazy, xs)))
+
+            # key fields and records are read without materializing
+            self.assertEqual([x.lookup_key() for x in xs], [x.lookup_key() for x in self.artifacts])
+            self.assertEqual(xs[1].lookup_key(), ('art-test', '0.0.1', 'jar', 2, 22222,
+                                                  'ffffeeeeddddccccbbbbaaaa99998887'))
+            self.assertEqual([x.to_dict() for x in xs], [x.to_dict() for x in self.artifacts])
+            self.assertTrue(all(map(is_lazy, xs)))
+
+            # copies are independent
+            y = copy.copy(xs[0])
+            y.location = 'somewhere'
+            self.assertEqual(y.location, 'somewhere')
+            self.assertEqual(y.basic_info.revision, 1)
+            self.assertTrue(is_lazy(xs[0]))
+            z = copy.deepcopy(xs[2])
+            z.basic_info.revision = 3
+            self.assertEqual(xs[2].basic_info.revision, 1)
+
+            # materialized on access
+            self.assertEqual(xs[0].file_info.mtime, datetime(2014, 12, 31, 9, 12, 34))
+            self.assertFalse(is_lazy(xs[0]))
+            self.assertFalse('_record' in xs[0].__dict__)
+            self.assertTrue(is_lazy(xs[1]))
+            self.assertSameArtifacts(xs, self.artifacts)
+            self.assertSameArtifacts(self.artifacts, xs)
+            self.assertEqual(repr(xs), repr(self.artifacts))
+
+            eager = indexformat.decode(data, lazy=False)
+            self.assertFalse(any(map(is_lazy, eager)))
+            self.assertSameArtifacts(eager, self.artifacts)
+
+    def test_lazy_concurrent_access(self):
+        data = indexformat.encode(self.artifacts * 100)
+        for _ in range(10):
+            xs = indexformat.decode(data)
+            with ThreadPoolExecutor(max_workers=8) as executor:
+                results = list(executor.map(lambda i: [(x.lookup_key(), x.file_info.md5) for x in xs], range(8)))
+            self.assertEqual(results, [[(x.lookup_key(), x.file_info.md5) for x in self.artifacts * 100]] * 8)
+
+    def test_lazy_unknown_attribute(self):
+        x = indexformat.decode(indexformat.encode(self.artifacts))[0]
+        self.assertRaises(AttributeError, getattr, x, 'no_such_attribute')
+        self.assertEqual(x.__dict__.get('basic_info'), None)
+
+    def test_empty(self):
+        self.assertEqual(indexformat.decode(''), [])
+        self.assertEqual(indexformat.decode(b''), [])
+        self.assertEqual(indexformat.decode(indexformat.encode([], 'compact')), [])
+
+    def test_errors(self):
+        self.assertRaises(ValueError, indexformat.encode, self.artifacts, 'xml')
+        data = indexformat.encode(self.artifacts, 'compact')
+        self.assertRaises(ValueError, indexformat.decode, data[:7] + b'\x02' + data[8:])
@@ -1,13 +1,35 @@
 # -*- encoding: utf-8 -*-
 
 import unittest
+import copy
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from io import StringIO
 import json
+from unittest import mock
 
 from artifactcli.artifact import *
 from artifactcli.driver import *
 from artifactcli.repository import Repository
+from artifactcli import indexformat
+
+
+class ETagMockDriver(MockDriver):
+    """
+    Mock driver which reports ETags of the index data and counts reads
+    """
+
+    def __init__(self):
+        super(ETagMockDriver, self).__init__()
+        self.read_count = 0
+
+    def read_index(self, artifact_id):
+        self.read_count += 1
+        return super(ETagMockDriver, self).read_index(artifact_id)
+
+    def index_etag(self, artifact_id):
+        return str(hash(self.index_data[artifact_id]))
 
 
 class TestRepository(unittest.TestCase):
@@ -82,11 +104,86 @@ class TestRepository(unittest.TestCase):
         r.load('art-test')
         self.assertEqual(r.artifacts, {'art-test': []})
 
+    def test_load_unchanged(self):
+        r = Repository(ETagMockDriver(), 'com.github.mogproject')
+        r.artifacts['art-test'] += self.artifacts_for_test[:2]
+        r.save('art-test')
+
+        loaded = r.artifacts['art-test']
+        r.load('art-test')
+        self.assertTrue(r.artifacts['art-test'] is loaded)
+        r.load_all()
+        self.assertTrue(r.artifacts['art-test'][0] is loaded[0])
+        self.assertEqual(r.driver.read_count, 2)
+
+        # changed by another client
+        r.driver.write_index('art-test', json.dumps([self.artifacts_for_test[2].to_dict()]))
+        r.load('art-test')
+        self.assertEqual(r.artifacts['art-test'], [self.artifacts_for_test[2]])
+
+        # modified but not saved
+        r.driver.uploaded_data[self.artifacts_for_test[2].s3_path()] = ('x', 'ffffeeeeddddccccbbbbaaaa99998888')
+        r.delete('art-test-0.0.2.jar', 125)
+        self.assertEqual(r.artifacts['art-test'], [])
+        r.load('art-test')
+        self.assertEqual(r.artifacts['art-test'], [self.artifacts_for_test[2]])
+
+    def test_load_materializes_only_accessed(self):
+        r = self.__mock_repo()
+        xs = [Artifact(BasicInfo('com.github.mogproject', 'art-test', '0.0.1', 'jar', i),
+                       FileInfo('host1', 'user1', 100 + i, datetime(2014, 12, 31, 9, 12, 34), '%032x' % i))
+              for i in range(1, 101)]
+        r.driver.write_index('art-test', indexformat.encode(xs))
+        r.load('art-test')
+
+        def materialized():
+            return [x for x in r.artifacts['art-test'] if 'basic_info' in x.__dict__]
+
+        self.assertEqual(materialized(), [])
+        self.assertEqual(r.get_artifact('art-test-0.0.1.jar'), xs[-1])
+        self.assertEqual(r.get_artifact('art-test-0.0.1.jar', 50), xs[49])
+        self.assertEqual(len(materialized()), 2)
+
+        # saving writes back the records as read
+        art = Artifact(BasicInfo('com.github.mogproject', 'art-test', '0.0.1', 'jar', None),
+                       FileInfo('host1', 'user1', 1, datetime(2015, 1, 1), 'ffffeeeeddddccccbbbbaaaa99998888'))
+        art = r.upload('/path/to/art-test-0.0.1.jar', art)
+        r.save('art-test')
+        self.assertEqual(art.basic_info.revision, 101)
+        self.assertEqual(len(materialized()), 3)
+        self.assertEqual(json.loads(r.driver.index_data['art-test']), [x.to_dict() for x in xs + [art]])
+
     def test_load_all(self):
         r = self.__mock_repo()
         r.load_all()
         self.assertEqual(r.artifacts, {})
 
+    def test_load_all_concurrently(self):
+        r = self.__mock_repo()
+        for i in range(20):
+            art = Artifact(BasicInfo('com.github.mogproject', 'art-test%02d' % i, '0.0.1', 'jar', 1),
+                           self.artifacts_for_test[0].file_info, self.artifacts_for_test[0].scm_info)
+            r.artifacts = {'art-test%02d' % i: [art]}
+            r.save('art-test%02d' % i)
+
+        for jobs in [None, 1, 4, 100]:
+            r.artifacts = {}
+            r.load_all(jobs)
+            self.assertEqual(sorted(r.artifacts.keys()), ['art-test%02d' % i for i in range(20)])
+            self.assertEqual(r.artifacts['art-test07'][0].basic_info.artifact_id, 'art-test07')
+            self.assertEqual(len(r.artifacts['art-test07']), 1)
+
+    def test_load_all_error(self):
+        r = self.__mock_repo()
+        r.artifacts['art-test'] += self.artifacts_for_test
+        r.save('art-test')
+        r.driver.write_index('art-broken1', '[{"broken": 1}]')
+        r.driver.write_index('art-broken2', 'xxx')
+
+        r.artifacts = {}
+        self.assertRaises(KeyError, r.load_all, 4)
+        self.assertEqual(r.artifacts, {})
+
     def test_save(self):
         r = self.__mock_repo()
         r.artifacts['art-test'] += self.artifacts_for_test
@@ -96,6 +193,684 @@ class TestRepository(unittest.TestCase):
         r.load_all()
         self.assertEqual(r.artifacts, {'art-test': self.artifacts_for_test})
 
+    def test_save_compact(self):
+        r = Repository(MockDriver(), 'com.github.mogproject', index_format='compact')
+        r.artifacts['art-test'] += self.artifacts_for_test
+        r.save('art-test')
+        self.assertTrue(r.driver.index_data['art-test'].startswith(b'\x89ARTIDX'))
+        self.assertEqual(r.index_format_of('art-test'), 'compact')
+
+        # the format is detected on load and kept on save
+        r2 = self.__mock_repo()
+        r2.driver = r.driver
+        r2.load_all()
+        self.assertEqual(r2.artifacts, {'art-test': self.artifacts_for_test})
+        self.assertEqual(r2.index_format_of('art-test'), 'compact')
+        r2.save('art-test')
+        self.assertTrue(r2.driver.index_data['art-test'].startswith(b'\x89ARTIDX'))
+
+        r2.save('art-test', 'json')
+        self.assertEqual(json.loads(r2.driver.index_data['art-test']), [x.to_dict() for x in self.artifacts_for_test])
+        self.assertEqual(r2.index_format_of('art-test'), 'json')
+        self.assertEqual(r2.index_format_of('art-other'), 'json')
+
+    #
+    # journal
+    #
+    def _journal_repo(self, driver=None):
+        return Repository(driver or MockDriver(), 'com.github.mogproject', journal=True)
+
+    def test_save_journal(self):
+        r = self._journal_repo()
+        r.load('art-test')
+        r.upload('/path/to/art-test-0.0.1.jar', self.artifacts_for_test[0])
+        r.save('art-test')  # the base index is written first
+        base = r.driver.index_data['art-test']
+        self.assertEqual(r.driver.delta_names(), {})
+
+        r.upload('/path/to/art-test-0.0.2.jar', self.artifacts_for_test[2])
+        r.upload('/path/to/art-test-0.0.1.jar', self.artifacts_for_test[1])
+        r.save('art-test')
+        r.save('art-test')  # nothing to write
+        self.assertEqual(r.driver.index_data['art-test'], base)
+        self.assertEqual(len(r.driver.delta_names('art-test')), 1)
+
+        r.delete('art-test-0.0.1.jar', 1)
+        r.save('art-test')
+        self.assertEqual(len(r.driver.delta_names('art-test')), 2)
+
+        r2 = self.__mock_repo()
+        r2.driver = r.driver
+        r2.load_all()
+        self.assertEqual(r2.artifacts, r.artifacts)
+        self.assertEqual([(x.basic_info.version, x.basic_info.revision) for x in r2.artifacts['art-test']],
+                         [('0.0.2', 1), ('0.0.1', 2)])
+
+        # saving the whole index folds the deltas
+        r2.upload('/path/to/art-test-0.0.2.jar', self.artifacts_for_test[6], force=True)
+        r2.save('art-test')
+        self.assertEqual(r.driver.delta_names(), {})
+        r.load('art-test')
+        self.assertEqual(r.artifacts, r2.artifacts)
+
+    def test_save_journal_concurrent_writers(self):
+        r1, r2 = self._journal_repo(), self._journal_repo()
+        r2.driver = r1.driver
+        r1.load('art-test')
+        r1.upload('/path/to/art-test-0.0.1.jar', self.artifacts_for_test[0])
+        r1.save('art-test')
+
+        r1.load('art-test')
+        r2.load('art-test')
+        r1.upload('/path/to/art-test-0.0.2.jar', self.artifacts_for_test[2])
+        r2.upload('/path/to/art-test-0.0.1.jar', self.artifacts_for_test[1])
+        r1.save('art-test')
+        r2.save('art-test')
+
+        # neither entry is lost
+        r1.load('art-test')
+        self.assertEqual(sorted((x.basic_info.version, x.basic_info.revision) for x in r1.artifacts['art-test']),
+                         [('0.0.1', 1), ('0.0.1', 2), ('0.0.2', 1)])
+
+    def test_save_journal_clock_behind(self):
+        r1, r2 = self._journal_repo(), self._journal_repo()
+        r2.driver = r1.driver
+        r1.load('art-test')
+        r1.upload('/path/to/art-test-0.0.1.jar', self.artifacts_for_test[0])
+        r1.save('art-test')
+        r1.upload('/path/to/art-test-0.0.1.jar', self.artifacts_for_test[1])
+        r1.save('art-test')
+
+        # the delete is merged after the add even though the clock of its writer lags
+        r2.load('art-test')
+        with mock.patch('artifactcli.driver.basedriver.time.time', return_value=0):
+            r2.delete('art-test-0.0.1.jar', 2)
+            r2.save('art-test')
+        r1.load('art-test')
+        self.assertEqual([x.basic_info.revision for x in r1.artifacts['art-test']], [1])
+
+    def test_upload_journal_same_version(self):
+        r1, r2 = self._journal_repo(), self._journal_repo()
+        r2.driver = r1.driver
+        r1.load('art-test')
+        r2.load('art-test')
+
+        # both see revision 1 as available, but only one of them can take it
+        a = r1.upload('/path/to/a/art-test-0.0.1.jar', self._new_file('art-test', '%032x' % 1))
+        b = r2.upload('/path/to/b/art-test-0.0.1.jar', self._new_file('art-test', '%032x' % 2))
+        r1.save('art-test')
+        r2.save('art-test')
+        self.assertEqual((a.basic_info.revision, b.basic_info.revision), (1, 2))
+        self.assertEqual(r1.driver.uploaded_data, {
+            'com.github.mogproject/art-test/0.0.1/1/art-test-0.0.1.jar': ('/path/to/a/art-test-0.0.1.jar', '%032x' % 1),
+            'com.github.mogproject/art-test/0.0.1/2/art-test-0.0.1.jar': ('/path/to/b/art-test-0.0.1.jar', '%032x' % 2),
+        })
+
+        r1.load('art-test')
+        self.assertEqual([(x.basic_info.revision, x.file_info.md5) for x in r1.artifacts['art-test']],
+                         [(1, '%032x' % 1), (2, '%032x' % 2)])
+        r1.upload('/path/to/art-test-0.0.1.jar', self._new_file('art-test', '%032x' % 3))
+        self.assertEqual(r1.artifacts.find_latest('art-test', '0.0.1', 'jar')[0].basic_info.revision, 3)
+
+    def test_upload_journal_contention(self):
+        driver = MockDriver()
+
+        def upload(i):
+            r = self._journal_repo(driver)
+            r.load('art-test')
+            art = r.upload('/path/to/art-test-0.0.1.jar', self._new_file('art-test', '%032x' % i))
+            r.save('art-test')
+            return art.basic_info.revision
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            revisions = list(executor.map(upload, range(32)))
+
+        self.assertEqual(sorted(revisions), list(range(1, 33)))
+        r = self._journal_repo(driver)
+        r.load('art-test')
+        self.assertEqual(sorted(x.basic_info.revision for x in r.artifacts['art-test']), list(range(1, 33)))
+
+    def test_save_journal_compaction(self):
+        r = self._journal_repo()
+        r.load('art-test')
+        r.upload('/path/to/art-test-0.0.1.jar', self.artifacts_for_test[0])
+        r.save('art-test')
+
+        with mock.patch('artifactcli.repository.JOURNAL_COMPACT_THRESHOLD', 3):
+            for i, n in enumerate([1, 2, 0, 1]):
+                r.upload('/path/to/art-test-0.0.1.jar', self.artifacts_for_test[0], force=True)
+                r.save('art-test')
+                self.assertEqual(len(r.driver.delta_names('art-test')), n)
+
+        r2 = self.__mock_repo()
+        r2.driver = r.driver
+        r2.load('art-test')
+        self.assertEqual([x.basic_info.revision for x in r2.artifacts['art-test']], [1, 2, 3, 4, 5])
+
+    def _journal_with_deltas(self):
+        # a base index with two deltas
+        r = self._journal_repo()
+        r.load('art-test')
+        r.upload('/path/to/art-test-0.0.1.jar', self.artifacts_for_test[0])
+        r.save('art-test')
+        for i in [1, 2]:
+            r.upload('/path/to/art-test-0.0.1.jar', self._new_file('art-test', '%032x' % i))
+            r.save('art-test')
+        self.assertEqual(len(r.driver.delta_names('art-test')), 2)
+        return r
+
+    def _reader_with_hook(self, driver, method, hook):
+        # another client of the same storage, which runs the hook once right after the method
+        d = copy.copy(driver)
+        d.index_etags = {}
+        original = getattr(d, method)
+        calls = []
+
+        def f(*args, **kwargs):
+            ret = original(*args, **kwargs)
+            if not calls:
+                calls.append(args)
+                hook()
+            return ret
+
+        setattr(d, method, f)
+        return self._journal_repo(d)
+
+    def test_load_compacted_after_listing_deltas(self):
+        for load in ['load', 'load_all']:
+            w = self._journal_with_deltas()
+            r = self._reader_with_hook(w.driver, 'delta_names', lambda: w.compact('art-test'))
+            getattr(r, load)() if load == 'load_all' else r.load('art-test')
+            self.assertEqual(w.driver.delta_names(), {})
+            self.assertEqual(sorted(x.basic_info.revision for x in r.artifacts['art-test']), [1, 2, 3])
+
+    def test_load_compacted_after_reading_index(self):
+        for load in ['load', 'load_all']:
+            w = self._journal_with_deltas()
+            r = self._reader_with_hook(w.driver, 'read_index', lambda: w.compact('art-test'))
+            getattr(r, load)() if load == 'load_all' else r.load('art-test')
+            self.assertEqual(w.driver.delta_names(), {})
+            self.assertEqual(sorted(x.basic_info.revision for x in r.artifacts['art-test']), [1, 2, 3])
+
+            # the deleted deltas are not loaded, so that they are not deleted again
+            r.upload('/path/to/art-test-0.0.1.jar', self._new_file('art-test', '%032x' % 3))
+            r.save('art-test')
+            self.assertEqual(len(r.driver.delta_names('art-test')), 1)
+            w.load('art-test')
+            self.assertEqual(sorted(x.basic_info.revision for x in w.artifacts['art-test']), [1, 2, 3, 4])
+
+    def test_compact(self):
+        r = self._journal_repo()
+        r.load('art-test')
+        r.upload('/path/to/art-test-0.0.1.jar', self.artifacts_for_test[0])
+        r.save('art-test')
+        r.upload('/path/to/art-test-0.0.2.jar', self.artifacts_for_test[2])
+        r.save('art-test')
+
+        self.assertEqual(r.compact('art-test'), 1)
+        self.assertEqual(r.driver.delta_names(), {})
+        self.assertEqual(indexformat.decode(r.driver.index_data['art-test']), r.artifacts['art-test'])
+        self.assertEqual(r.compact('art-test'), 0)
+
+    def test_load_folded_deltas(self):
+        # deltas which are folded into the base index but not deleted yet
+        r = self._journal_repo()
+        r.load('art-test')
+        r.upload('/path/to/art-test-0.0.1.jar', self.artifacts_for_test[0])
+        r.save('art-test')
+        r.upload('/path/to/art-test-0.0.1.jar', self.artifacts_for_test[1], force=True)
+        r.delete('art-test-0.0.1.jar', 1)
+        r.save('art-test')
+        deltas = dict(r.driver.delta_data['art-test'])
+        r.compact('art-test')
+        r.driver.delta_data['art-test'] = deltas
+
+        r.load('art-test')
+        self.assertEqual([x.basic_info.revision for x in r.artifacts['art-test']], [2])
+
+    def test_load_unknown_delta(self):
+        r = self.__mock_repo()
+        r.driver.write_index('art-test', '[]')
+        r.driver.append_delta('art-test', '{"ops": [["xxx", 1]]}')
+        self.assertRaises(ValueError, r.load, 'art-test')
+
+    #
+    # concurrency
+    #
+    def _artifact(self, artifact_id, revision=1):
+        x = self.artifacts_for_test[0]
+        return Artifact(BasicInfo('com.github.mogproject', artifact_id, '0.0.1', 'jar', revision),
+                        x.file_info, x.scm_info)
+
+    def test_snapshot_is_not_modified(self):
+        r = self.__mock_repo()
+        r.upload('/path/to/art-test-0.0.1.jar', self.artifacts_for_test[0])
+        r.upload('/path/to/art-test-0.0.2.jar', self.artifacts_for_test[2])
+        snapshot = r.snapshot()
+        expected = copy.deepcopy(snapshot)
+
+        r.upload('/path/to/art-test-0.0.1.jar', self.artifacts_for_test[1], force=True)
+        r.migrate('art-test')
+        r.delete('art-test-0.0.1.jar', 1)
+        r.upload('/path/to/art-other-0.0.1.jar', self._artifact('art-other'))
+
+        self.assertEqual(snapshot, expected)
+        self.assertEqual(snapshot.find_latest('art-test', '0.0.1', 'jar')[0].location, None)
+        self.assertEqual(r.artifacts.find_latest('art-test', '0.0.1', 'jar')[0].basic_info.revision, 2)
+        self.assertEqual(sorted(r.artifacts.keys()), ['art-other', 'art-test'])
+
+    def test_concurrent_uploads(self):
+        r = self.__mock_repo()
+        artifact_ids = ['art-test%d' % i for i in range(8)]
+        stopped = threading.Event()
+
+        def read():
+            count = 0
+            while not stopped.is_set():
+                r.print_list(output='json', fp=StringIO())
+                count += 1
+            return count
+
+        def upload(artifact_id):
+            return [r.upload('/path/to/%s-0.0.1.jar' % artifact_id, self._artifact(artifact_id), force=True)
+                    for _ in range(10)]
+
+        with ThreadPoolExecutor(max_workers=len(artifact_ids) * 2 + 2) as executor:
+            readers = [executor.submit(read) for _ in range(2)]
+            results = list(executor.map(upload, artifact_ids * 2))
+            stopped.set()
+            self.assertTrue(all(f.result() > 0 for f in readers))
+
+        for artifact_id in artifact_ids:
+            revisions = [x.basic_info.revision for x in r.artifacts[artifact_id]]
+            self.assertEqual(sorted(revisions), list(range(1, 21)))
+        self.assertEqual(sum(len(xs) for xs in results), 160)
+
+    def test_lock_per_artifact_id(self):
+        r = self.__mock_repo()
+        r.upload('/path/to/art-a-0.0.1.jar', self._artifact('art-a'))
+
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            with r.lock('art-a'):
+                blocked = executor.submit(r.upload, '/path/to/art-a-0.0.1.jar', self._artifact('art-a'), force=True)
+                other = executor.submit(r.upload, '/path/to/art-b-0.0.1.jar', self._artifact('art-b'))
+
+                # the other artifact id and readers are not blocked
+                self.assertEqual(other.result(timeout=10).basic_info.revision, 1)
+                r.print_list(fp=StringIO())
+                self.assertEqual(r.get_artifact('art-b-0.0.1.jar').basic_info.artifact_id, 'art-b')
+                self.assertFalse(blocked.done())
+            self.assertEqual(blocked.result(timeout=10).basic_info.revision, 2)
+
+    def test_load_all_keeps_concurrent_changes(self):
+        r = self.__mock_repo()
+        r.upload('/path/to/art-a-0.0.1.jar', self._artifact('art-a'))
+        r.save('art-a')
+        r.driver.write_index('art-b', '[]')
+
+        # another thread uploads while art-b is being loaded
+        original = r.driver.read_index
+
+        def read_index(artifact_id):
+            if artifact_id == 'art-b':
+                with ThreadPoolExecutor(max_workers=1) as executor:
+                    executor.submit(r.upload, '/path/to/art-a-0.0.1.jar', self._artifact('art-a'), force=True).result()
+            return original(artifact_id)
+
+        r.driver.read_index = read_index
+        r.load_all(1)
+        self.assertEqual([x.basic_info.revision for x in r.artifacts['art-a']], [1, 2])
+        self.assertEqual(r.artifacts['art-b'], [])
+
+    #
+    # optimistic concurrency
+    #
+    def _new_file(self, artifact_id, md5):
+        art = self._artifact(artifact_id)
+        art.file_info = FileInfo('host1', 'user1', 11, datetime(2014, 12, 31, 9, 12, 34), md5)
+        return art
+
+    def test_upload_conflict_renumbers_revision(self):
+        driver = MockDriver()
+        r1 = Repository(driver, 'com.github.mogproject')
+        r2 = Repository(driver, 'com.github.mogproject')
+        r1.load('art-test')
+        r2.load('art-test')
+
+        # both see revision 1 as available
+        a = r1.upload('/path/to/art-test-0.0.1.jar', self._new_file('art-test', '%032x' % 1))
+        b = r2.upload('/path/to/art-test-0.0.1.jar', self._new_file('art-test', '%032x' % 2))
+        r2.save('art-test')
+        self.assertEqual((a.basic_info.revision, b.basic_info.revision), (1, 2))
+        self.assertEqual(sorted(driver.uploaded_data.keys()),
+                         ['com.github.mogproject/art-test/0.0.1/1/art-test-0.0.1.jar',
+                          'com.github.mogproject/art-test/0.0.1/2/art-test-0.0.1.jar'])
+
+        r1.load('art-test')
+        self.assertEqual([(x.basic_info.revision, x.file_info.md5) for x in r1.artifacts['art-test']],
+                         [(1, '%032x' % 1), (2, '%032x' % 2)])
+        self.assertEqual(r2.artifacts, r1.artifacts)
+
+    def test_upload_contention(self):
+        driver = MockDriver()
+
+        def upload(i):
+            # another client of the same storage
+            d = copy.copy(driver)
+            d.index_etags = {}
+            r = Repository(d, 'com.github.mogproject')
+            r.load('art-test')
+            art = r.upload('/path/to/art-test-0.0.1.jar', self._new_file('art-test', '%032x' % i))
+            r.save('art-test')
+            return art.basic_info.revision
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            revisions = list(executor.map(upload, range(32)))
+
+        self.assertEqual(sorted(revisions), list(range(1, 33)))
+        r = self.__mock_repo()
+        r.driver = driver
+        r.load('art-test')
+        self.assertEqual(sorted(x.basic_info.revision for x in r.artifacts['art-test']), list(range(1, 33)))
+
+    def test_save_conflict_replays_delete(self):
+        driver = MockDriver()
+        r1 = Repository(driver, 'com.github.mogproject')
+        r1.load('art-test')
+        r1.upload('/path/to/art-test-0.0.1.jar', self._new_file('art-test', '%032x' % 1))
+        r2 = Repository(driver, 'com.github.mogproject')
+        r2.load('art-test')
+
+        r1.upload('/path/to/art-test-0.0.1.jar', self._new_file('art-test', '%032x' % 2))
+        r2.delete('art-test-0.0.1.jar', 1)
+        r2.save('art-test')
+        self.assertEqual([x.basic_info.revision for x in r2.artifacts['art-test']], [2])
+
+        r1.load('art-test')
+        self.assertEqual([x.basic_info.revision for x in r1.artifacts['art-test']], [2])
+
+    def test_save_conflict_error(self):
+        driver = MockDriver()
+        r1 = Repository(driver, 'com.github.mogproject')
+        r1.load('art-test')
+        r1.upload('/path/to/art-test-0.0.1.jar', self._new_file('art-test', '%032x' % 0))
+        r2 = Repository(driver, 'com.github.mogproject')
+        r2.load('art-test')
+
+        # migration cannot be replayed on the index modified by others
+        r1.migrate('art-test')
+        r2.upload('/path/to/art-test-0.0.1.jar', self._new_file('art-test', '%032x' % 1))
+        self.assertRaises(ValueError, r1.save, 'art-test')
+
+        # too many conflicts
+        r2.upload('/path/to/art-test-0.0.1.jar', self._new_file('art-test', '%032x' % 2))
+        with mock.patch.object(driver, 'write_index', return_value=False) as m, \
+                mock.patch('artifactcli.repository.time.sleep') as sleep:
+            self.assertRaises(ValueError, r2.upload, '/path/to/art-test-0.0.1.jar',
+                              self._new_file('art-test', '%032x' % 3))
+            self.assertEqual(m.call_count, 10)
+            self.assertEqual(sleep.call_count, 10)
+
+    def test_save_unchanged(self):
+        r = self.__mock_repo()
+        r.load('art-test')
+        r.upload('/path/to/art-test-0.0.1.jar', self._new_file('art-test', '%032x' % 1))
+        with mock.patch.object(r.driver, 'write_index') as m:
+            r.save('art-test')
+            r.load('art-test')
+            r.save('art-test')
+            self.assertEqual(m.call_count, 0)
+            r.save('art-test', 'compact')
+            self.assertEqual(m.call_count, 1)
+
+    def test_upload_failure_removes_reserved_revision(self):
+        r = self.__mock_repo()
+        r.load('art-test')
+        r.upload('/path/to/art-test-0.0.1.jar', self._new_file('art-test', '%032x' % 1))
+
+        with mock.patch.object(r.driver, 'upload', side_effect=IOError('network error')):
+            self.assertRaises(IOError, r.upload, '/path/to/art-test-0.0.1.jar',
+                              self._new_file('art-test', '%032x' % 2))
+        self.assertEqual([x.basic_info.revision for x in r.artifacts['art-test']], [1])
+        self.assertEqual(indexformat.decode(r.driver.index_data['art-test']), r.artifacts['art-test'])
+        self.assertEqual(r.driver.revision_data, set([('art-test', '0.0.1', 'jar', 1)]))
+
+    def test_upload_crash_leaves_no_index_entry(self):
+        r = self.__mock_repo()
+        r.load('art-test')
+        r.upload('/path/to/art-test-0.0.1.jar', self._new_file('art-test', '%032x' % 1))
+        index = r.driver.index_data['art-test']
+
+        # killed while uploading the file
+        with mock.patch.object(r.driver, 'upload', side_effect=KeyboardInterrupt), \
+                mock.patch.object(r.driver, 'write_index') as m:
+            self.assertRaises(KeyboardInterrupt, r.upload, '/path/to/art-test-0.0.1.jar',
+                              self._new_file('art-test', '%032x' % 2))
+            self.assertEqual(m.call_count, 0)
+        self.assertEqual(r.driver.index_data['art-test'], index)
+
+    def test_upload_index_failure_removes_file(self):
+        r = self.__mock_repo()
+        r.load('art-test')
+        r.upload('/path/to/art-test-0.0.1.jar', self._new_file('art-test', '%032x' % 1))
+
+        with mock.patch.object(r.driver, 'write_index', return_value=False), \
+                mock.patch('artifactcli.repository.time.sleep'):
+            self.assertRaises(ValueError, r.upload, '/path/to/art-test-0.0.1.jar',
+                              self._new_file('art-test', '%032x' % 2))
+        self.assertEqual([x.basic_info.revision for x in r.artifacts['art-test']], [1])
+        self.assertEqual(list(r.driver.uploaded_data.keys()),
+                         ['com.github.mogproject/art-test/0.0.1/1/art-test-0.0.1.jar'])
+
+        # the revision can be taken again
+        art = r.upload('/path/to/art-test-0.0.1.jar', self._new_file('art-test', '%032x' % 2))
+        self.assertEqual(art.basic_info.revision, 2)
+        r.load('art-test')
+        self.assertEqual([x.basic_info.revision for x in r.artifacts['art-test']], [1, 2])
+
+    def test_upload_revision_taken_by_older_client(self):
+        r = self.__mock_repo()
+        r.load('art-test')
+        a = r.upload('/path/to/art-test-0.0.1.jar', self._new_file('art-test', '%032x' % 1))
+
+        # older clients write the index and the file without reserving the revision
+        b = self._new_file('art-test', '%032x' % 2)
+        b.basic_info.revision = 2
+        r.driver.write_index('art-test', indexformat.encode([a, b], 'json'))
+        r.driver.upload('/path/to/old/art-test-0.0.1.jar', b.s3_path(), b.file_info.md5)
+
+        c = r.upload('/path/to/new/art-test-0.0.1.jar', self._new_file('art-test', '%032x' % 3))
+        self.assertEqual(c.basic_info.revision, 3)
+        path = 'com.github.mogproject/art-test/0.0.1/%d/art-test-0.0.1.jar'
+        self.assertEqual(r.driver.uploaded_data, {
+            path % 1: ('/path/to/art-test-0.0.1.jar', '%032x' % 1),
+            path % 2: ('/path/to/old/art-test-0.0.1.jar', '%032x' % 2),
+            path % 3: ('/path/to/new/art-test-0.0.1.jar', '%032x' % 3),
+        })
+        r.load('art-test')
+        self.assertEqual([x.basic_info.revision for x in r.artifacts['art-test']], [1, 2, 3])
+
+    def _upload_raced_by_older_client(self, r, a):
+        # an older client writes the index entry of revision 2 right after the file has been uploaded
+        b = self._new_file('art-test', '%032x' % 2)
+        b.basic_info.revision = 2
+        upload = r.driver.upload
+        write_index = r.driver.write_index
+
+        def f(*args, **kwargs):
+            upload(*args, **kwargs)
+            write_index('art-test', indexformat.encode([a, b], 'json'))
+
+        return mock.patch.object(r.driver, 'upload', side_effect=f)
+
+    def test_upload_renumbered_after_upload(self):
+        r = self.__mock_repo()
+        r.load('art-test')
+        a = r.upload('/path/to/art-test-0.0.1.jar', self._new_file('art-test', '%032x' % 1))
+
+        with self._upload_raced_by_older_client(r, a), mock.patch.object(r.driver, 'copy', wraps=r.driver.copy) as m:
+            c = r.upload('/path/to/new/art-test-0.0.1.jar', self._new_file('art-test', '%032x' % 3))
+        self.assertEqual(c.basic_info.revision, 3)
+        path = 'com.github.mogproject/art-test/0.0.1/%d/art-test-0.0.1.jar'
+        m.assert_called_once_with(path % 2, path % 3, '%032x' % 3)
+        self.assertEqual(r.driver.uploaded_data[path % 3], ('/path/to/new/art-test-0.0.1.jar', '%032x' % 3))
+        r.load('art-test')
+        self.assertEqual([x.basic_info.revision for x in r.artifacts['art-test']], [1, 2, 3])
+
+    def test_upload_renumbered_failure_releases_revisions(self):
+        r = self.__mock_repo()
+        r.load('art-test')
+        a = r.upload('/path/to/art-test-0.0.1.jar', self._new_file('art-test', '%032x' % 1))
+
+        with self._upload_raced_by_older_client(r, a), \
+                mock.patch.object(r.driver, 'write_index', return_value=False), \
+                mock.patch('artifactcli.repository.time.sleep'):
+            self.assertRaises(ValueError, r.upload, '/path/to/new/art-test-0.0.1.jar',
+                              self._new_file('art-test', '%032x' % 3))
+        self.assertEqual(r.driver.revision_data, set([('art-test', '0.0.1', 'jar', 1)]))
+        self.assertFalse(r.driver.exists('com.github.mogproject/art-test/0.0.1/3/art-test-0.0.1.jar', None))
+
+    #
+    # latest pointer
+    #
+    def _latest_revision(self, driver, version='0.0.1'):
+        s = driver.latest_data.get(('art-test', version, 'jar'))
+        return s and Artifact.from_dict(json.loads(s)).basic_info.revision
+
+    def test_latest_pointer(self):
+        r = self.__mock_repo()
+        r.load('art-test')
+        r.upload('/path/to/art-test-0.0.1.jar', self._new_file('art-test', '%032x' % 1))
+        r.upload('/path/to/art-test-0.0.1.jar', self._new_file('art-test', '%032x' % 2))
+        r.save('art-test')
+        self.assertEqual(self._latest_revision(r.driver), 2)
+        self.assertEqual(r.read_latest('art-test-0.0.1.jar'), r.get_artifact('art-test-0.0.1.jar'))
+        self.assertEqual(r.read_latest('art-test-0.0.2.jar'), None)
+
+        r.delete('art-test-0.0.1.jar', 2)
+        r.save('art-test')
+        self.assertEqual(self._latest_revision(r.driver), 1)
+        r.delete('art-test-0.0.1.jar', 1)
+        r.save('art-test')
+        self.assertEqual(r.driver.latest_data, {})
+
+    def test_latest_pointer_journal(self):
+        r = Repository(MockDriver(), 'com.github.mogproject', journal=True)
+        r.load('art-test')
+        r.upload('/path/to/art-test-0.0.1.jar', self._new_file('art-test', '%032x' % 1))
+        r.upload('/path/to/art-test-0.0.1.jar', self._new_file('art-test', '%032x' % 2))
+        self.assertEqual(r.driver.latest_data, {})
+        r.save('art-test')
+        self.assertEqual(self._latest_revision(r.driver), 2)
+
+    def test_latest_pointer_not_lowered(self):
+        r = self.__mock_repo()
+        higher = self._new_file('art-test', '%032x' % 9)
+        higher.basic_info.revision = 3
+        r.driver.write_latest('art-test', '0.0.1', 'jar', json.dumps(higher.to_dict()))
+
+        # uploaded by others meanwhile
+        r.load('art-test')
+        r.upload('/path/to/art-test-0.0.1.jar', self._new_file('art-test', '%032x' % 1))
+        self.assertEqual(self._latest_revision(r.driver), 3)
+
+        # deletion moves the pointer to the latest revision in the index
+        r.upload('/path/to/art-test-0.0.1.jar', self._new_file('art-test', '%032x' % 2))
+        r.delete('art-test-0.0.1.jar', 2)
+        r.save('art-test')
+        self.assertEqual(self._latest_revision(r.driver), 1)
+
+    def test_latest_pointer_race(self):
+        r = self.__mock_repo()
+        r.load('art-test')
+        r.upload('/path/to/art-test-0.0.1.jar', self._new_file('art-test', '%032x' % 1))
+        higher = self._new_file('art-test', '%032x' % 9)
+        higher.basic_info.revision = 3
+        read_latest = r.driver.read_latest
+
+        def f(*args, **kwargs):
+            # another client uploads a higher revision right after the pointer is read
+            ret = read_latest(*args, **kwargs)
+            if m.call_count == 1:
+                r.driver.reserve_revision('art-test', '0.0.1', 'jar', 3)
+                r.driver.write_latest('art-test', '0.0.1', 'jar', json.dumps(higher.to_dict()))
+            return ret
+
+        with mock.patch.object(r.driver, 'read_latest', side_effect=f) as m:
+            r.upload('/path/to/art-test-0.0.1.jar', self._new_file('art-test', '%032x' % 2))
+            self.assertEqual(m.call_count, 2)
+        self.assertEqual(self._latest_revision(r.driver), 3)
+
+        # deletion does not lower the pointer from a revision whose marker exists
+        r.delete('art-test-0.0.1.jar', 2)
+        r.save('art-test')
+        self.assertEqual(self._latest_revision(r.driver), 3)
+
+        # but does once the revision has been deleted
+        r.driver.release_revision('art-test', '0.0.1', 'jar', 3)
+        r.delete('art-test-0.0.1.jar', 1)
+        r.save('art-test')
+        self.assertEqual(r.driver.latest_data, {})
+
+    def test_download_latest(self):
+        r = self.__mock_repo()
+        r.load('art-test')
+        r.upload('/path/to/art-test-0.0.1.jar', self._new_file('art-test', '%032x' % 1))
+        r.upload('/path/to/art-test-0.0.1.jar', self._new_file('art-test', '%032x' % 2))
+
+        other = Repository(r.driver, 'com.github.mogproject')
+        with mock.patch.object(r.driver, 'read_index') as m:
+            art = other.download_latest('/tmp/art-test-0.0.1.jar')
+            self.assertEqual(m.call_count, 0)
+        self.assertEqual(art.basic_info.revision, 2)
+        self.assertEqual(r.driver.downloaded_data, {
+            '/tmp/art-test-0.0.1.jar': ('com.github.mogproject/art-test/0.0.1/2/art-test-0.0.1.jar', '%032x' % 2)})
+
+        # the index is read when the pointer does not exist
+        r.driver.latest_data.clear()
+        self.assertEqual(other.download_latest('/tmp/art-test-0.0.1.jar', print_only=True).basic_info.revision, 2)
+        self.assertRaises(ValueError, other.download_latest, '/tmp/art-test-0.0.2.jar')
+
+    def test_download_latest_written_by_older_clients(self):
+        r = self.__mock_repo()
+        r.load('art-test')
+        a = r.upload('/path/to/art-test-0.0.1.jar', self._new_file('art-test', '%032x' % 1))
+        other = Repository(r.driver, 'com.github.mogproject')
+
+        # uploaded without updating the pointer
+        b = self._new_file('art-test', '%032x' % 2)
+        b.basic_info.revision = 2
+        r.driver.write_index('art-test', indexformat.encode([a, b], 'json'))
+        r.driver.upload('/path/to/art-test-0.0.1.jar', b.s3_path(), b.file_info.md5)
+        self.assertEqual(other.download_latest('/tmp/art-test-0.0.1.jar').basic_info.revision, 2)
+        self.assertEqual(other.download_latest('/tmp/art-test-0.0.1.jar', print_only=True).basic_info.revision, 2)
+
+        # deleted without updating the pointer
+        r.driver.latest_data.clear()
+        r.upload('/path/to/art-test-0.0.1.jar', self._new_file('art-test', '%032x' % 3))
+        r.driver.write_index('art-test', indexformat.encode([a, b], 'json'))
+        r.driver.delete('com.github.mogproject/art-test/0.0.1/3/art-test-0.0.1.jar', '%032x' % 3)
+        self.assertEqual(self._latest_revision(r.driver), 3)
+        self.assertEqual(other.download_latest('/tmp/art-test-0.0.1.jar').basic_info.revision, 2)
+        self.assertEqual(r.driver.downloaded_data, {
+            '/tmp/art-test-0.0.1.jar': ('com.github.mogproject/art-test/0.0.1/2/art-test-0.0.1.jar', '%032x' % 2)})
+
+    def test_download_latest_superseded_content_addressed(self):
+        r = Repository(MockDriver(), 'com.github.mogproject', content_addressed=True)
+        r.load('art-test')
+        a = r.upload('/path/to/art-test-0.0.1.jar', self._new_file('art-test', '%032x' % 1))
+        other = Repository(r.driver, 'com.github.mogproject')
+
+        # saved without updating the pointer; content-addressed files have nothing at the revision path
+        b = r.upload('/path/to/art-test-0.0.1.jar', self._new_file('art-test', '%032x' % 2))
+        r.driver.write_latest('art-test', '0.0.1', 'jar', json.dumps(a.to_dict()))
+        self.assertFalse(r.driver.exists(b.basic_info.s3_path(), None))
+        with mock.patch.object(r.driver, 'exists', wraps=r.driver.exists) as m:
+            art = other.download_latest('/tmp/art-test-0.0.1.jar')
+            self.assertEqual(m.call_count, 0)
+        self.assertEqual(art.basic_info.revision, 2)
+        self.assertEqual(r.driver.downloaded_data, {'/tmp/art-test-0.0.1.jar': (b.location, '%032x' % 2)})
+
     #
     # upload
     #
@@ -207,6 +982,50 @@ class TestRepository(unittest.TestCase):
 
         self.assertEqual(r.artifacts, {'art-test': expected})
 
+    def test_upload_content_addressed(self):
+        r = Repository(MockDriver(), 'com.github.mogproject', content_addressed=True)
+        r.upload('/path/to/art-test-0.0.1.jar', self.artifacts_for_test[0])
+        r.upload('/path/to/art-test-0.0.2.jar', self.artifacts_for_test[2])
+
+        # keyed by MD5 without SHA-256 digests, and transferred every time
+        blob = 'com.github.mogproject/.blobs/ffffeeeeddddccccbbbbaaaa99998888'
+        self.assertEqual(r.driver.uploaded_data, {
+            blob: ('/path/to/art-test-0.0.2.jar', 'ffffeeeeddddccccbbbbaaaa99998888')})
+        self.assertEqual([x.location for x in r.artifacts['art-test']], [blob, blob])
+
+        r.save('art-test')
+        r.artifacts = {}
+        r.load('art-test')
+        self.assertEqual([x.location for x in r.artifacts['art-test']], [blob, blob])
+
+        r.download('/tmp/art-test-0.0.2.jar', 1)
+        self.assertEqual(r.driver.downloaded_data, {
+            '/tmp/art-test-0.0.2.jar': (blob, 'ffffeeeeddddccccbbbbaaaa99998888')})
+
+    def test_upload_content_addressed_sha256(self):
+        r = Repository(MockDriver(), 'com.github.mogproject', content_addressed=True)
+        sha256 = 'ab' * 32
+        arts = [Artifact(BasicInfo('com.github.mogproject', 'art-test', v, 'jar', None),
+                         FileInfo('host1', 'user1', 4567890, datetime(2014, 12, 31, 9, 12, 34),
+                                  'ffffeeeeddddccccbbbbaaaa99998888', sha256)) for v in ['0.0.1', '0.0.2']]
+        r.upload('/path/to/art-test-0.0.1.jar', arts[0])
+        r.upload('/path/to/art-test-0.0.2.jar', arts[1])
+
+        # stored once at the SHA-256 key
+        blob = 'com.github.mogproject/.blobs/' + sha256
+        self.assertEqual(r.driver.uploaded_data, {
+            blob: ('/path/to/art-test-0.0.1.jar', 'ffffeeeeddddccccbbbbaaaa99998888')})
+        self.assertEqual([x.location for x in r.artifacts['art-test']], [blob, blob])
+
+    def test_upload_content_addressed_md5_not_trusted(self):
+        r = Repository(MockDriver(), 'com.github.mogproject', content_addressed=True)
+        blob = 'com.github.mogproject/.blobs/ffffeeeeddddccccbbbbaaaa99998888'
+        r.driver.uploaded_data[blob] = ('/path/to/planted.jar', 'ffffeeeeddddccccbbbbaaaa99998888')
+
+        r.upload('/path/to/art-test-0.0.1.jar', self.artifacts_for_test[0])
+        self.assertEqual(r.driver.uploaded_data, {
+            blob: ('/path/to/art-test-0.0.1.jar', 'ffffeeeeddddccccbbbbaaaa99998888')})
+
     #
     # download
     #
@@ -310,6 +1129,45 @@ class TestRepository(unittest.TestCase):
         ]
         self.assertEqual(r.artifacts, {'art-test': expected})
 
+    def test_delete_content_addressed(self):
+        blob = 'com.github.mogproject/.blobs/ffffeeeeddddccccbbbbaaaa99998888'
+        r = Repository(MockDriver(), 'com.github.mogproject', content_addressed=True)
+        r.upload('/path/to/art-test-0.0.1.jar', self.artifacts_for_test[0])
+        r.upload('/path/to/art-test-0.0.2.jar', self.artifacts_for_test[2])
+        r.save('art-test')
+
+        # shared by the other artifact id
+        other = Artifact(BasicInfo('com.github.mogproject', 'art-other', '0.0.1', 'jar', 1),
+                         self.artifacts_for_test[0].file_info, None, blob)
+        r.driver.write_index('art-other', json.dumps([other.to_dict()]))
+
+        r.delete('art-test-0.0.1.jar', 1)
+        r.delete('art-test-0.0.2.jar', 1)
+        self.assertEqual(list(r.driver.uploaded_data.keys()), [blob])
+
+        r.driver.write_index('art-other', '')
+        r.upload('/path/to/art-test-0.0.1.jar', self.artifacts_for_test[0])
+        r.delete('art-test-0.0.1.jar', 1)
+        self.assertEqual(r.driver.uploaded_data, {})
+
+    def test_migrate(self):
+        blob = 'com.github.mogproject/.blobs/ffffeeeeddddccccbbbbaaaa99998888'
+        r = self.__mock_repo()
+        r.upload('/path/to/art-test-0.0.1.jar', self.artifacts_for_test[0])
+        r.upload('/path/to/art-test-0.0.2.jar', self.artifacts_for_test[2])
+
+        self.assertEqual(r.migrate('art-test', print_only=True), 2)
+        self.assertEqual([x.location for x in r.artifacts['art-test']], [None, None])
+
+        self.assertEqual(r.migrate('art-test'), 2)
+        self.assertEqual([x.location for x in r.artifacts['art-test']], [blob, blob])
+        self.assertEqual(sorted(r.driver.uploaded_data.keys()), [
+            'com.github.mogproject/.blobs/ffffeeeeddddccccbbbbaaaa99998888',
+            'com.github.mogproject/art-test/0.0.1/1/art-test-0.0.1.jar',
+            'com.github.mogproject/art-test/0.0.2/1/art-test-0.0.2.jar',
+        ])
+        self.assertEqual(r.migrate('art-test'), 0)
+
     def test_delete_revision_can_be_reused(self):
         r = self.__mock_repo()
 
@@ -6,6 +6,7 @@ import logging
 from artifactcli.driver import *
 from artifactcli.operation import *
 from artifactcli.repository import Repository
+from artifactcli.hashcache import HashCache
 from artifactcli.settings import Settings
 
 
@@ -13,16 +14,25 @@ class TestSettings(unittest.TestCase):
     def setUp(self):
         self.default_opts = {'access_key': None, 'force': False, 'bucket': None, 'region': None,
                              'log_level': logging.INFO, 'print_only': False, 'secret_key': None,
-                             'config': '~/.artifact-cli', 'output': None}
+                             'config': '~/.artifact-cli', 'output': None, 'jobs': None, 'no_cache': False,
+                             'multipart_threshold': None, 'multipart_chunksize': None, 'max_concurrency': None,
+                             'content_addressed': None, 'blob_cache_size': None, 'index_format': None,
+                             'journal': None}
         self.full_opts = {'access_key': 'ACCESS_KEY', 'force': True, 'bucket': 'BUCKET', 'region': None,
                           'log_level': logging.DEBUG, 'print_only': True, 'secret_key': 'SECRET_KEY',
-                          'config': 'xxx', 'output': None}
+                          'config': 'xxx', 'output': None, 'jobs': None, 'no_cache': False,
+                          'multipart_threshold': None, 'multipart_chunksize': None, 'max_concurrency': None,
+                          'content_addressed': None, 'blob_cache_size': None, 'index_format': None,
+                          'journal': None}
 
     def _updated_opts(self, updates):
         d = copy(self.default_opts)
         d.update(updates)
         return d
 
+    def test_parse_args_daemon(self):
+        self.assertEqual(Settings().parse_args(['art', 'daemon']).operation, DaemonOperation([]))
+
     def test_parse_args_empty(self):
         self.assertEqual(Settings().parse_args(['art']), Settings())
 
@@ -36,8 +46,14 @@ class TestSettings(unittest.TestCase):
              'SECRET_KEY', '--bucket', 'BUCKET', '--debug'])
         self.assertEqual(s, Settings(operation=ListOperation('gid', []), options=self.full_opts))
 
+    def test_parse_args_list_jobs(self):
+        s = Settings().parse_args(['art', 'list', 'gid', '--jobs', '16'])
+        self.assertEqual(s, Settings(operation=ListOperation('gid', [], None, 16),
+                                     options=self._updated_opts({'jobs': 16})))
+
     def test_parse_args_list_error(self):
         self.assertEqual(Settings().parse_args(['art', 'list']), Settings())
+        self.assertEqual(Settings().parse_args(['art', 'list', 'gid', '--jobs', '0']), Settings())
 
     def test_parse_args_upload(self):
         s = Settings().parse_args(['art', 'upload', 'gid', '/path/to/xxx'])
@@ -154,6 +170,17 @@ class TestSettings(unittest.TestCase):
         self.assertEqual(Settings().parse_args(['art', 'delete', 'gid', 'xxx', 'latest']), Settings())
         self.assertEqual(Settings().parse_args(['art', 'delete', 'gid', 'xxx', 'LATEST']), Settings())
 
+    def test_parse_args_migrate(self):
+        s = Settings().parse_args(['art', 'migrate', 'gid', '--content-addressed', '--check'])
+        self.assertEqual(s, Settings(operation=MigrateOperation('gid', [], True),
+                                     options=self._updated_opts({'content_addressed': True, 'print_only': True})))
+
+    def test_parse_args_migrate_index_format(self):
+        s = Settings().parse_args(['art', 'migrate', 'gid', '--index-format', 'compact'])
+        self.assertEqual(s, Settings(operation=MigrateOperation('gid', [], False, 'compact'),
+                                     options=self._updated_opts({'index_format': 'compact'})))
+        self.assertRaises(SystemExit, Settings().parse_args, ['art', 'migrate', 'gid', '--index-format', 'xml'])
+
     def test_parse_args_command_error(self):
         self.assertEqual(Settings().parse_args(['art', 'xxx', 'gid']), Settings())
 
@@ -237,6 +264,113 @@ class TestSettings(unittest.TestCase):
         )
         self.assertEqual(s.load_config(), t)
 
+    def test_load_config_no_cache(self):
+        s = Settings(
+            operation=ListOperation('gid', []),
+            options=self._updated_opts(
+                {'access_key': 'ACCESS_KEY', 'secret_key': 'SECRET_KEY', 'bucket': 'BUCKET'})
+        )
+        self.assertEqual(s.load_config().repo.driver.index_cache, IndexCache('BUCKET', 'gid'))
+
+        self.assertEqual(s.load_config().repo.hash_cache, HashCache())
+
+        s.options['no_cache'] = True
+        self.assertEqual(s.load_config().repo.driver.index_cache, None)
+        self.assertEqual(s.load_config().repo.hash_cache, None)
+
+    def test_load_config_transfer(self):
+        s = Settings(
+            operation=ListOperation('gid', []),
+            options=self._updated_opts({'config': 'tests/resources/test-artifact-cli.conf', 'bucket': 'bucket4art',
+                                        'multipart_chunksize': 16, 'max_concurrency': 4}))
+        c = s.load_config().repo.driver.transfer_config
+        self.assertEqual((c.multipart_threshold, c.multipart_chunksize, c.max_concurrency),
+                         (8 * 1024 * 1024, 16 * 1024 * 1024, 4))
+
+        s.options['max_concurrency'] = 0
+        self.assertEqual(s.load_config(), Settings())
+
+    def test_load_config_content_addressed(self):
+        s = Settings(
+            operation=ListOperation('gid', []),
+            options=self._updated_opts({'config': 'tests/resources/test-artifact-cli.conf', 'bucket': 'bucket4art'}))
+        self.assertFalse(s.load_config().repo.content_addressed)
+
+        s.options['content_addressed'] = True
+        self.assertTrue(s.load_config().repo.content_addressed)
+
+    def test_load_config_file_system(self):
+        s = Settings(
+            operation=ListOperation('gid', []),
+            options=self._updated_opts({'bucket': 'file:///path/to/repo'})
+        )
+        t = Settings(
+            operation=ListOperation('gid', []),
+            options=self._updated_opts({'bucket': 'file:///path/to/repo'}),
+            repo=Repository(FileSystemDriver('/path/to/repo', 'gid'), 'gid')
+        )
+        self.assertEqual(s.load_config(), t)
+
+        s.options['config'] = 'tests/resources/test-artifact-cli.conf'
+        self.assertEqual(s.load_config().repo, t.repo)
+
+        s.options['bucket'] = 'bucket4art'
+        self.assertTrue(isinstance(s.load_config().repo.driver, S3Driver))
+
+    def test_load_config_repo_cache(self):
+        s = Settings(
+            operation=ListOperation('gid', []),
+            options=self._updated_opts(
+                {'access_key': 'ACCESS_KEY', 'secret_key': 'SECRET_KEY', 'bucket': 'BUCKET'})
+        )
+        repo_cache = {}
+        repo = s.load_config(repo_cache).repo
+        self.assertTrue(s.load_config(repo_cache).repo is repo)
+        self.assertFalse(s.load_config().repo is repo)
+
+        s.options['bucket'] = 'BUCKET2'
+        self.assertFalse(s.load_config(repo_cache).repo is repo)
+        self.assertEqual(len(repo_cache), 2)
+
+    def test_load_config_blob_cache(self):
+        s = Settings(
+            operation=ListOperation('gid', []),
+            options=self._updated_opts(
+                {'access_key': 'ACCESS_KEY', 'secret_key': 'SECRET_KEY', 'bucket': 'BUCKET'})
+        )
+        self.assertEqual(s.load_config().repo.driver.blob_cache, None)
+
+        s.options['blob_cache_size'] = 100
+        self.assertEqual(s.load_config().repo.driver.blob_cache, BlobCache(100 * 1024 * 1024))
+
+        s.options['no_cache'] = True
+        self.assertEqual(s.load_config().repo.driver.blob_cache, None)
+
+        s.options['blob_cache_size'] = -1
+        self.assertEqual(s.load_config(), Settings())
+
+    def test_load_config_index_format(self):
+        s = Settings(
+            operation=ListOperation('gid', []),
+            options=self._updated_opts(
+                {'access_key': 'ACCESS_KEY', 'secret_key': 'SECRET_KEY', 'bucket': 'BUCKET'})
+        )
+        self.assertEqual(s.load_config().repo.index_format, None)
+
+        s.options['index_format'] = 'compact'
+        self.assertEqual(s.load_config().repo.index_format, 'compact')
+
+    def test_load_config_journal(self):
+        s = Settings(
+            operation=ListOperation('gid', []),
+            options=self._updated_opts(
+                {'access_key': 'ACCESS_KEY', 'secret_key': 'SECRET_KEY', 'bucket': 'BUCKET'})
+        )
+        self.assertFalse(s.load_config().repo.journal)
+
+        s.options['journal'] = True
+        self.assertTrue(s.load_config().repo.journal)
+
     def test_load_config_io_error(self):
         s = Settings(
             operation=ListOperation('gid', []),
@@ -313,3 +447,36 @@ class TestSettings(unittest.TestCase):
         ]))
         self.assertEqual(Settings._read_aws_config(s, 'mogproject'),
                          ('abcdefghijklmnopqrstuvwxyz', 'ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'bucket-name', None))
+
+    def _read_config(self, lines, group_id):
+        return Settings._read_config(StringIO('\n'.join(lines)), group_id)
+
+    def test_read_config(self):
+        lines = [
+            '[default]',
+            'bucket = bucket-name',
+            'multipart_threshold = 64',
+            'content_addressed = true',
+            'journal = yes',
+            'blob_cache_size = 1024',
+            '[my.group.id]',
+            'bucket = bucket-name-123',
+            'multipart_threshold = 32',
+            'multipart_chunksize = 16',
+            'max_concurrency = 4',
+        ]
+        self.assertEqual(self._read_config(lines, 'mogproject'), {
+            'access_key': None, 'secret_key': None, 'bucket': 'bucket-name', 'region': None,
+            'multipart_threshold': 64, 'multipart_chunksize': None, 'max_concurrency': None,
+            'content_addressed': True, 'journal': True, 'blob_cache_size': 1024,
+        })
+        self.assertEqual(self._read_config(lines, 'my.group.id'), {
+            'access_key': None, 'secret_key': None, 'bucket': 'bucket-name-123', 'region': None,
+            'multipart_threshold': 32, 'multipart_chunksize': 16, 'max_concurrency': 4,
+            'content_addressed': None, 'journal': None, 'blob_cache_size': None,
+        })
+
+    def test_read_config_error(self):
+        for line in ['multipart_threshold = xxx', 'max_concurrency = 0', 'content_addressed = xxx',
+                     'journal = 2', 'blob_cache_size = -1']:
+            self.assertRaises(ValueError, self._read_config, ['[default]', line], 'mogproject')
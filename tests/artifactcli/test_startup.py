@@ -0,0 +1,61 @@
+"""
+Startup time benchmark based on ``python -X importtime``
+
+Run this file directly to print the slowest imports of the command line entry point.
+"""
+import unittest
+import os
+import subprocess
+import sys
+
+# modules which must not be imported until an operation needs them
+HEAVY_MODULES = ['boto3', 'botocore', 's3transfer', 'git', 'dateutil', 'sqlite3']
+
+# cumulative import time of the entry point in microseconds
+STARTUP_BUDGET_US = int(os.environ.get('ART_STARTUP_BUDGET_US', 300000))
+
+ENTRY_POINT = 'import artifactcli.artifactcli'
+
+
+def importtime(code):
+    """
+    :param code: Python code to run
+    :return: list of tuples of (module name, self time in us, cumulative time in us) in import order
+    """
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', code],
+                          stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, check=True)
+    ret = []
+    for line in proc.stderr.decode('utf-8').splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        ret.append((name.strip(), int(self_us), int(cumulative_us)))
+    return ret
+
+
+class TestStartup(unittest.TestCase):
+    def _imported(self, code):
+        return set(name.split('.')[0] for name, _, _ in importtime(code))
+
+    def test_no_heavy_imports(self):
+        for args in [[], ['--help'], ['--version'], ['--no-such-option'], ['list']]:
+            code = '; '.join([
+                'import sys',
+                'sys.argv = %r' % (['art'] + args),
+                'from artifactcli.artifactcli import main',
+                'exec("try:\\n main()\\nexcept SystemExit:\\n pass")',
+            ])
+            self.assertEqual(self._imported(code) & set(HEAVY_MODULES), set(), args)
+
+    def test_startup_budget(self):
+        # take the best of several runs to reduce noise
+        results = []
+        for _ in range(3):
+            results.append(dict((name, c) for name, _, c in importtime(ENTRY_POINT))['artifactcli.artifactcli'])
+        self.assertLess(min(results), STARTUP_BUDGET_US)
+
+
+if __name__ == '__main__':
+    rows = importtime(ENTRY_POINT)
+    for name, self_us, cumulative_us in sorted(rows, key=lambda x: -x[2])[:20]:
+        print('%10d %10d  %s' % (self_us, cumulative_us, name))
@@ -0,0 +1,47 @@
+import unittest
+import hashlib
+import os
+import shutil
+import tempfile
+from artifactcli.util.filedigest import FileDigest
+
+
+class TestFileDigest(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def _write(self, name, data):
+        path = os.path.join(self.tmp_dir, name)
+        with open(path, 'wb') as f:
+            f.write(data)
+        return path
+
+    def test_from_path(self):
+        data = os.urandom(1000)
+        d = FileDigest.from_path(self._write('a.dat', data), buffer_size=64)
+        self.assertEqual(d, FileDigest(hashlib.md5(data).hexdigest(), hashlib.sha256(data).hexdigest()))
+        self.assertEqual(d.multipart_etag(), None)
+
+    def test_from_path_empty(self):
+        d = FileDigest.from_path(self._write('a.dat', b''))
+        self.assertEqual((d.md5, d.sha256), (hashlib.md5(b'').hexdigest(), hashlib.sha256(b'').hexdigest()))
+
+    def test_from_path_parts(self):
+        data = os.urandom(1000)
+        expected = hashlib.md5(b''.join(hashlib.md5(data[i:i + 300]).digest() for i in range(0, 1000, 300)))
+
+        # buffer boundaries do not match part boundaries
+        for buffer_size in [64, 300, 1000, 4096]:
+            d = FileDigest.from_path(self._write('a.dat', data), 300, buffer_size)
+            self.assertEqual(d.md5, hashlib.md5(data).hexdigest())
+            self.assertEqual(len(d.part_md5s), 4)
+            self.assertEqual(d.multipart_etag(), '%s-4' % expected.hexdigest())
+
+    def test_from_paths(self):
+        xs = [os.urandom(100 * i) for i in range(1, 6)]
+        paths = [self._write('%d.dat' % i, x) for i, x in enumerate(xs)]
+        self.assertEqual([d.md5 for d in FileDigest.from_paths(paths, jobs=3)],
+                         [hashlib.md5(x).hexdigest() for x in xs])
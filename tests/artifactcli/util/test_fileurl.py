@@ -0,0 +1,12 @@
+import unittest
+from artifactcli.util.fileurl import is_file_url
+
+
+class TestFileUrl(unittest.TestCase):
+    def test_is_file_url(self):
+        self.assertTrue(is_file_url('file:///path/to/repo'))
+        self.assertTrue(is_file_url('file://~/repo'))
+        self.assertFalse(is_file_url('bucket4art'))
+        self.assertFalse(is_file_url('s3://bucket4art'))
+        self.assertFalse(is_file_url(''))
+        self.assertFalse(is_file_url(None))
@@ -0,0 +1,25 @@
+import unittest
+from datetime import datetime, timedelta
+
+from dateutil.tz import tzoffset, tzutc
+from artifactcli.util.timeutil import parse_datetime
+
+
+class TestTimeUtil(unittest.TestCase):
+    def test_parse_datetime_isoformat(self):
+        for dt in [datetime(2014, 12, 31, 9, 12, 34),
+                   datetime(2014, 12, 31, 9, 12, 34, 567890),
+                   datetime(2014, 12, 31, 9, 12, 34, tzinfo=tzoffset(None, 9 * 3600)),
+                   datetime(2014, 12, 31, 9, 12, 34, tzinfo=tzoffset(None, -5 * 3600 - 30 * 60))]:
+            x = parse_datetime(dt.isoformat())
+            self.assertEqual(x, dt)
+            self.assertEqual(x.utcoffset(), dt.utcoffset())
+            self.assertEqual(x.isoformat(), dt.isoformat())
+
+    def test_parse_datetime_fallback(self):
+        self.assertEqual(parse_datetime('Wed, 31 Dec 2014 09:12:34'), datetime(2014, 12, 31, 9, 12, 34))
+        self.assertEqual(parse_datetime('2014-12-31T09:12:34Z'), datetime(2014, 12, 31, 9, 12, 34, tzinfo=tzutc()))
+        self.assertEqual(parse_datetime('2014-12-31T09:12:34Z').utcoffset(), timedelta(0))
+
+    def test_parse_datetime_error(self):
+        self.assertRaises(ValueError, parse_datetime, 'not a date')